@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from typing import List
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from fastapi.middleware.cors import CORSMiddleware
+from uvicorn import run as app_run
+
+from src.constants import APP_HOST, APP_PORT
+from src.logger import logging
+from src.entity.config_entity import BatchPredictionConfig, VehiclePredictorConfig
+from src.pipline.batch_prediction import BatchPrediction
+from src.pipline.prediction_pipeline import VehicleData, VehicleDataClassifier
+from src.utils.micro_batcher import MicroBatcher
+
+prediction_config = VehiclePredictorConfig()
+classifier = VehicleDataClassifier(prediction_pipeline_config=prediction_config)
+batcher = MicroBatcher(predict_batch=lambda records: classifier.predict_records(records),
+                       max_batch_size=prediction_config.max_batch_size,
+                       max_delay_ms=prediction_config.max_batch_delay_ms,
+                       metrics_window=prediction_config.metrics_window)
+batch_prediction_config = BatchPredictionConfig(predictor_config=prediction_config)
+# Uploaded files are scored with the serving version on one worker pool that lives as long as the service
+batch_prediction = BatchPrediction(batch_prediction_config, classifier=classifier)
+
+
+def get_response_label(prediction) -> str:
+    return "Response-Yes" if int(prediction) == 1 else "Response-No"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The model is loaded and warmed up once, before the service accepts requests
+    await run_in_threadpool(classifier.load)
+    await batcher.start()
+    # New registry versions are loaded and warmed in the background, then swapped in without a restart
+    classifier.start_watching()
+    await run_in_threadpool(batch_prediction.start)
+    yield
+    await run_in_threadpool(batch_prediction.stop)
+    await run_in_threadpool(classifier.stop_watching)
+    await batcher.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+origins = ["*"]
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+@app.get("/", tags=["service"])
+async def index():
+    return {"service": "vehicle insurance response prediction", "model": classifier.model_info}
+
+
+@app.get("/health", tags=["service"])
+async def health():
+    return {"status": "ok" if classifier.model is not None else "loading"}
+
+
+@app.post("/predict", tags=["prediction"])
+async def predict(vehicle_data: VehicleData):
+    """
+    Scores one record; concurrent requests are micro-batched into one vectorized prediction.
+    """
+    try:
+        prediction = await batcher.submit(vehicle_data.get_vehicle_data_as_dict())
+    except Exception as e:
+        logging.error(f"Prediction failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"prediction": int(prediction), "status": get_response_label(prediction)}
+
+
+@app.post("/predict/batch", tags=["prediction"])
+async def predict_batch(vehicle_data: List[VehicleData]):
+    """
+    Scores a list of records as one batch, bypassing the micro-batcher.
+    """
+    try:
+        predictions = await run_in_threadpool(classifier.predict_records,
+                                              [record.get_vehicle_data_as_dict() for record in vehicle_data])
+    except Exception as e:
+        logging.error(f"Batch prediction failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"predictions": [int(prediction) for prediction in predictions]}
+
+
+@app.post("/predict/file", tags=["prediction"])
+async def predict_file(file: UploadFile = File(...)):
+    """
+    Bulk-scores an uploaded csv or parquet file on the worker pool and returns it with a prediction column,
+    in the same format. Rows per second are reported in the X-Rows-Per-Second header.
+    """
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in (".csv", ".parquet"):
+        raise HTTPException(status_code=400, detail="Upload a .csv or .parquet file")
+    os.makedirs(batch_prediction_config.upload_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(dir=batch_prediction_config.upload_dir)
+    input_file_path = os.path.join(work_dir, f"input{extension}")
+    output_file_path = os.path.join(work_dir, f"predictions{extension}")
+    try:
+        with open(input_file_path, "wb") as input_file:
+            while block := await file.read(1024 * 1024):
+                input_file.write(block)
+        result = await run_in_threadpool(batch_prediction.score_file, input_file_path, output_file_path)
+    except Exception as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        logging.error(f"Bulk scoring of {file.filename} failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return FileResponse(output_file_path, filename=f"predictions_{os.path.basename(file.filename)}",
+                        headers={"X-Rows": str(result["rows"]), "X-Rows-Per-Second": str(result["rows_per_second"]),
+                                 "X-Model-Version": result["version"]},
+                        background=BackgroundTask(shutil.rmtree, work_dir, ignore_errors=True))
+
+
+@app.post("/model/reload", tags=["service"])
+async def reload_model():
+    """
+    Checks the registry for a new model version now instead of waiting for the watcher.
+    """
+    try:
+        changed = await run_in_threadpool(classifier.reload_if_changed)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"changed": changed, "reload": classifier.get_reload_stats()}
+
+
+@app.get("/metrics", tags=["service"])
+async def metrics():
+    return {"model": classifier.model_info, "reload": classifier.get_reload_stats(),
+            "micro_batching": batcher.metrics.get_stats(),
+            "model_cache": classifier.estimator.model_cache.stats}
+
+
+@app.get("/train", tags=["training"])
+async def trainRouteClient():
+    try:
+        from src.pipline.training_pipeline import TrainPipeline
+
+        await run_in_threadpool(TrainPipeline().run_pipeline)
+        return {"status": "Training successful!!!"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error Occurred! {e}")
+
+
+if __name__ == "__main__":
+    app_run(app, host=APP_HOST, port=APP_PORT)
@@ -0,0 +1,384 @@
+import os
+import sys
+import json
+import math
+import shutil
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+from src.exception import MyException
+from src.logger import logging
+from src.constants import (STORAGE_BACKEND, STORAGE_BACKEND_ENV_KEY, STORAGE_PART_SIZE, STORAGE_MAX_CONCURRENCY,
+                           STORAGE_STREAM_BLOCK_SIZE, LOCAL_STORAGE_DIR, AWS_ACCESS_KEY_ID_ENV_KEY,
+                           AWS_SECRET_ACCESS_KEY_ENV_KEY)
+from src.utils.main_utils import load_object
+from src.utils.stage_cache import get_file_hash
+
+CHECKSUM_METADATA_KEY = "sha256"
+PART_FILE_SUFFIX = ".part"
+PART_STATE_FILE_SUFFIX = ".part.json"
+
+
+class StorageService(ABC):
+    """
+    Object storage shared by the S3 and local file system backends.
+
+    Backends only implement metadata lookups, listing, deletion, uploads and ranged reads. Everything else
+    is common:
+
+    - uploads record the sha256 of the file as object metadata, computed while streaming it from disk
+    - downloads fetch the object as ranged parts of `part_size` bytes on `max_concurrency` threads, writing
+      each part at its offset in a preallocated .part file, so no object is ever held in memory
+    - finished parts are recorded next to the .part file; an interrupted download resumes with the missing
+      parts as long as the object's ETag has not changed
+    - the downloaded file is checked against the recorded sha256 before it is moved into place
+    """
+
+    def __init__(self, part_size: int = STORAGE_PART_SIZE, max_concurrency: int = STORAGE_MAX_CONCURRENCY):
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+
+    # Backend operations
+    @abstractmethod
+    def get_object_metadata(self, bucket_name: str, s3_key: str) -> Optional[dict]:
+        """
+        Returns {"size", "etag", "sha256", "last_modified"} of an object, or None when it does not exist.
+        """
+
+    @abstractmethod
+    def list_objects(self, bucket_name: str, prefix: str = "") -> List[str]:
+        pass
+
+    @abstractmethod
+    def delete_object(self, bucket_name: str, s3_key: str) -> None:
+        pass
+
+    @abstractmethod
+    def _upload(self, from_filename: str, bucket_name: str, s3_key: str, metadata: dict) -> None:
+        pass
+
+    @abstractmethod
+    def _iter_range(self, bucket_name: str, s3_key: str, start: int, end: int) -> Iterator[bytes]:
+        """
+        Yields the bytes [start, end) of an object in blocks.
+        """
+
+    @classmethod
+    def is_configured(cls) -> bool:
+        """
+        Whether the backend has what it needs to be built (e.g. credentials), checked without connecting.
+        """
+        return True
+
+    # Shared operations
+    def s3_key_path_available(self, bucket_name: str, s3_key: str) -> bool:
+        try:
+            return len(self.list_objects(bucket_name, prefix=s3_key)) > 0
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def upload_file(self, from_filename: str, to_filename: str, bucket_name: str, remove: bool = False) -> dict:
+        """
+        Method Name : upload_file
+        Description : This method uploads a local file under the key to_filename, with its sha256 as metadata
+        Output      : metadata of the uploaded object
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            logging.info(f"Uploading {from_filename} to {bucket_name}/{to_filename}")
+            self._upload(from_filename, bucket_name, to_filename,
+                         metadata={CHECKSUM_METADATA_KEY: get_file_hash(from_filename)})
+            if remove:
+                os.remove(from_filename)
+            return self.get_object_metadata(bucket_name, to_filename)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @staticmethod
+    def _read_download_state(state_file_path: str) -> Optional[dict]:
+        if not os.path.exists(state_file_path):
+            return None
+        try:
+            with open(state_file_path, "r") as file:
+                return json.load(file)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _write_download_state(state_file_path: str, state: dict) -> None:
+        temporary_file_path = f"{state_file_path}.tmp"
+        with open(temporary_file_path, "w") as file:
+            json.dump(state, file)
+        os.replace(temporary_file_path, state_file_path)
+
+    def download_file(self, bucket_name: str, s3_key: str, to_filename: str) -> dict:
+        """
+        Method Name : download_file
+        Description : This method downloads an object to to_filename with concurrent ranged reads, resuming a
+                      previous partial download of the same object version and verifying its sha256
+        Output      : metadata of the downloaded object
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            metadata = self.get_object_metadata(bucket_name, s3_key)
+            if metadata is None:
+                raise FileNotFoundError(f"{bucket_name}/{s3_key} does not exist")
+            os.makedirs(os.path.dirname(os.path.abspath(to_filename)), exist_ok=True)
+            part_file_path = to_filename + PART_FILE_SUFFIX
+            state_file_path = to_filename + PART_STATE_FILE_SUFFIX
+
+            state = self._read_download_state(state_file_path)
+            if (state is None or state["etag"] != metadata["etag"] or state["part_size"] != self.part_size
+                    or not os.path.exists(part_file_path)):
+                state = {"etag": metadata["etag"], "size": metadata["size"], "part_size": self.part_size, "done": []}
+                with open(part_file_path, "wb") as file:
+                    file.truncate(metadata["size"])
+                self._write_download_state(state_file_path, state)
+            done = set(state["done"])
+            pending = [part for part in range(math.ceil(metadata["size"] / self.part_size)) if part not in done]
+            if done:
+                logging.info(f"Resuming download of {bucket_name}/{s3_key}: {len(done)} parts already present")
+
+            lock = threading.Lock()
+            with open(part_file_path, "r+b") as file:
+                file_descriptor = file.fileno()
+
+                def fetch_part(part: int) -> None:
+                    start = part * self.part_size
+                    end = min(start + self.part_size, metadata["size"])
+                    position = start
+                    for block in self._iter_range(bucket_name, s3_key, start, end):
+                        os.pwrite(file_descriptor, block, position)
+                        position += len(block)
+                    if position != end:
+                        raise IOError(f"Part {part} of {bucket_name}/{s3_key} ended at byte {position}, expected {end}")
+                    with lock:
+                        done.add(part)
+                        state["done"] = sorted(done)
+                        self._write_download_state(state_file_path, state)
+
+                with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as executor:
+                    for future in [executor.submit(fetch_part, part) for part in pending]:
+                        future.result()
+
+            expected_checksum = metadata.get(CHECKSUM_METADATA_KEY)
+            if expected_checksum is not None and get_file_hash(part_file_path) != expected_checksum:
+                os.remove(part_file_path)
+                os.remove(state_file_path)
+                raise ValueError(f"Checksum mismatch for {bucket_name}/{s3_key}, the partial download was discarded")
+            os.replace(part_file_path, to_filename)
+            os.remove(state_file_path)
+            logging.info(f"Downloaded {bucket_name}/{s3_key} ({metadata['size']} bytes, {len(pending)} parts)")
+            return metadata
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def read_object(self, bucket_name: str, s3_key: str, decode: bool = True):
+        """
+        Reads a small object into memory, as text when decode is True.
+        """
+        try:
+            metadata = self.get_object_metadata(bucket_name, s3_key)
+            if metadata is None:
+                raise FileNotFoundError(f"{bucket_name}/{s3_key} does not exist")
+            content = b"".join(self._iter_range(bucket_name, s3_key, 0, metadata["size"]))
+            return content.decode() if decode else content
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def load_model(self, model_name: str, bucket_name: str, model_dir: Optional[str] = None) -> object:
+        """
+        Method Name : load_model
+        Description : This method downloads a pickled model to a temporary file and loads it
+        Output      : model object
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            model_file = model_name if model_dir is None else model_dir + "/" + model_name
+            with tempfile.TemporaryDirectory() as temporary_dir:
+                file_path = os.path.join(temporary_dir, os.path.basename(model_file))
+                self.download_file(bucket_name, model_file, file_path)
+                return load_object(file_path)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+
+class SimpleStorageService(StorageService):
+    """
+    S3 backend. Uploads go through boto3's managed transfer as concurrent multipart uploads of part_size
+    parts, with S3 verifying a SHA256 checksum of every part.
+    """
+
+    def __init__(self, part_size: int = STORAGE_PART_SIZE, max_concurrency: int = STORAGE_MAX_CONCURRENCY):
+        super().__init__(part_size=part_size, max_concurrency=max_concurrency)
+        from boto3.s3.transfer import TransferConfig
+        from src.configuration.aws_connection import S3Client
+
+        s3_client = S3Client()
+        self.s3_resource = s3_client.s3_resource
+        self.s3_client = s3_client.s3_client
+        self.transfer_config = TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size,
+                                              max_concurrency=max_concurrency, use_threads=True)
+
+    @classmethod
+    def is_configured(cls) -> bool:
+        return bool(os.getenv(AWS_ACCESS_KEY_ID_ENV_KEY)) and bool(os.getenv(AWS_SECRET_ACCESS_KEY_ENV_KEY))
+
+    def get_bucket(self, bucket_name: str):
+        try:
+            return self.s3_resource.Bucket(bucket_name)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_object_metadata(self, bucket_name: str, s3_key: str) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+        try:
+            response = self.s3_client.head_object(Bucket=bucket_name, Key=s3_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise MyException(e, sys) from e
+        return {"size": response["ContentLength"], "etag": response["ETag"].strip('"'),
+                CHECKSUM_METADATA_KEY: response.get("Metadata", {}).get(CHECKSUM_METADATA_KEY),
+                "last_modified": response["LastModified"].timestamp()}
+
+    def list_objects(self, bucket_name: str, prefix: str = "") -> List[str]:
+        try:
+            paginator = self.s3_client.get_paginator("list_objects_v2")
+            return [item["Key"] for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix)
+                    for item in page.get("Contents", [])]
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def delete_object(self, bucket_name: str, s3_key: str) -> None:
+        try:
+            self.s3_client.delete_object(Bucket=bucket_name, Key=s3_key)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _upload(self, from_filename: str, bucket_name: str, s3_key: str, metadata: dict) -> None:
+        self.s3_client.upload_file(from_filename, bucket_name, s3_key, Config=self.transfer_config,
+                                   ExtraArgs={"Metadata": metadata, "ChecksumAlgorithm": "SHA256"})
+
+    def _iter_range(self, bucket_name: str, s3_key: str, start: int, end: int) -> Iterator[bytes]:
+        if end <= start:
+            return
+        response = self.s3_client.get_object(Bucket=bucket_name, Key=s3_key, Range=f"bytes={start}-{end - 1}")
+        yield from response["Body"].iter_chunks(STORAGE_STREAM_BLOCK_SIZE)
+
+
+class LocalStorageService(StorageService):
+    """
+    Local file system backend with the same interface: a bucket is a directory under root_dir and a key is
+    a relative path in it. The sha256 of an object is kept in a sidecar file under .metadata, together with
+    the ETag (modification time and size) of the object it describes.
+    """
+
+    METADATA_DIR_NAME = ".metadata"
+
+    def __init__(self, root_dir: str = LOCAL_STORAGE_DIR, part_size: int = STORAGE_PART_SIZE,
+                 max_concurrency: int = STORAGE_MAX_CONCURRENCY):
+        super().__init__(part_size=part_size, max_concurrency=max_concurrency)
+        self.root_dir = root_dir
+
+    def _object_path(self, bucket_name: str, s3_key: str) -> str:
+        return os.path.join(self.root_dir, bucket_name, *s3_key.split("/"))
+
+    def _metadata_path(self, bucket_name: str, s3_key: str) -> str:
+        return os.path.join(self.root_dir, bucket_name, self.METADATA_DIR_NAME, *s3_key.split("/")) + ".json"
+
+    @staticmethod
+    def _get_etag(file_path: str) -> str:
+        stat = os.stat(file_path)
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+    def get_object_metadata(self, bucket_name: str, s3_key: str) -> Optional[dict]:
+        try:
+            file_path = self._object_path(bucket_name, s3_key)
+            if not os.path.isfile(file_path):
+                return None
+            etag = self._get_etag(file_path)
+            checksum = None
+            metadata_path = self._metadata_path(bucket_name, s3_key)
+            if os.path.exists(metadata_path):
+                with open(metadata_path, "r") as file:
+                    sidecar = json.load(file)
+                if sidecar.get("etag") == etag:
+                    checksum = sidecar.get(CHECKSUM_METADATA_KEY)
+            return {"size": os.path.getsize(file_path), "etag": etag, CHECKSUM_METADATA_KEY: checksum,
+                    "last_modified": os.path.getmtime(file_path)}
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def list_objects(self, bucket_name: str, prefix: str = "") -> List[str]:
+        try:
+            bucket_dir = os.path.join(self.root_dir, bucket_name)
+            keys = []
+            for directory, dir_names, file_names in os.walk(bucket_dir):
+                dir_names[:] = [name for name in dir_names if name != self.METADATA_DIR_NAME]
+                for file_name in file_names:
+                    key = os.path.relpath(os.path.join(directory, file_name), bucket_dir).replace(os.sep, "/")
+                    if key.startswith(prefix) and not key.endswith((PART_FILE_SUFFIX, PART_STATE_FILE_SUFFIX)):
+                        keys.append(key)
+            return sorted(keys)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def delete_object(self, bucket_name: str, s3_key: str) -> None:
+        try:
+            for file_path in (self._object_path(bucket_name, s3_key), self._metadata_path(bucket_name, s3_key)):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _upload(self, from_filename: str, bucket_name: str, s3_key: str, metadata: dict) -> None:
+        file_path = self._object_path(bucket_name, s3_key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # Copied next to the destination and renamed, so readers never see a partially written object
+        temporary_file_path = f"{file_path}.tmp{os.getpid()}.{threading.get_ident()}"
+        shutil.copyfile(from_filename, temporary_file_path)
+        os.replace(temporary_file_path, file_path)
+
+        metadata_path = self._metadata_path(bucket_name, s3_key)
+        os.makedirs(os.path.dirname(metadata_path), exist_ok=True)
+        with open(f"{metadata_path}.tmp", "w") as file:
+            json.dump({**metadata, "etag": self._get_etag(file_path)}, file)
+        os.replace(f"{metadata_path}.tmp", metadata_path)
+
+    def _iter_range(self, bucket_name: str, s3_key: str, start: int, end: int) -> Iterator[bytes]:
+        with open(self._object_path(bucket_name, s3_key), "rb") as file:
+            file.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                block = file.read(min(STORAGE_STREAM_BLOCK_SIZE, remaining))
+                if not block:
+                    return
+                remaining -= len(block)
+                yield block
+
+
+STORAGE_BACKENDS = {"s3": SimpleStorageService, "local": LocalStorageService}
+
+
+def get_storage_service(backend: Optional[str] = None) -> StorageService:
+    """
+    Returns the storage service of the given backend, by default the one named by the STORAGE_BACKEND
+    environment variable ("s3" or "local").
+    """
+    backend = backend or os.getenv(STORAGE_BACKEND_ENV_KEY, STORAGE_BACKEND)
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend '{backend}', expected one of {list(STORAGE_BACKENDS)}")
+    return STORAGE_BACKENDS[backend]()
+
+
+def is_storage_configured(backend: Optional[str] = None) -> bool:
+    """
+    Returns whether the storage service of the given backend (by default the one named by the STORAGE_BACKEND
+    environment variable) is known and configured, without building it.
+    """
+    backend = backend or os.getenv(STORAGE_BACKEND_ENV_KEY, STORAGE_BACKEND)
+    return backend in STORAGE_BACKENDS and STORAGE_BACKENDS[backend].is_configured()
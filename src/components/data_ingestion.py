@@ -1,14 +1,23 @@
 import os
 import sys
 
+import numpy as np
+import pandas as pd
+from typing import List
+from bson import ObjectId
+from datetime import datetime
 from pandas import DataFrame
-from sklearn.model_selection import train_test_split
 
+from src.constants import SCHEMA_FILE_PATH, DATA_INGESTION_SPLIT_HISTOGRAM_BINS
 from src.entity.config_entity import DataIngestionConfig
 from src.entity.artifact_entity import DataIngestionArtifact
 from src.exception import MyException
 from src.logger import logging
 from src.data_access.proj1_data import Proj1Data
+from src.configuration.mongo_db_connection import MongoDBClient
+from src.utils.main_utils import (read_yaml_file, write_yaml_file, read_dataframe, write_dataframe,
+                                  ChunkedDataFrameWriter, get_dtype_plan, apply_dtype_plan, get_memory_usage,
+                                  get_schema_column_types, iter_dataframe_chunks, get_split_hash)
 
 class DataIngestion:
     def __init__(self,data_ingestion_config:DataIngestionConfig=DataIngestionConfig()):
@@ -17,57 +26,279 @@ class DataIngestion:
         """
         try:
             self.data_ingestion_config = data_ingestion_config
+            self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            self._dtype_plan = get_dtype_plan(self._schema_config)
+            self._raw_memory_usage = 0
+            self._compact_memory_usage = 0
         except Exception as e:
             raise MyException(e,sys)
+
+    def _compact_chunk(self, chunk: DataFrame) -> DataFrame:
+        """
+        Applies the schema dtype plan to an exported chunk and keeps track of the memory it saves.
+        """
+        self._raw_memory_usage += get_memory_usage(chunk)
+        chunk = apply_dtype_plan(chunk, self._dtype_plan)
+        self._compact_memory_usage += get_memory_usage(chunk)
+        return chunk
+
+    def _log_memory_saving(self) -> None:
+        if self._compact_memory_usage > 0:
+            logging.info(f"Dtype compaction: {self._raw_memory_usage / 1e6:.1f} MB -> "
+                         f"{self._compact_memory_usage / 1e6:.1f} MB "
+                         f"({self._raw_memory_usage / self._compact_memory_usage:.1f}x smaller)")
+
+    def _get_projection(self) -> List[str]:
+        """
+        Fields fetched from mongodb: the configured projection, or only the columns declared in schema.yaml.
+        """
+        if self.data_ingestion_config.projection_columns is not None:
+            return list(self.data_ingestion_config.projection_columns)
+        return list(get_schema_column_types(self._schema_config))
+
+    def _check_incremental_options(self) -> None:
+        """
+        The snapshot always holds every matching document and is refreshed by one sequential delta query,
+        so sampling, a row limit and partitioned reads cannot apply to it.
+        """
+        config = self.data_ingestion_config
+        unsupported = {"sample_size": config.sample_size, "row_limit": config.row_limit}
+        if config.n_partitions > 1:
+            unsupported["n_partitions"] = config.n_partitions
+        unsupported = {option: value for option, value in unsupported.items() if value is not None}
+        if unsupported:
+            raise ValueError(f"Incremental ingestion does not support {unsupported}; "
+                             f"disable incremental or unset these options")
         
 
-    def export_data_into_feature_store(self)->DataFrame:
+    def refresh_snapshot(self) -> DataFrame:
+        """
+        Method Name :   refresh_snapshot
+        Description :   This method fetches only the documents newer than the stored watermark and merges
+                        them into the persistent local snapshot of the collection. Without a snapshot (or
+                        when the watermark field changed) the full collection is fetched once.
+
+        Output      :   merged snapshot is returned without the '_id' and watermark bookkeeping columns
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_ingestion_config
+            watermark_field = config.watermark_field
+            query_filter = repr(config.query_filter or {})
+            watermark = None
+            if os.path.exists(config.snapshot_file_path) and os.path.exists(config.watermark_file_path):
+                watermark = read_yaml_file(file_path=config.watermark_file_path)
+                if watermark.get("field") != watermark_field:
+                    logging.info(f"Watermark field changed from {watermark.get('field')} to {watermark_field}")
+                    watermark = None
+                elif watermark.get("query_filter", repr({})) != query_filter:
+                    # The snapshot only holds documents matching the filter it was built with
+                    logging.info(f"Query filter changed from {watermark.get('query_filter')} to {query_filter}")
+                    watermark = None
+
+            query = {}
+            if watermark is None:
+                logging.info("No usable snapshot found, fetching the full collection")
+            elif watermark_field == "_id":
+                query = {"_id": {"$gt": ObjectId(watermark["value"])}}
+            else:
+                # $gte so documents sharing the boundary value are not missed; re-fetched ones are de-duplicated on merge
+                query = {watermark_field: {"$gte": watermark["value"]}}
+            if watermark is not None:
+                logging.info(f"Fetching documents with {watermark_field} newer than {watermark['value']}")
+            if config.query_filter:
+                query = {"$and": [config.query_filter, query]} if query else config.query_filter
+
+            projection = self._get_projection()
+            if watermark_field != "_id" and watermark_field not in projection:
+                projection.append(watermark_field)
+
+            my_data = Proj1Data()
+            delta_chunks = list(my_data.export_collection_as_chunks(collection_name=config.collection_name,
+                                                                    batch_size=config.batch_size,
+                                                                    query=query, keep_object_id=True,
+                                                                    projection=projection, drop_columns=()))
+            delta_chunks = [self._compact_chunk(chunk) for chunk in delta_chunks]
+            delta = pd.concat(delta_chunks, ignore_index=True) if delta_chunks else DataFrame()
+            logging.info(f"Fetched {len(delta)} new or updated documents")
+
+            if watermark is None:
+                snapshot = delta
+            else:
+                snapshot = read_dataframe(config.snapshot_file_path)
+                if len(delta) > 0:
+                    snapshot = pd.concat([snapshot, delta], ignore_index=True)
+                    snapshot = snapshot.drop_duplicates(subset="_id", keep="last", ignore_index=True)
+                snapshot = apply_dtype_plan(snapshot, self._dtype_plan)
+
+            if len(delta) > 0:
+                value = delta[watermark_field].max()
+                if isinstance(value, pd.Timestamp):
+                    value = value.to_pydatetime()
+                elif hasattr(value, "item"):
+                    value = value.item()
+
+                os.makedirs(os.path.dirname(config.snapshot_file_path), exist_ok=True)
+                tmp_snapshot_file_path = config.snapshot_file_path.replace(".parquet", ".tmp.parquet")
+                write_dataframe(tmp_snapshot_file_path, snapshot, schema_config=self._schema_config)
+                os.replace(tmp_snapshot_file_path, config.snapshot_file_path)
+                # Watermark is written after the snapshot so a crash in between only causes a re-fetch
+                write_yaml_file(file_path=config.watermark_file_path,
+                                content={"field": watermark_field, "value": value, "query_filter": query_filter,
+                                         "rows": len(snapshot), "updated_at": datetime.now()},
+                                replace=True)
+                logging.info(f"Snapshot updated with {len(snapshot)} rows, watermark: {value}")
+
+            bookkeeping_columns = [col for col in ["_id", watermark_field] if col in snapshot.columns]
+            return snapshot.drop(columns=bookkeeping_columns)
+
+        except Exception as e:
+            raise MyException(e,sys) from e
+
+    def export_data_into_feature_store(self)->str:
         """
         Method Name :   export_data_into_feature_store
-        Description :   This method exports data from mongodb to csv file
-        
-        Output      :   data is returned as artifact of data ingestion components
+        Description :   This method streams data from mongodb to the feature store file chunk by chunk
+
+        Output      :   path of the feature store file is returned as artifact of data ingestion components
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
             logging.info(f"Exporting data from mongodb")
             my_data = Proj1Data()
-            dataframe = my_data.export_collection_as_dataframe(collection_name=
-                                                                   self.data_ingestion_config.collection_name)
-            logging.info(f"Shape of dataframe: {dataframe.shape}")
             feature_store_file_path  = self.data_ingestion_config.feature_store_file_path
             dir_path = os.path.dirname(feature_store_file_path)
             os.makedirs(dir_path,exist_ok=True)
             logging.info(f"Saving exported data into feature store file path: {feature_store_file_path}")
-            dataframe.to_csv(feature_store_file_path,index=False,header=True)
-            return dataframe
+
+            if self.data_ingestion_config.incremental:
+                self._check_incremental_options()
+                dataframe = self.refresh_snapshot()
+                write_dataframe(feature_store_file_path, dataframe, schema_config=self._schema_config)
+                self._log_memory_saving()
+                logging.info(f"Shape of dataframe: {dataframe.shape}")
+                return feature_store_file_path
+
+            with ChunkedDataFrameWriter(feature_store_file_path, schema_config=self._schema_config) as writer:
+                config = self.data_ingestion_config
+                projection = self._get_projection()
+                if config.n_partitions > 1 and config.sample_size is None and config.row_limit is None:
+                    chunk_iterator = my_data.export_collection_as_partitions(collection_name=config.collection_name,
+                                                                             n_partitions=config.n_partitions,
+                                                                             max_workers=config.max_workers,
+                                                                             partition_field=config.partition_field,
+                                                                             batch_size=config.batch_size,
+                                                                             query=config.query_filter,
+                                                                             projection=projection,
+                                                                             drop_columns=())
+                else:
+                    chunk_iterator = my_data.export_collection_as_chunks(collection_name=config.collection_name,
+                                                                         batch_size=config.batch_size,
+                                                                         query=config.query_filter,
+                                                                         projection=projection,
+                                                                         sample_size=config.sample_size,
+                                                                         stratify_column=config.sample_stratify_column,
+                                                                         limit=config.row_limit,
+                                                                         drop_columns=())
+                for chunk in chunk_iterator:
+                    writer.write(self._compact_chunk(chunk))
+            self._log_memory_saving()
+            logging.info(f"Rows in feature store: {writer.rows}")
+            return feature_store_file_path
 
         except Exception as e:
             raise MyException(e,sys)
 
-    def split_data_as_train_test(self,dataframe: DataFrame) ->None:
+    def _get_split_values(self, dataframe: DataFrame) -> np.ndarray:
+        """
+        Stable numbers in [0, 1) per row from the split key; falls back to hashing whole rows without the key.
+        """
+        split_key = self.data_ingestion_config.split_key
+        if split_key in dataframe.columns:
+            return get_split_hash(dataframe[split_key])
+        logging.warning(f"Split key {split_key} not found, hashing full rows instead")
+        return get_split_hash(pd.Series(pd.util.hash_pandas_object(dataframe, index=False).to_numpy()))
+
+    def get_split_thresholds(self, feature_store_file_path: str) -> dict:
+        """
+        Method Name :   get_split_thresholds
+        Description :   This method finds, per value of the stratify column, the hash threshold below which
+                        rows go to the test set so every class gets the configured test ratio. It reads only
+                        the key and stratify columns and keeps one fixed-size histogram per class.
+
+        Output      :   {class value: threshold}; empty when stratification is disabled
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_ingestion_config
+            if config.split_stratify_column is None:
+                return {}
+            bins = DATA_INGESTION_SPLIT_HISTOGRAM_BINS
+            histograms = {}
+            for chunk in iter_dataframe_chunks(feature_store_file_path, batch_size=config.batch_size,
+                                               columns=[config.split_key, config.split_stratify_column]):
+                split_values = self._get_split_values(chunk)
+                bin_index = np.minimum((split_values * bins).astype(np.int64), bins - 1)
+                classes = chunk[config.split_stratify_column].astype(object).to_numpy()
+                for value in pd.unique(classes):
+                    counts = np.bincount(bin_index[classes == value], minlength=bins)
+                    histograms[value] = histograms.get(value, 0) + counts
+
+            thresholds = {}
+            for value, counts in histograms.items():
+                cumulative = np.cumsum(counts) / counts.sum()
+                # Interpolate inside the bin where the cumulative share crosses the test ratio
+                bin_position = int(np.searchsorted(cumulative, config.train_test_split_ratio))
+                previous = cumulative[bin_position - 1] if bin_position > 0 else 0.0
+                share = cumulative[bin_position] - previous
+                fraction = (config.train_test_split_ratio - previous) / share if share > 0 else 0.0
+                thresholds[value] = (bin_position + fraction) / bins
+            logging.info(f"Stratified split thresholds on {config.split_stratify_column}: {thresholds}")
+            return thresholds
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def split_data_as_train_test(self, feature_store_file_path: str) ->None:
         """
         Method Name :   split_data_as_train_test
-        Description :   This method splits the dataframe into train set and test set based on split ratio 
-        
-        Output      :   Folder is created in s3 bucket
+        Description :   This method streams the feature store and assigns every row to the train or test set
+                        from a stable hash of the split key, optionally stratified on the target column, writing
+                        both sets chunk by chunk
+
+        Output      :   train and test files are created in the ingested directory
         On Failure  :   Write an exception log and then raise an exception
         """
         logging.info("Entered split_data_as_train_test method of Data_Ingestion class")
 
         try:
-            train_set, test_set = train_test_split(dataframe, test_size=self.data_ingestion_config.train_test_split_ratio)
-            logging.info("Performed train test split on the dataframe")
-            logging.info(
-                "Exited split_data_as_train_test method of Data_Ingestion class"
-            )
-            dir_path = os.path.dirname(self.data_ingestion_config.training_file_path)
-            os.makedirs(dir_path,exist_ok=True)
-            
+            config = self.data_ingestion_config
+            thresholds = self.get_split_thresholds(feature_store_file_path)
+
             logging.info(f"Exporting train and test file path.")
-            train_set.to_csv(self.data_ingestion_config.training_file_path,index=False,header=True)
-            test_set.to_csv(self.data_ingestion_config.testing_file_path,index=False,header=True)
+            test_counts, total_counts = {}, {}
+            with ChunkedDataFrameWriter(config.training_file_path, schema_config=self._schema_config) as train_writer, \
+                    ChunkedDataFrameWriter(config.testing_file_path, schema_config=self._schema_config) as test_writer:
+                for chunk in iter_dataframe_chunks(feature_store_file_path, batch_size=config.batch_size,
+                                                   dtype_plan=self._dtype_plan):
+                    split_values = self._get_split_values(chunk)
+                    if thresholds:
+                        classes = chunk[config.split_stratify_column].astype(object)
+                        threshold = classes.map(thresholds).fillna(config.train_test_split_ratio).to_numpy(dtype=np.float64)
+                        for value, count in classes.value_counts().items():
+                            total_counts[value] = total_counts.get(value, 0) + count
+                        for value, count in classes[split_values < threshold].value_counts().items():
+                            test_counts[value] = test_counts.get(value, 0) + count
+                    else:
+                        threshold = config.train_test_split_ratio
+                    is_test = split_values < threshold
+                    train_writer.write(chunk[~is_test])
+                    test_writer.write(chunk[is_test])
 
+            logging.info(f"Performed train test split: {train_writer.rows} train rows, {test_writer.rows} test rows")
+            if total_counts:
+                logging.info(f"Test ratio per {config.split_stratify_column}: "
+                             f"{ {value: round(test_counts.get(value, 0) / count, 4) for value, count in total_counts.items()} }")
+            logging.info("Exited split_data_as_train_test method of Data_Ingestion class")
             logging.info(f"Exported train and test file path.")
         except Exception as e:
             raise MyException(e, sys) from e
@@ -83,11 +314,12 @@ class DataIngestion:
         logging.info("Entered initiate_data_ingestion method of Data_Ingestion class")
 
         try:
-            dataframe = self.export_data_into_feature_store()
+            feature_store_file_path = self.export_data_into_feature_store()
 
             logging.info("Got the data from mongodb")
+            logging.info(f"MongoDB connection stats: {MongoDBClient.get_stats()}")
 
-            self.split_data_as_train_test(dataframe)
+            self.split_data_as_train_test(feature_store_file_path)
 
             logging.info("Performed train test split on the dataset")
 
@@ -101,4 +333,4 @@ class DataIngestion:
             logging.info(f"Data ingestion artifact: {data_ingestion_artifact}")
             return data_ingestion_artifact
         except Exception as e:
-            raise MyException(e, sys) from e
\ No newline at end of file
+            raise MyException(e, sys) from e
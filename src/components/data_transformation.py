@@ -1,91 +1,182 @@
+import os
 import sys
+import inspect
 import numpy as np
 import pandas as pd
-from imblearn.combine import SMOTEENN
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler,MinMaxScaler
-from sklearn.compose import ColumnTransformer
+from typing import List, Optional
 
 from src.exception import MyException
-from src.constants import TARGET_COLUMN ,SCHEMA_FILE_PATH, CURRENT_YEAR
-from src.entity.config_entity import DataTransformation
+from src.constants import TARGET_COLUMN ,SCHEMA_FILE_PATH
+from src.entity.config_entity import DataTransformationConfig
 from src.entity.artifact_entity import DataIngestionArtifact,DataTransformationArtifact,DataValidationArtifact
+from src.entity.feature_encoder import FeatureEncoder
 from src.logger import logging
-from src.utils.main_utils import read_yaml_file,save_object,save_numpy_array_data
+from src.utils.main_utils import (read_yaml_file, save_object, save_numpy_array_data, read_dataframe,
+                                  get_dtype_plan, get_memory_usage, get_file_row_count, iter_dataframe_chunks,
+                                  open_numpy_memmap, load_numpy_array_data)
+from src.utils.stage_cache import StageCache
+from src.utils.resampling import resample, get_class_weights, get_validation_mask
+
+# Resampling strategies that work on memory-mapped splits
+OUT_OF_CORE_RESAMPLING_STRATEGIES = ("class_weight", "none")
+
+# schema.yaml sections the transformation outputs depend on
+CACHE_SCHEMA_SECTIONS = ["columns", "numerical_columns", "drop_columns", "num_features", "mm_columns",
+                         "binary_columns", "one_hot_columns"]
 
 class DataTransformation:
     def __init__(self,data_ingestion_artifact:DataIngestionArtifact,
-                 data_transformation_config:DataTransformation,
+                 data_transformation_config:DataTransformationConfig,
                  data_validation_artifact:DataValidationArtifact):
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_transformation_config = data_transformation_config
             self.data_validation_artifact = data_validation_artifact
             self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            self._dtype_plan = get_dtype_plan(self._schema_config)
         except Exception as e:
             raise MyException(e,sys) from e
         
     @staticmethod
-    def read_data(file_path:str)->pd.DataFrame:
+    def read_data(file_path:str, columns: Optional[List[str]] = None, dtype_plan: Optional[dict] = None)->pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_dataframe(file_path, columns=columns, dtype_plan=dtype_plan)
         except Exception as e:
             raise MyException(e,sys) from e
     
-    def get_data_transformation_object(self) ->Pipeline:
+    def get_data_transformation_object(self) ->FeatureEncoder:
+        """
+        Method Name : get_data_transformation_object
+        Description : This method builds the fixed-layout feature encoder described by schema.yaml
+        Output      : unfitted FeatureEncoder
+        On Failure  : Raise MyException
+        """
         try:
-            numerical_transformer = StandardScaler()
-            min_max_scaler = MinMaxScaler()
-            logging.info("Creating column transformer object")
-
-            #load schema configuration
-            num_features = self._schema_config["num_features"]
-            mm_columns = self._schema_config["mm_columns"]
-            logging.info("Transformers Initialized: StandardScaler, MinMaxScaler")
-
-            #creating preprocessor pipeline
-            preprocessor = ColumnTransformer(
-                transformers=[
-                    ("standard_scaler", numerical_transformer, num_features),
-                    ("min_max_scaler", min_max_scaler, mm_columns)
-                ],
-                remainder="passthrough"
-            )
-            final_pipeline = Pipeline(steps=[('preprocessor', preprocessor)])
-            logging.info("Created final pipeline object")
-            logging.info("Exited get_data_transformation_object method of DataTransformation class")
-            return final_pipeline
-        except Exception as e:  
+            encoder = FeatureEncoder.from_schema(self._schema_config, target_column=TARGET_COLUMN)
+            logging.info(f"Created feature encoder with layout {encoder.feature_names}")
+            return encoder
+        except Exception as e:
             raise MyException(e,sys) from e
-    
-    def _map_gender_column(self,df):
-        logging.info("mapping Gender column to binary values")
-        df['Gender'] = df['Gender'].map({'Female': 0, 'Male': 1}).astype(int)
-        return df
-    def _create_dummy_columns(self,df):
-        logging.info("Creating dummy columns for categorical columns")
-        df = pd.get_dummies(df, drop_first=True)
-        return df
-    
-    def _rename_columns(slef,df):
-        logging.info("Renaming columns")
-        df=df.rename(columns={
-            "vehicle_age_< 1 Year":"vehicle_age_lt_1_Year",
-            "vehicle_age_> 2 Years":"vehicle_age_gt_2_Years",
-        })
-        for col in ["vehicle_Age_lt_1_Year","vehicle_age_gt_2_Years","Vehicle_Damage_Yes"]:
-            if col  in df.columns:
-                df[col]= df[col].astype(int)
-        return df
-    
-    def _drop_id_column(self,df):
-        logging.info("Dropping ID column")
-        drop_col = self._schema_config["drop_columns"]
-        if drop_col in df.columns:
-            df=df.drop(drop_col,axis=1)
-        return df
-    
-    def initiate_data_transfomation(self) ->DataTransformationArtifact:
+
+    def _get_cache_outputs(self) -> dict:
+        return {"processing.pkl": self.data_transformation_config.transformed_object_file_path,
+                "train.npy": self.data_transformation_config.transformed_train_file_path,
+                "validation.npy": self.data_transformation_config.transformed_validation_file_path,
+                "test.npy": self.data_transformation_config.transformed_test_file_path}
+
+    def _get_cache_fingerprint(self, stage_cache: StageCache) -> str:
+        """
+        Fingerprint of the ingested splits, the schema sections and the code this stage depends on.
+        """
+        return stage_cache.fingerprint(
+            input_file_paths=[self.data_ingestion_artifact.trained_file_path,
+                              self.data_ingestion_artifact.test_file_path],
+            schema_sections={section: self._schema_config.get(section) for section in CACHE_SCHEMA_SECTIONS},
+            config={"target_column": TARGET_COLUMN, "out_of_core": self.data_transformation_config.out_of_core,
+                    "batch_size": self.data_transformation_config.batch_size,
+                    "resampling_strategy": self.data_transformation_config.resampling_strategy,
+                    "resampling_partition_size": self.data_transformation_config.resampling_partition_size,
+                    "random_state": self.data_transformation_config.random_state,
+                    "validation_fraction": self.data_transformation_config.validation_fraction},
+            code_file_paths=[os.path.abspath(__file__), inspect.getsourcefile(FeatureEncoder),
+                             inspect.getsourcefile(resample)])
+
+    def _get_resampling_strategy(self) -> str:
+        """
+        Strategy actually applied: out-of-core mode falls back to class_weight for the strategies that need
+        the train matrix in memory.
+        """
+        strategy = self.data_transformation_config.resampling_strategy
+        if self.data_transformation_config.out_of_core and strategy not in OUT_OF_CORE_RESAMPLING_STRATEGIES:
+            return "class_weight"
+        return strategy
+
+    def _get_validation_mask(self, rows: int) -> np.ndarray:
+        return get_validation_mask(rows, self.data_transformation_config.validation_fraction,
+                                   self.data_transformation_config.random_state)
+
+    def _write_transformed_file(self, preprocessor: FeatureEncoder, file_path: str, transformed_file_path: str,
+                                validation_file_path: Optional[str] = None) -> int:
+        """
+        Transforms a split chunk by chunk straight into preallocated memory-mapped .npy files holding the
+        features followed by the target column. With a validation file path, the held-out rows go to that
+        file instead of the transformed one.
+        """
+        rows = get_file_row_count(file_path)
+        validation_mask = self._get_validation_mask(rows) if validation_file_path is not None \
+            else np.zeros(rows, dtype=bool)
+        outputs = [(transformed_file_path, ~validation_mask)]
+        if validation_file_path is not None:
+            outputs.append((validation_file_path, validation_mask))
+        outputs = [(open_numpy_memmap(output_file_path, shape=(int(mask.sum()), preprocessor.n_features + 1)), mask)
+                   for output_file_path, mask in outputs]
+        positions = [0] * len(outputs)
+        start = 0
+        for chunk in iter_dataframe_chunks(file_path, batch_size=self.data_transformation_config.batch_size,
+                                           columns=preprocessor.input_columns + [TARGET_COLUMN],
+                                           dtype_plan=self._dtype_plan):
+            stop = start + len(chunk)
+            transformed = np.empty((len(chunk), preprocessor.n_features + 1), dtype=np.float32)
+            preprocessor.transform(chunk, out=transformed[:, :-1])
+            transformed[:, -1] = chunk[TARGET_COLUMN].to_numpy(dtype=np.float32)
+            for index, (output, mask) in enumerate(outputs):
+                selected = transformed[mask[start:stop]]
+                output[positions[index]:positions[index] + len(selected)] = selected
+                positions[index] += len(selected)
+            start = stop
+        for output, _ in outputs:
+            output.flush()
+        del outputs
+        return rows
+
+    def transform_out_of_core(self) -> FeatureEncoder:
+        """
+        Method Name : transform_out_of_core
+        Description : This method fits the encoder statistics over train chunks, then transforms both
+                      splits chunk by chunk into memory-mapped .npy files, the held-out validation rows of
+                      the train split into a file of their own, so no split is ever held in
+                      memory as a whole. Only the class_weight and none resampling strategies apply;
+                      the others need the train matrix in memory and fall back to class_weight.
+        Output      : fitted FeatureEncoder
+        On Failure  : Raise MyException
+        """
+        try:
+            if self._get_resampling_strategy() != self.data_transformation_config.resampling_strategy:
+                logging.warning(f"Resampling strategy '{self.data_transformation_config.resampling_strategy}' "
+                                f"needs the train split in memory, out-of-core mode uses "
+                                f"'{self._get_resampling_strategy()}' instead")
+            preprocessor = self.get_data_transformation_object()
+            for chunk in iter_dataframe_chunks(self.data_ingestion_artifact.trained_file_path,
+                                               batch_size=self.data_transformation_config.batch_size,
+                                               columns=preprocessor.input_columns, dtype_plan=self._dtype_plan):
+                preprocessor.partial_fit(chunk)
+            logging.info(f"Fitted feature encoder over train chunks: {preprocessor}")
+
+            config = self.data_transformation_config
+            for file_path, transformed_file_path, validation_file_path in [
+                (self.data_ingestion_artifact.trained_file_path, config.transformed_train_file_path,
+                 config.transformed_validation_file_path),
+                (self.data_ingestion_artifact.test_file_path, config.transformed_test_file_path, None)]:
+                rows = self._write_transformed_file(preprocessor, file_path, transformed_file_path,
+                                                    validation_file_path)
+                logging.info(f"Transformed {rows} rows of {file_path} into {transformed_file_path}")
+            return preprocessor
+        except Exception as e:
+            raise MyException(e,sys) from e
+
+    def _get_class_weights(self) -> Optional[dict]:
+        """
+        Balanced class weights of the transformed train split for the class_weight strategy, read from
+        the memory-mapped target column so cached outputs get them too.
+        """
+        if self._get_resampling_strategy() != "class_weight":
+            return None
+        train_arr = load_numpy_array_data(self.data_transformation_config.transformed_train_file_path, mmap_mode="r")
+        class_weights = get_class_weights(train_arr[:, -1])
+        logging.info(f"Class weights passed to the trainer: {class_weights}")
+        return class_weights
+
+    def initiate_data_transformation(self) ->DataTransformationArtifact:
         """
         Method Name : initiate_data_transformation
         Description : This method is used to initiate data transformation
@@ -95,24 +186,89 @@ class DataTransformation:
         try:
             logging.info("Data Transfomation started !!!")
             if not self.data_validation_artifact.validattion_status:
-                raise MyException("Data Validation is not done")
+                raise Exception(self.data_validation_artifact.message)
 
-            # Load train and test data
-            train_df = self.read_data(file_path=self.data_ingestion_artifact.trained_file_path)
-            test_df = self.read_data(file_path=self.data_ingestion_artifact.test_file_path)
-            logging.info("Read train and test data")
+            data_transformation_artifact = DataTransformationArtifact(
+                transformed_object_file_path=self.data_transformation_config.transformed_object_file_path,
+                transformed_train_file_path=self.data_transformation_config.transformed_train_file_path,
+                transformed_test_file_path=self.data_transformation_config.transformed_test_file_path,
+                transformed_validation_file_path=self.data_transformation_config.transformed_validation_file_path,
+                resampling_strategy=self._get_resampling_strategy()
+            )
 
+            stage_cache, fingerprint = None, None
+            if self.data_transformation_config.use_cache:
+                stage_cache = StageCache(stage_name="data_transformation")
+                fingerprint = self._get_cache_fingerprint(stage_cache)
+                if stage_cache.restore(fingerprint, self._get_cache_outputs()):
+                    logging.info("Reused cached preprocessing object and transformed arrays")
+                    data_transformation_artifact.class_weights = self._get_class_weights()
+                    return data_transformation_artifact
 
-            input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN],axis=1)
-            test_df = self.read_data(file_path=self.data_ingestion_artifact.test_file_path) 
-            logging.info("Read train and test data")
+            if self.data_transformation_config.out_of_core:
+                preprocessor = self.transform_out_of_core()
+                save_object(self.data_transformation_config.transformed_object_file_path, preprocessor)
+                if stage_cache is not None:
+                    stage_cache.store(fingerprint, self._get_cache_outputs())
+                data_transformation_artifact.class_weights = self._get_class_weights()
+                logging.info("Out-of-core data transformation completed successfully")
+                return data_transformation_artifact
 
-            input_feature_train_df = test_df.drop(columns = [TARGET_COLUMN],axis=1)
-            target_train_df = test_df[TARGET_COLUMN]
+            # Load train and test data, only the columns the encoder uses
+            preprocessor = self.get_data_transformation_object()
+            columns = preprocessor.input_columns + [TARGET_COLUMN]
+            train_df = self.read_data(file_path=self.data_ingestion_artifact.trained_file_path, columns=columns,
+                                      dtype_plan=self._dtype_plan)
+            test_df = self.read_data(file_path=self.data_ingestion_artifact.test_file_path, columns=columns,
+                                     dtype_plan=self._dtype_plan)
+            logging.info(f"Read train and test data ({(get_memory_usage(train_df) + get_memory_usage(test_df)) / 1e6:.1f} MB)")
+
+            input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN])
+            target_feature_train_df = train_df[TARGET_COLUMN]
+
+            input_feature_test_df = test_df.drop(columns=[TARGET_COLUMN])
+            target_feature_test_df = test_df[TARGET_COLUMN]
             logging.info("Split input feature and target column")
-        except Exception as e:
-            raise MyException(e,sys) from e
 
+            input_feature_train_arr = preprocessor.fit_transform(input_feature_train_df)
+            input_feature_test_arr = preprocessor.transform(input_feature_test_df)
+            logging.info("Transformation done end to end to train-test df.")
+
+            # Early-stopping rows are held out before resampling, so they stay real, unweighted rows
+            validation_mask = self._get_validation_mask(len(input_feature_train_arr))
+            target_feature_train_arr = target_feature_train_df.to_numpy()
+            validation_arr = np.c_[input_feature_train_arr[validation_mask],
+                                   np.asarray(target_feature_train_arr[validation_mask], dtype=np.float32)]
+            input_feature_train_arr = input_feature_train_arr[~validation_mask]
+            target_feature_train_arr = target_feature_train_arr[~validation_mask]
+            logging.info(f"Held out {len(validation_arr)} train rows for validation")
 
+            logging.info(f"Applying '{self.data_transformation_config.resampling_strategy}' resampling for handling "
+                         f"imbalanced dataset on the train split.")
+            input_feature_train_final, target_feature_train_final = resample(
+                input_feature_train_arr, target_feature_train_arr,
+                strategy=self.data_transformation_config.resampling_strategy,
+                random_state=self.data_transformation_config.random_state,
+                n_jobs=self.data_transformation_config.resampling_n_jobs,
+                partition_size=self.data_transformation_config.resampling_partition_size
+            )
 
-            
+            train_arr = np.c_[input_feature_train_final, np.asarray(target_feature_train_final, dtype=np.float32)]
+            test_arr = np.c_[input_feature_test_arr, np.asarray(target_feature_test_df, dtype=np.float32)]
+            logging.info("feature-target concatenation done for train-test df.")
+
+            save_object(self.data_transformation_config.transformed_object_file_path, preprocessor)
+            save_numpy_array_data(self.data_transformation_config.transformed_train_file_path, array=train_arr)
+            save_numpy_array_data(self.data_transformation_config.transformed_test_file_path, array=test_arr)
+            save_numpy_array_data(self.data_transformation_config.transformed_validation_file_path,
+                                  array=validation_arr)
+            logging.info("Saving transformation object and transformed files.")
+
+            if stage_cache is not None:
+                stage_cache.store(fingerprint, self._get_cache_outputs())
+
+            data_transformation_artifact.class_weights = self._get_class_weights()
+            logging.info("Data transformation completed successfully")
+            return data_transformation_artifact
+        except Exception as e:
+            raise MyException(e,sys) from e
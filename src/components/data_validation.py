@@ -1,31 +1,51 @@
-import json 
 import sys
 import os
+import time
+import inspect
 
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
+from typing import List, Optional
 
 from src.exception import MyException
 from src.logger import logging
-from src.utils.main_utils import read_yaml_file
+from src.utils.main_utils import (read_yaml_file, write_yaml_file, read_dataframe, get_schema_column_types,
+                                  get_dtype_plan, get_file_columns, iter_dataframe_chunks)
 from src.entity.artifact_entity import DataValidationArtifact,DataIngestionArtifact
 from src.constants import SCHEMA_FILE_PATH
 from src.entity.config_entity import DataValidationConfig
+from src.utils.drift_sketches import DataProfile
+from src.utils.stage_cache import StageCache
+from src.cloud_storage.aws_storage import StorageService, get_storage_service, is_storage_configured
+
+MAX_UNKNOWN_EXAMPLES = 10
+# schema.yaml sections the validation report and drift profile depend on
+CACHE_SCHEMA_SECTIONS = ["columns", "numerical_columns", "categorical_columns", "categorical_domains",
+                         "value_ranges", "distinct_count_columns"]
 
 
 class DataValidation:
-    def __init__(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_config: DataValidationConfig):
+    def __init__(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_config: DataValidationConfig,
+                 storage_service: Optional[StorageService] = None):
         """
         :param data_ingestion_artifact: Output reference of data ingestion artifact stage
         :param data_validation_config: configuration for data validation
+        :param storage_service: Storage backend of the model registry, by default the one selected by the
+                                STORAGE_BACKEND env variable
         """
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_validation_config = data_validation_config
+            self.storage_service = storage_service
             self._schema_config =read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            self._dtype_plan = get_dtype_plan(self._schema_config)
+            self._column_types = get_schema_column_types(self._schema_config)
+            self._categorical_domains = self._schema_config.get("categorical_domains") or {}
+            self._value_ranges = self._schema_config.get("value_ranges") or {}
         except Exception as e:
             raise MyException(e,sys)
-        
+
     def validation_number_of_columns(self, dataframe: DataFrame) -> bool:
         try:
             status = len(dataframe.columns) == len(self._schema_config['columns'])
@@ -33,8 +53,8 @@ class DataValidation:
             return status
         except Exception as e:
             raise MyException(e,sys)
-    
-        
+
+
     def is_column_exist(self, df: DataFrame) ->bool:
         try:
             dataframe_columns = df.columns
@@ -52,89 +72,261 @@ class DataValidation:
                     missing_categorical_columns.append(column)
             if(len(missing_categorical_columns) > 0):
                 logging.info(f"Missing categorical columns: {missing_categorical_columns}")
-           
-        
-        except Exception as e:  
+
+            return len(missing_numerical_columns) == 0 and len(missing_categorical_columns) == 0
+
+        except Exception as e:
             raise MyException(e,sys)
-        
+
     @staticmethod
-    def read_data(file_path:str)->DataFrame:
+    def read_data(file_path:str, columns: Optional[List[str]] = None, dtype_plan: Optional[dict] = None)->DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_dataframe(file_path, columns=columns, dtype_plan=dtype_plan)
         except Exception as e:
             raise MyException(e,sys)
-        
+
+    def _is_dtype_conform(self, column: str, series: pd.Series) -> bool:
+        """
+        Checks a chunk of a column against its schema.yaml type. Integer columns stored as floats because
+        of nulls conform as long as every non-null value is integral.
+        """
+        column_type = self._column_types[column]
+        if column_type == "categor":
+            return (isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(series)
+                    or pd.api.types.is_object_dtype(series))
+        if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+            return False
+        if column_type == "int" and pd.api.types.is_float_dtype(series):
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            return bool(np.all(values == np.floor(values)))
+        return True
+
+    def _update_column_stats(self, stats: dict, column: str, series: pd.Series) -> None:
+        """
+        Folds one chunk of a column into its running statistics with vectorized operations.
+        """
+        null_mask = series.isna()
+        stats["null_count"] += int(null_mask.sum())
+        dtype_ok = self._is_dtype_conform(column, series)
+        stats["dtype"] = str(series.dtype)
+        stats["dtype_ok"] = stats["dtype_ok"] and dtype_ok
+
+        if column in self._categorical_domains:
+            domain = self._categorical_domains[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                unknown_categories = [value for value in series.cat.categories if value not in domain]
+                unknown_mask = series.isin(unknown_categories) if unknown_categories else None
+            else:
+                unknown_mask = ~series.isin(domain) & ~null_mask
+            if unknown_mask is not None and unknown_mask.any():
+                stats["unknown_values"] += int(unknown_mask.sum())
+                examples = set(stats["unknown_examples"]) | set(map(str, series[unknown_mask].unique()[:MAX_UNKNOWN_EXAMPLES]))
+                stats["unknown_examples"] = sorted(examples)[:MAX_UNKNOWN_EXAMPLES]
+
+        if dtype_ok and self._column_types[column] != "categor":
+            chunk_min, chunk_max = series.min(), series.max()
+            if pd.notna(chunk_min):
+                stats["min"] = float(chunk_min) if stats["min"] is None else min(stats["min"], float(chunk_min))
+                stats["max"] = float(chunk_max) if stats["max"] is None else max(stats["max"], float(chunk_max))
+            if column in self._value_ranges:
+                low, high = self._value_ranges[column]
+                stats["out_of_range"] += int(((series < low) | (series > high)).sum())
+
+    def validate_file(self, file_path: str, profile: Optional[DataProfile] = None) -> dict:
+        """
+        Method Name : validate_file
+        Description : This method validates one split in a single chunked pass: column presence, dtype
+                      conformance, null rates, numeric ranges and categorical domains from schema.yaml.
+                      When a profile is given its drift sketches are updated in the same pass.
+        Output      : report of the split with an 'errors' list
+        On Failure  : Raise MyException
+        """
+        try:
+            start_time = time.perf_counter()
+            file_columns = get_file_columns(file_path)
+            header_df = DataFrame(columns=file_columns)
+            errors = []
+            if not self.validation_number_of_columns(dataframe=header_df):
+                errors.append(f"Expected {len(self._column_types)} columns, found {len(file_columns)}")
+            if not self.is_column_exist(df=header_df):
+                errors.append("Required numerical or categorical columns are missing")
+
+            missing_columns = [column for column in self._column_types if column not in file_columns]
+            unexpected_columns = [column for column in file_columns if column not in self._column_types]
+            for column in missing_columns:
+                errors.append(f"Missing column: {column}")
+
+            column_stats = {column: {"dtype": None, "dtype_ok": True, "null_count": 0, "min": None, "max": None,
+                                     "out_of_range": 0, "unknown_values": 0, "unknown_examples": []}
+                            for column in self._column_types if column in file_columns}
+            rows = 0
+            for chunk in iter_dataframe_chunks(file_path, batch_size=self.data_validation_config.batch_size,
+                                               columns=list(column_stats)):
+                rows += len(chunk)
+                for column, stats in column_stats.items():
+                    self._update_column_stats(stats, column, chunk[column])
+                if profile is not None:
+                    profile.update(chunk)
+
+            report_columns = {}
+            for column, stats in column_stats.items():
+                stats["null_rate"] = round(stats["null_count"] / rows, 6) if rows else 0.0
+                if not stats["dtype_ok"]:
+                    errors.append(f"{column}: dtype {stats['dtype']} does not conform to {self._column_types[column]}")
+                if stats["null_rate"] > self.data_validation_config.max_null_rate:
+                    errors.append(f"{column}: null rate {stats['null_rate']} above {self.data_validation_config.max_null_rate}")
+                if stats["out_of_range"] > 0:
+                    errors.append(f"{column}: {stats['out_of_range']} values outside {self._value_ranges[column]}")
+                if stats["unknown_values"] > 0:
+                    errors.append(f"{column}: {stats['unknown_values']} values outside the domain, "
+                                  f"e.g. {stats['unknown_examples']}")
+                report_columns[column] = stats
+
+            elapsed = time.perf_counter() - start_time
+            logging.info(f"Validated {rows} rows of {file_path} in {elapsed:.3f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)")
+            return {"file_path": file_path, "rows": rows, "missing_columns": missing_columns,
+                    "unexpected_columns": unexpected_columns, "columns": report_columns, "errors": errors,
+                    "validation_seconds": round(elapsed, 4)}
+        except Exception as e:
+            raise MyException(e,sys) from e
+
+    def fetch_reference_profile(self) -> bool:
+        """
+        Method Name : fetch_reference_profile
+        Description : This method downloads the drift profile published next to the production model to the
+                      reference profile path. When no registry is configured, or it has no profile or
+                      cannot be reached, the local reference profile, if any, is kept.
+        Output      : whether the reference profile was fetched
+        On Failure  : Write a log and keep the local reference profile
+        """
+        config = self.data_validation_config
+        if self.storage_service is None and not is_storage_configured():
+            logging.info("No model registry configured, keeping the local reference profile")
+            return False
+        try:
+            storage_service = self.storage_service or get_storage_service()
+            if storage_service.get_object_metadata(config.reference_profile_bucket_name,
+                                                   config.reference_profile_s3_key_path) is None:
+                logging.info(f"No reference profile in {config.reference_profile_bucket_name}/"
+                             f"{config.reference_profile_s3_key_path}")
+                return False
+            storage_service.download_file(config.reference_profile_bucket_name, config.reference_profile_s3_key_path,
+                                          config.reference_profile_file_path)
+            logging.info(f"Fetched the reference profile to {config.reference_profile_file_path}")
+            return True
+        except Exception as e:
+            logging.error(f"Could not fetch the reference profile, keeping the local one: {e}")
+            return False
+
+    def detect_drift(self, profile: DataProfile) -> Optional[dict]:
+        """
+        Method Name : detect_drift
+        Description : This method compares the profile of the new data with the profile of the data the
+                      production model was trained on, when one is available
+        Output      : drift report, or None without a reference profile
+        On Failure  : Raise MyException
+        """
+        try:
+            reference_profile_file_path = self.data_validation_config.reference_profile_file_path
+            if not os.path.exists(reference_profile_file_path):
+                logging.info(f"No reference profile at {reference_profile_file_path}, skipping drift detection")
+                return None
+            drift_report = profile.compare(DataProfile.load(reference_profile_file_path),
+                                           psi_threshold=self.data_validation_config.drift_psi_threshold)
+            if drift_report["drift_detected"]:
+                logging.warning(f"Data drift detected in columns: {drift_report['drifted_columns']}")
+            else:
+                logging.info("No data drift detected")
+            return drift_report
+        except Exception as e:
+            raise MyException(e,sys) from e
+
+    def _get_cache_outputs(self) -> dict:
+        return {"report.yaml": self.data_validation_config.validation_report_file_path,
+                "drift_profile.json": self.data_validation_config.drift_profile_file_path}
+
+    def _get_cache_fingerprint(self, stage_cache: StageCache) -> str:
+        """
+        Fingerprint of the ingested splits, the reference profile, the schema sections, the thresholds and
+        the code this stage depends on.
+        """
+        return stage_cache.fingerprint(
+            input_file_paths=[self.data_ingestion_artifact.trained_file_path,
+                              self.data_ingestion_artifact.test_file_path,
+                              self.data_validation_config.reference_profile_file_path],
+            schema_sections={section: self._schema_config.get(section) for section in CACHE_SCHEMA_SECTIONS},
+            config={"max_null_rate": self.data_validation_config.max_null_rate,
+                    "drift_psi_threshold": self.data_validation_config.drift_psi_threshold,
+                    "drift_detection": self.data_validation_config.drift_detection},
+            code_file_paths=[os.path.abspath(__file__), inspect.getsourcefile(DataProfile)])
+
     def initiate_data_validation(self)->DataValidationArtifact:
         """
         Method Name : initiate_data_validation
-        Description : This method is used to initiate data validation
+        Description : This method is used to initiate data validation. The reference profile is only fetched
+                      from the model registry when drift detection is enabled and the stage cache misses;
+                      a cache hit reuses the report computed against the local reference profile.
         Output      : DataValidationArtifact
         On Failure  : Raise MyException
         """
-        
+
         try:
-            validation_error_msg =""
             logging.info("Initiating data validation")
-            train_df ,test_df =(DataValidation.read_data(file_path=self.data_ingestion_artifact.trained_file_path),
-                                DataValidation.read_data(file_path=self.data_ingestion_artifact.test_file_path))
-            logging.info("Read train and test data")
-            #checking col len of dataframe for train and test data
-            status = self.validation_number_of_columns(dataframe=train_df)
-            if not status:
-                validation_error_msg += f"Columns are missing in training dataframe. "
-            else:
-                logging.info(f"All required columns present in training dataframe: {status}")
+            config = self.data_validation_config
+            stage_cache, fingerprint = None, None
+            if self.data_validation_config.use_cache:
+                stage_cache = StageCache(stage_name="data_validation")
+                fingerprint = self._get_cache_fingerprint(stage_cache)
+                if stage_cache.restore(fingerprint, self._get_cache_outputs()):
+                    validation_report = read_yaml_file(self.data_validation_config.validation_report_file_path)
+                    data_validation_artifact = DataValidationArtifact(
+                        validattion_status=validation_report["validation_status"],
+                        message=validation_report["message"],
+                        validation_report_file_path=self.data_validation_config.validation_report_file_path,
+                        drift_profile_file_path=self.data_validation_config.drift_profile_file_path)
+                    logging.info(f"Reused cached validation report: {data_validation_artifact}")
+                    return data_validation_artifact
 
-            status = self.validation_number_of_columns(dataframe=test_df)
-            if not status:
-                validation_error_msg += f"Columns are missing in testing dataframe. "
-            else:
-                logging.info(f"All required columns present in testing dataframe: {status}")
+            if config.drift_detection and self.fetch_reference_profile() and stage_cache is not None:
+                # The fingerprint covers the reference profile, which was just replaced
+                fingerprint = self._get_cache_fingerprint(stage_cache)
 
-            #validation col type for train and test data
-            status = self.is_column_exist(df=train_df)
-            if not status:
-                validation_error_msg += f"Missing columns in training dataframe. "
-            else:
-                logging.info(f"All required columns present in training dataframe: {status}")
+            profile = DataProfile.from_schema(self._schema_config)
+            split_reports = {"train": self.validate_file(self.data_ingestion_artifact.trained_file_path, profile),
+                             "test": self.validate_file(self.data_ingestion_artifact.test_file_path, profile)}
+            logging.info("Validated train and test data")
 
+            os.makedirs(self.data_validation_config.data_validation_dir, exist_ok=True)
+            profile.save(self.data_validation_config.drift_profile_file_path)
+            drift_report = self.detect_drift(profile) if config.drift_detection else None
 
-            status = self.is_column_exist(df=test_df)
-            if not status:
-                validation_error_msg += f"Missing columns in testing dataframe. "
-            else:
-                logging.info(f"All required columns present in testing dataframe: {status}")
-            
+            validation_error_msg = " ".join(f"[{split}] {error}." for split, report in split_reports.items()
+                                            for error in report["errors"])
             validation_status = len(validation_error_msg) == 0
             logging.info(f"Validation status: {validation_status}")
+            if not validation_status:
+                logging.info(f"Validation errors: {validation_error_msg}")
 
             data_validation_artifact = DataValidationArtifact(validattion_status=validation_status,
                                                               message=validation_error_msg,
-                                                              validation_report_file_path =self.data_validation_config.validation_report_file_path)
-            logging.info(f"Data validation artifact: {data_validation_artifact}")
+                                                              validation_report_file_path =self.data_validation_config.validation_report_file_path,
+                                                              drift_profile_file_path=self.data_validation_config.drift_profile_file_path)
 
-            #Ensure the directory is created
-            report_dir = os.path.dirname(self.data_validation_config.validation_report_file_path)
-            os.makedirs(report_dir,exist_ok=True)
-
-            #save validation status and message to json file
+            #save validation status, message and the detailed per-column report to yaml file
             validation_report = {
                 "validation_status":validation_status,
-                "message":validation_error_msg
+                "message":validation_error_msg,
+                **split_reports,
+                "drift": drift_report
             }
-            with open(self.data_validation_config.validation_report_file_path, 'w') as file:
-                json.dump(validation_report,file)
-            logging.info("Data validation artifact created and saved to JSON file.")
-            logging.info("Data validation arifact: {data_validation_artifact}")
+            write_yaml_file(file_path=self.data_validation_config.validation_report_file_path,
+                            content=validation_report, replace=True)
+            if stage_cache is not None:
+                stage_cache.store(fingerprint, self._get_cache_outputs())
+            logging.info("Data validation artifact created and saved to YAML file.")
+            logging.info(f"Data validation arifact: {data_validation_artifact}")
+            return data_validation_artifact
 
         except Exception as e:
             raise MyException(e,sys)  from e
-
-
-
-
-            
-
-            
-            
-    
\ No newline at end of file
@@ -0,0 +1,240 @@
+import os
+import sys
+import time
+import inspect
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.metrics import f1_score
+
+from src.exception import MyException
+from src.logger import logging
+from src.constants import TARGET_COLUMN, SCHEMA_FILE_PATH
+from src.entity.config_entity import ModelEvaluationConfig
+from src.entity.artifact_entity import ModelTrainerArtifact, DataIngestionArtifact, ModelEvaluationArtifact
+from src.entity.estimator import MyModel
+from src.entity.s3_estimator import Proj1Estimator
+from src.entity.feature_encoder import FeatureEncoder
+from src.utils.main_utils import (load_object, read_yaml_file, write_yaml_file, read_dataframe, get_dtype_plan,
+                                  save_numpy_array_data, load_numpy_array_data)
+from src.utils.stage_cache import StageCache
+
+PRODUCTION_PREDICTIONS_FILE_NAME = "production_predictions.npy"
+
+
+@dataclass
+class EvaluateModelResponse:
+    trained_model_f1_score: float
+    best_model_f1_score: Optional[float]
+    is_model_accepted: bool
+    difference: float
+    ci_lower: Optional[float] = None
+    ci_upper: Optional[float] = None
+
+
+def get_f1_scores_from_counts(tp: np.ndarray, fp: np.ndarray, fn: np.ndarray) -> np.ndarray:
+    """
+    F1 score of every row of confusion counts, 0 where there are no positives at all (as sklearn).
+    """
+    denominator = 2 * tp + fp + fn
+    return np.divide(2 * tp, denominator, out=np.zeros(np.shape(tp), dtype=np.float64), where=denominator > 0)
+
+
+def predicts_in_parallel(estimator: object) -> bool:
+    """
+    Whether the estimator already spreads a single predict call over several cores: joblib workers for
+    n_jobs other than 1 (e.g. a random forest with n_jobs=-1), OpenMP threads for histogram gradient boosting.
+    """
+    if isinstance(estimator, HistGradientBoostingClassifier):
+        return True
+    return getattr(estimator, "n_jobs", None) not in (None, 1)
+
+
+def bootstrap_f1_difference(y_true: np.ndarray, candidate_pred: np.ndarray, production_pred: np.ndarray,
+                            n_resamples: int, confidence_level: float, random_state: int) -> dict:
+    """
+    Bootstrap confidence interval of F1(candidate) - F1(production) over the same test rows.
+
+    Both F1 scores of a resample only depend on how many rows it draws of each of the 8 combinations of
+    (label, candidate prediction, production prediction), and those counts follow a multinomial over the
+    combination frequencies. Drawing the counts directly is exactly the row bootstrap, at a cost that does
+    not depend on the number of test rows.
+    """
+    cells = 4 * y_true.astype(np.int64) + 2 * candidate_pred.astype(np.int64) + production_pred.astype(np.int64)
+    frequencies = np.bincount(cells, minlength=8) / len(cells)
+    rng = np.random.default_rng(random_state)
+    counts = rng.multinomial(len(cells), frequencies, size=n_resamples)
+
+    def f1_of(model_bit: int) -> np.ndarray:
+        predicted = np.array([(cell >> model_bit) & 1 for cell in range(8)], dtype=bool)
+        positive = np.arange(8) >= 4
+        return get_f1_scores_from_counts(tp=counts[:, predicted & positive].sum(axis=1),
+                                         fp=counts[:, predicted & ~positive].sum(axis=1),
+                                         fn=counts[:, ~predicted & positive].sum(axis=1))
+
+    differences = f1_of(model_bit=1) - f1_of(model_bit=0)
+    alpha = 1 - confidence_level
+    lower, upper = np.quantile(differences, [alpha / 2, 1 - alpha / 2])
+    return {"ci_lower": float(lower), "ci_upper": float(upper), "std": float(differences.std()),
+            "resamples": int(n_resamples), "confidence_level": confidence_level}
+
+
+class ModelEvaluation:
+
+    def __init__(self, model_eval_config: ModelEvaluationConfig, data_ingestion_artifact: DataIngestionArtifact,
+                 model_trainer_artifact: ModelTrainerArtifact):
+        try:
+            self.model_eval_config = model_eval_config
+            self.data_ingestion_artifact = data_ingestion_artifact
+            self.model_trainer_artifact = model_trainer_artifact
+            self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_best_model(self) -> Optional[Proj1Estimator]:
+        """
+        Method Name : get_best_model
+        Description : This function is used to get the model currently in production
+        Output      : Returns model object if available in production else None
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            bucket_name = self.model_eval_config.bucket_name
+            model_path = self.model_eval_config.s3_model_key_path
+            proj1_estimator = Proj1Estimator(bucket_name=bucket_name, model_path=model_path)
+            if proj1_estimator.is_model_present(model_path=model_path):
+                return proj1_estimator
+            return None
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def predict_in_batches(self, model: MyModel, dataframe: pd.DataFrame) -> np.ndarray:
+        """
+        Scores the test rows in batches of batch_size on n_workers threads; encoding and tree traversal
+        run in numpy and scikit-learn code that releases the GIL. An estimator that predicts on several
+        cores by itself gets the batches one at a time, as threads on top of it would oversubscribe the cores.
+        """
+        batch_size = self.model_eval_config.batch_size
+        batches = [dataframe.iloc[start:start + batch_size] for start in range(0, len(dataframe), batch_size)]
+        n_workers = max(1, self.model_eval_config.n_workers)
+        if n_workers > 1 and predicts_in_parallel(model.trained_model_object):
+            logging.info(f"{model} predicts on several cores, scoring the batches sequentially")
+            n_workers = 1
+        if n_workers == 1:
+            predictions = [model.predict(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                predictions = list(executor.map(model.predict, batches))
+        return np.concatenate(predictions).astype(np.int8)
+
+    def get_production_predictions(self, production_model: Proj1Estimator, dataframe: pd.DataFrame) -> np.ndarray:
+        """
+        Method Name : get_production_predictions
+        Description : This method returns the production model's test predictions, reusing the cached ones
+                      when the production model version and the test split are unchanged since they were
+                      computed; a cache hit does not download the model
+        Output      : production model predictions
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            predictions_file_path = os.path.join(self.model_eval_config.model_evaluation_dir,
+                                                 PRODUCTION_PREDICTIONS_FILE_NAME)
+            stage_cache, fingerprint = None, None
+            if self.model_eval_config.use_cache:
+                stage_cache = StageCache("model_evaluation")
+                fingerprint = stage_cache.fingerprint(
+                    input_file_paths=[self.data_ingestion_artifact.test_file_path],
+                    config={"target_column": TARGET_COLUMN, "production_model_version": production_model.get_model_version()},
+                    code_file_paths=[inspect.getsourcefile(MyModel), inspect.getsourcefile(FeatureEncoder)])
+                if stage_cache.restore(fingerprint, {PRODUCTION_PREDICTIONS_FILE_NAME: predictions_file_path}):
+                    return load_numpy_array_data(predictions_file_path)
+
+            production_pred = self.predict_in_batches(production_model.load_model(), dataframe)
+            save_numpy_array_data(predictions_file_path, production_pred)
+            if stage_cache is not None:
+                stage_cache.store(fingerprint, {PRODUCTION_PREDICTIONS_FILE_NAME: predictions_file_path})
+            return production_pred
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def evaluate_model(self) -> EvaluateModelResponse:
+        """
+        Method Name : evaluate_model
+        Description : This function is used to compare the trained model with the production model on the
+                      test split. The candidate is accepted when the lower bound of the bootstrap confidence
+                      interval on the F1 difference is above zero and the F1 gain reaches changed_threshold_score.
+        Output      : Returns EvaluateModelResponse
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            test_df = read_dataframe(self.data_ingestion_artifact.test_file_path,
+                                     dtype_plan=get_dtype_plan(self._schema_config))
+            y_true = test_df[TARGET_COLUMN].to_numpy(dtype=np.int8)
+            x_test = test_df.drop(columns=[TARGET_COLUMN])
+
+            trained_model = load_object(file_path=self.model_trainer_artifact.trained_model_file_path)
+            candidate_pred = self.predict_in_batches(trained_model, x_test)
+            trained_model_f1_score = float(f1_score(y_true, candidate_pred))
+            logging.info(f"F1 score of the trained model: {trained_model_f1_score}")
+
+            best_model = self.get_best_model()
+            if best_model is None:
+                logging.info("No production model found, accepting the trained model")
+                return EvaluateModelResponse(trained_model_f1_score=trained_model_f1_score, best_model_f1_score=None,
+                                             is_model_accepted=True, difference=trained_model_f1_score)
+
+            production_pred = self.get_production_predictions(best_model, x_test)
+            best_model_f1_score = float(f1_score(y_true, production_pred))
+            difference = trained_model_f1_score - best_model_f1_score
+            interval = bootstrap_f1_difference(y_true, candidate_pred, production_pred,
+                                               n_resamples=self.model_eval_config.bootstrap_resamples,
+                                               confidence_level=self.model_eval_config.confidence_level,
+                                               random_state=self.model_eval_config.random_state)
+            is_model_accepted = (interval["ci_lower"] > 0
+                                 and difference >= self.model_eval_config.changed_threshold_score)
+            logging.info(f"F1 score of the production model: {best_model_f1_score}, difference {difference:.5f} "
+                         f"with {interval['confidence_level']:.0%} CI [{interval['ci_lower']:.5f}, "
+                         f"{interval['ci_upper']:.5f}]")
+            return EvaluateModelResponse(trained_model_f1_score=trained_model_f1_score,
+                                         best_model_f1_score=best_model_f1_score,
+                                         is_model_accepted=is_model_accepted, difference=difference,
+                                         ci_lower=interval["ci_lower"], ci_upper=interval["ci_upper"])
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def initiate_model_evaluation(self) -> ModelEvaluationArtifact:
+        """
+        Method Name : initiate_model_evaluation
+        Description : This function is used to initiate all steps of the model evaluation
+        Output      : Returns model evaluation artifact
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            logging.info("Entered initiate_model_evaluation method of ModelEvaluation class")
+            start_time = time.perf_counter()
+            evaluate_model_response = self.evaluate_model()
+            production_model_path = (f"{self.model_eval_config.bucket_name}/{self.model_eval_config.s3_model_key_path}"
+                                     if evaluate_model_response.best_model_f1_score is not None else None)
+
+            report = {**vars(evaluate_model_response),
+                      "changed_threshold_score": self.model_eval_config.changed_threshold_score,
+                      "bootstrap_resamples": self.model_eval_config.bootstrap_resamples,
+                      "confidence_level": self.model_eval_config.confidence_level,
+                      "production_model_path": production_model_path,
+                      "evaluation_seconds": round(time.perf_counter() - start_time, 3)}
+            write_yaml_file(self.model_eval_config.evaluation_report_file_path, report, replace=True)
+
+            model_evaluation_artifact = ModelEvaluationArtifact(
+                is_model_accepted=evaluate_model_response.is_model_accepted,
+                changed_accuracy=evaluate_model_response.difference,
+                production_model_path=production_model_path,
+                trained_model_path=self.model_trainer_artifact.trained_model_file_path,
+                evaluation_report_file_path=self.model_eval_config.evaluation_report_file_path)
+            logging.info(f"Model evaluation artifact: {model_evaluation_artifact}")
+            return model_evaluation_artifact
+        except Exception as e:
+            raise MyException(e, sys) from e
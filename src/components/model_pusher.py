@@ -0,0 +1,78 @@
+import os
+import sys
+import shutil
+from typing import Optional
+
+from src.exception import MyException
+from src.logger import logging
+from src.cloud_storage.aws_storage import StorageService
+from src.entity.artifact_entity import ModelPusherArtifact, ModelEvaluationArtifact, DataValidationArtifact
+from src.entity.config_entity import ModelPusherConfig
+from src.entity.s3_estimator import Proj1Estimator
+from src.utils.main_utils import replace_on_success
+
+
+class ModelPusher:
+    def __init__(self, model_evaluation_artifact: ModelEvaluationArtifact,
+                 model_pusher_config: ModelPusherConfig,
+                 data_validation_artifact: Optional[DataValidationArtifact] = None,
+                 storage_service: Optional[StorageService] = None):
+        """
+        :param model_evaluation_artifact: Output reference of data evaluation artifact stage
+        :param model_pusher_config: Configuration for model pusher
+        :param data_validation_artifact: Output reference of data validation artifact stage, whose drift profile
+                                         is published next to the model
+        :param storage_service: Storage backend, by default the one selected by the STORAGE_BACKEND env variable
+        """
+        self.model_evaluation_artifact = model_evaluation_artifact
+        self.model_pusher_config = model_pusher_config
+        self.data_validation_artifact = data_validation_artifact
+        self.proj1_estimator = Proj1Estimator(bucket_name=model_pusher_config.bucket_name,
+                                              model_path=model_pusher_config.s3_model_key_path,
+                                              storage_service=storage_service)
+
+    def push_drift_profile(self) -> Optional[str]:
+        """
+        Method Name : push_drift_profile
+        Description : This method publishes the drift profile of the run's data next to the model, as the
+                      reference the next runs' data validation compares against. It also replaces the local
+                      reference profile, so a stage cache entry computed against the previous one is not
+                      reused on this machine.
+        Output      : registry key of the profile, or None when the run has no profile
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            drift_profile_file_path = getattr(self.data_validation_artifact, "drift_profile_file_path", None)
+            if drift_profile_file_path is None or not os.path.exists(drift_profile_file_path):
+                logging.info("No drift profile in this run, the registry keeps its reference profile")
+                return None
+            self.proj1_estimator.s3.upload_file(drift_profile_file_path,
+                                                to_filename=self.model_pusher_config.s3_drift_profile_key_path,
+                                                bucket_name=self.model_pusher_config.bucket_name)
+            with replace_on_success(self.model_pusher_config.reference_profile_file_path) as temporary_file_path:
+                shutil.copyfile(drift_profile_file_path, temporary_file_path)
+            return self.model_pusher_config.s3_drift_profile_key_path
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def initiate_model_pusher(self) -> ModelPusherArtifact:
+        """
+        Method Name : initiate_model_pusher
+        Description : This function is used to upload the accepted model and its drift profile to the model registry
+        Output      : Returns model pusher artifact
+        On Failure  : Write an exception log and then raise an exception
+        """
+        logging.info("Entered initiate_model_pusher method of ModelPusher class")
+        try:
+            # The profile goes first, so a client that sees the new model also finds its reference profile
+            s3_drift_profile_path = self.push_drift_profile()
+            logging.info("Uploading new model to the model registry....")
+            self.proj1_estimator.save_model(from_file=self.model_evaluation_artifact.trained_model_path)
+            model_pusher_artifact = ModelPusherArtifact(bucket_name=self.model_pusher_config.bucket_name,
+                                                        s3_model_path=self.model_pusher_config.s3_model_key_path,
+                                                        s3_drift_profile_path=s3_drift_profile_path)
+            logging.info(f"Model pusher artifact: [{model_pusher_artifact}]")
+            logging.info("Exited initiate_model_pusher method of ModelPusher class")
+            return model_pusher_artifact
+        except Exception as e:
+            raise MyException(e, sys) from e
@@ -0,0 +1,239 @@
+import os
+import sys
+import time
+import resource
+from typing import Optional, Tuple
+
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+
+from src.exception import MyException
+from src.logger import logging
+from src.utils.main_utils import (load_numpy_array_data, load_object, save_object, read_yaml_file,
+                                  write_yaml_file)
+from src.utils.hyperparameter_search import successive_halving_search
+from src.entity.config_entity import ModelTrainerConfig
+from src.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact, ClassificationMetricArtifact
+from src.entity.estimator import MyModel
+from src.entity.model_backends import get_model_backend
+from src.entity.compact_ensemble import CompactTreeEnsemble
+
+
+def get_peak_memory_mb() -> float:
+    """
+    Peak resident set size of this process in MB (ru_maxrss is in KB on Linux).
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ModelTrainer:
+    def __init__(self, data_transformation_artifact: DataTransformationArtifact,
+                 model_trainer_config: ModelTrainerConfig):
+        """
+        :param data_transformation_artifact: Output reference of data transformation artifact stage
+        :param model_trainer_config: Configuration for model training
+        """
+        self.data_transformation_artifact = data_transformation_artifact
+        self.model_trainer_config = model_trainer_config
+        self.backend = get_model_backend(model_trainer_config.backend)
+        self.model_params = self.get_default_params()
+        self.leaderboard_file_path = None
+
+    def get_default_params(self) -> dict:
+        """
+        Hyperparameters of the selected backend from the constants, used unless a search replaces them.
+        """
+        config = self.model_trainer_config
+        if config.backend == "hist_gradient_boosting":
+            return {"learning_rate": config._hgb_learning_rate, "max_leaf_nodes": config._hgb_max_leaf_nodes,
+                    "min_samples_leaf": config._hgb_min_samples_leaf,
+                    "l2_regularization": config._hgb_l2_regularization}
+        return {"criterion": config._criterion, "max_depth": config._max_depth,
+                "min_samples_split": config._min_samples_split, "min_samples_leaf": config._min_samples_leaf}
+
+    def search_hyperparameters(self) -> None:
+        """
+        Method Name : search_hyperparameters
+        Description : This method runs the successive halving search configured in model.yaml and uses the
+                      best candidate for the final fit. The leaderboard is saved as an artifact.
+        Output      : None
+        On Failure  : Raise MyException
+        """
+        try:
+            model_config = read_yaml_file(self.model_trainer_config.model_config_file_path)
+            search_config = model_config.get("search") or {}
+            if not search_config.get("enabled", False):
+                logging.info("Hyperparameter search disabled, using the configured parameters")
+                return
+            leaderboard = successive_halving_search(
+                train_file_path=self.data_transformation_artifact.transformed_train_file_path,
+                validation_file_path=self.data_transformation_artifact.transformed_validation_file_path,
+                backend=self.model_trainer_config.backend,
+                param_space=model_config["model_selection"][self.model_trainer_config.backend],
+                search_config=search_config, max_trees=self.model_trainer_config._n_estimators,
+                fixed_params=self.model_params, class_weights=self.data_transformation_artifact.class_weights)
+            write_yaml_file(self.model_trainer_config.leaderboard_file_path, leaderboard, replace=True)
+            self.leaderboard_file_path = self.model_trainer_config.leaderboard_file_path
+            self.model_params.update(leaderboard[0]["params"])
+            logging.info(f"Model parameters from search: {self.model_params}")
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def fit_with_early_stopping(self, x_train: np.ndarray, y_train: np.ndarray, x_validation: np.ndarray,
+                                y_validation: np.ndarray) -> Tuple[object, dict]:
+        """
+        Method Name : fit_with_early_stopping
+        Description : This method fits the selected backend on all configured cores, growing it up to
+                      n_estimators trees (boosting iterations) and stopping once the validation ROC AUC has
+                      not improved for `patience` batches of tree_batch_size trees. The validation rows
+                      are the ones data transformation held out of the train split before resampling.
+        Output      : fitted model and a training report
+        On Failure  : Raise MyException
+        """
+        try:
+            config = self.model_trainer_config
+            backend = self.backend(self.model_params, n_jobs=config.n_jobs, random_state=config._random_state,
+                                   class_weights=self.data_transformation_artifact.class_weights)
+            start_time = time.perf_counter()
+            model, history = backend.fit_with_early_stopping(
+                x_train, y_train, x_validation, y_validation, max_estimators=config._n_estimators,
+                batch_size=config.tree_batch_size, patience=config.early_stopping_patience,
+                tolerance=config.early_stopping_tolerance)
+            fit_seconds = time.perf_counter() - start_time
+
+            trees = backend.n_estimators(model)
+            report = {"backend": config.backend, "params": self.model_params, "trees": trees,
+                      "max_trees": config._n_estimators, "stopped_early": trees < config._n_estimators,
+                      "best_validation_roc_auc": max((entry["validation_roc_auc"] for entry in history), default=None),
+                      "fit_seconds": round(fit_seconds, 3),
+                      "trees_per_second": round(trees / max(fit_seconds, 1e-9), 2),
+                      "peak_memory_mb": round(get_peak_memory_mb(), 1), "n_jobs": config.n_jobs,
+                      "train_rows": len(y_train), "validation_rows": len(y_validation),
+                      "history": history}
+            return model, report
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_model_object_and_report(self, train: np.ndarray, test: np.ndarray,
+                                    validation: np.ndarray) -> Tuple[object, ClassificationMetricArtifact, dict]:
+        """
+        Method Name : get_model_object_and_report
+        Description : This method trains the configured model backend with early stopping and scores it on
+                      the test split
+        Output      : trained model, metric artifact and training report
+        On Failure  : Raise MyException
+        """
+        try:
+            logging.info(f"Training {self.model_trainer_config.backend} model with specified parameters")
+
+            # Train features are copied once into a C-contiguous array: every warm-start fit would otherwise
+            # copy the strided memmap view again. Test and validation rows are only predicted.
+            x_train, y_train = np.ascontiguousarray(train[:, :-1]), np.ascontiguousarray(train[:, -1])
+            x_test, y_test = test[:, :-1], test[:, -1]
+            x_validation, y_validation = validation[:, :-1], validation[:, -1]
+            logging.info("train-test split done.")
+
+            model, training_report = self.fit_with_early_stopping(x_train, y_train, x_validation, y_validation)
+            logging.info("Model training done.")
+
+            # Predictions and evaluation metrics
+            y_pred = model.predict(x_test)
+            accuracy = accuracy_score(y_test, y_pred)
+            f1 = f1_score(y_test, y_pred)
+            precision = precision_score(y_test, y_pred)
+            recall = recall_score(y_test, y_pred)
+
+            # Creating metric artifact
+            metric_artifact = ClassificationMetricArtifact(f1_score=f1, precision_score=precision, recall_score=recall)
+            training_report["test_metrics"] = {"accuracy": round(float(accuracy), 6), "f1_score": round(float(f1), 6),
+                                               "precision_score": round(float(precision), 6),
+                                               "recall_score": round(float(recall), 6)}
+            return model, metric_artifact, training_report
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def export_compact_model(self, model, x_test: np.ndarray) -> dict:
+        """
+        Method Name : export_compact_model
+        Description : This method flattens the trained ensemble into memory-mappable arrays and checks that
+                      it reproduces the model's test probabilities exactly before saving it
+        Output      : compact model statistics for the training report
+        On Failure  : Raise MyException
+        """
+        try:
+            compact_model = CompactTreeEnsemble.from_model(model)
+            if not np.array_equal(compact_model.predict_proba(x_test), model.predict_proba(x_test)):
+                raise ValueError("Compact model predictions differ from the trained model")
+            compact_model_dir = self.model_trainer_config.compact_model_dir
+            compact_model.save(compact_model_dir)
+
+            start_time = time.perf_counter()
+            CompactTreeEnsemble.load(compact_model_dir)
+            load_ms = (time.perf_counter() - start_time) * 1e3
+            size_mb = sum(os.path.getsize(os.path.join(compact_model_dir, file_name))
+                          for file_name in os.listdir(compact_model_dir)) / 1e6
+            return {"nodes": compact_model.meta["n_nodes"], "max_depth": compact_model.meta["max_depth"],
+                    "size_mb": round(size_mb, 3), "load_ms": round(load_ms, 3)}
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def initiate_model_trainer(self) -> ModelTrainerArtifact:
+        """
+        Method Name : initiate_model_trainer
+        Description : This function initiates the model training steps
+        Output      : Returns model trainer artifact
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            logging.info("Entered initiate_model_trainer method of ModelTrainer class")
+            # Load transformed train and test data as read-only memory maps
+            train_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_train_file_path,
+                                              mmap_mode="r")
+            test_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_test_file_path,
+                                             mmap_mode="r")
+            validation_arr = load_numpy_array_data(
+                file_path=self.data_transformation_artifact.transformed_validation_file_path, mmap_mode="r")
+            logging.info("train-test data loaded")
+
+            self.search_hyperparameters()
+
+            # Train model and get metrics
+            trained_model, metric_artifact, training_report = self.get_model_object_and_report(
+                train=train_arr, test=test_arr, validation=validation_arr)
+            logging.info(f"Model trained: {training_report['trees']} trees in {training_report['fit_seconds']}s "
+                         f"({training_report['trees_per_second']} trees/s), peak memory "
+                         f"{training_report['peak_memory_mb']} MB")
+
+            # Load preprocessing object
+            preprocessing_obj = load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
+            logging.info("Preprocessing obj loaded.")
+
+            # Check if the model's accuracy meets the expected threshold
+            if training_report["test_metrics"]["accuracy"] < self.model_trainer_config.expected_accuracy:
+                logging.info("No model found with score above the base score")
+                raise Exception("No model found with score above the base score")
+
+            # Save the final model object that includes both preprocessing and the trained model
+            logging.info("Saving new model as performace is better than previous one.")
+            my_model = MyModel(preprocessing_object=preprocessing_obj, trained_model_object=trained_model)
+            save_object(self.model_trainer_config.trained_model_file_path, my_model)
+            training_report["model_size_mb"] = round(os.path.getsize(self.model_trainer_config.trained_model_file_path) / 1e6, 3)
+            training_report["compact_model"] = self.export_compact_model(trained_model, test_arr[:, :-1])
+            logging.info(f"Compact model: {training_report['compact_model']}")
+            write_yaml_file(self.model_trainer_config.training_report_file_path, training_report, replace=True)
+            logging.info("Saved final model object that includes both preprocessing and the trained model")
+
+            # Create and return the ModelTrainerArtifact
+            model_trainer_artifact = ModelTrainerArtifact(
+                trained_model_file_path=self.model_trainer_config.trained_model_file_path,
+                metric_artifact=metric_artifact,
+                training_report_file_path=self.model_trainer_config.training_report_file_path,
+                leaderboard_file_path=self.leaderboard_file_path,
+                compact_model_dir=self.model_trainer_config.compact_model_dir
+            )
+            logging.info(f"Model trainer artifact: {model_trainer_artifact}")
+            return model_trainer_artifact
+
+        except Exception as e:
+            raise MyException(e, sys) from e
@@ -0,0 +1,47 @@
+import os
+import sys
+import threading
+
+import boto3
+from botocore.config import Config
+
+from src.exception import MyException
+from src.constants import (AWS_ACCESS_KEY_ID_ENV_KEY, AWS_SECRET_ACCESS_KEY_ENV_KEY, REGION_NAME,
+                           STORAGE_MAX_CONCURRENCY)
+
+
+class S3Client:
+    """
+    S3Client builds one boto3 client and resource per process from the AWS credentials in the environment.
+
+    The client's connection pool is sized for STORAGE_MAX_CONCURRENCY, so concurrent part transfers do not
+    wait on each other for a connection.
+    """
+
+    s3_client = None
+    s3_resource = None
+    _lock = threading.Lock()
+
+    def __init__(self, region_name: str = REGION_NAME) -> None:
+        try:
+            if S3Client.s3_resource is None or S3Client.s3_client is None:
+                with S3Client._lock:
+                    if S3Client.s3_resource is None or S3Client.s3_client is None:
+                        access_key_id = os.getenv(AWS_ACCESS_KEY_ID_ENV_KEY)
+                        secret_access_key = os.getenv(AWS_SECRET_ACCESS_KEY_ENV_KEY)
+                        if access_key_id is None:
+                            raise Exception(f"Environment variable: {AWS_ACCESS_KEY_ID_ENV_KEY} is not set.")
+                        if secret_access_key is None:
+                            raise Exception(f"Environment variable: {AWS_SECRET_ACCESS_KEY_ENV_KEY} is not set.")
+
+                        config = Config(max_pool_connections=max(10, STORAGE_MAX_CONCURRENCY),
+                                        retries={"max_attempts": 5, "mode": "adaptive"})
+                        session = boto3.session.Session(aws_access_key_id=access_key_id,
+                                                        aws_secret_access_key=secret_access_key,
+                                                        region_name=region_name)
+                        S3Client.s3_resource = session.resource("s3", config=config)
+                        S3Client.s3_client = session.client("s3", config=config)
+            self.s3_resource = S3Client.s3_resource
+            self.s3_client = S3Client.s3_client
+        except Exception as e:
+            raise MyException(e, sys) from e
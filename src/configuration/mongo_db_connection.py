@@ -1,33 +1,163 @@
 import os
 import sys
+import threading
+import time
+import bson
 import pymongo
 import certifi
+from pymongo import monitoring, ReadPreference
 
 from src.exception import MyException
 from src.logger import logging
-from src.constants import DATABASE_NAME, MONGODB_URL_KEY
+from src.constants import (DATABASE_NAME, MONGODB_URL_KEY, MONGODB_MAX_POOL_SIZE, MONGODB_MIN_POOL_SIZE,
+                           MONGODB_MAX_IDLE_TIME_MS, MONGODB_WAIT_QUEUE_TIMEOUT_MS, MONGODB_CONNECT_TIMEOUT_MS,
+                           MONGODB_SERVER_SELECTION_TIMEOUT_MS, MONGODB_SOCKET_TIMEOUT_MS, MONGODB_COMPRESSORS,
+                           MONGODB_ZLIB_COMPRESSION_LEVEL, MONGODB_APP_NAME, MONGODB_TELEMETRY_TRACK_BYTES)
 
 # Load the certificate authority file to avoid timeout errors when connecting to MongoDB
 ca = certifi.where()
 
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+class MongoDBTelemetry(monitoring.ConnectionPoolListener, monitoring.CommandListener):
+    """
+    Connection pool and command listener counting connection checkouts, checkout wait time,
+    connections created and commands, and optionally the BSON bytes of commands and replies.
+
+    pymongo does not expose message sizes to listeners, so byte counts re-encode every command and reply:
+    that costs about as much CPU as decoding them, on the export path, and measures uncompressed BSON rather
+    than wire bytes. It is off unless MONGODB_TELEMETRY_TRACK_BYTES is set.
+    """
+
+    def __init__(self, track_bytes: bool = MONGODB_TELEMETRY_TRACK_BYTES) -> None:
+        self.track_bytes = track_bytes
+        self._lock = threading.Lock()
+        self._checkout_started = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.checkout_wait_seconds = 0.0
+            self.max_checkout_wait_seconds = 0.0
+            self.connections_created = 0
+            self.commands = 0
+            self.bytes_sent = 0
+            self.bytes_received = 0
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkout_wait_seconds": round(self.checkout_wait_seconds, 6),
+                "max_checkout_wait_seconds": round(self.max_checkout_wait_seconds, 6),
+                "connections_created": self.connections_created,
+                "commands": self.commands,
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+            }
+
+    # Connection pool events
+    def connection_check_out_started(self, event) -> None:
+        self._checkout_started.time = time.perf_counter()
+
+    def connection_checked_out(self, event) -> None:
+        wait = getattr(event, "duration", None)
+        if wait is None:
+            wait = time.perf_counter() - getattr(self._checkout_started, "time", time.perf_counter())
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_wait_seconds += wait
+            self.max_checkout_wait_seconds = max(self.max_checkout_wait_seconds, wait)
+
+    def connection_check_out_failed(self, event) -> None:
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.connections_created += 1
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        pass
+
+    def connection_checked_in(self, event) -> None:
+        pass
+
+    # Command events
+    def started(self, event) -> None:
+        size = len(bson.encode(event.command)) if self.track_bytes else 0
+        with self._lock:
+            self.commands += 1
+            self.bytes_sent += size
+
+    def succeeded(self, event) -> None:
+        if self.track_bytes:
+            size = len(bson.encode(event.reply))
+            with self._lock:
+                self.bytes_received += size
+
+    def failed(self, event) -> None:
+        pass
+
+
 class MongoDBClient:
     """
     MongoDBClient is responsible for establishing a connection to the MongoDB database.
 
+    One pooled MongoClient is shared by all instances of a process. It is re-created automatically in a
+    process that was forked after the client was built, since a MongoClient must not be reused after fork().
+
     Attributes:
     ----------
     client : MongoClient
-        A shared MongoClient instance for the class.
+        The shared MongoClient instance of the current process, looked up on every access so an instance
+        created before a fork uses the child's client after it.
     database : Database
-        The specific database instance that MongoDBClient connects to.
+        The specific database instance that MongoDBClient connects to, from the current client.
+    telemetry : MongoDBTelemetry
+        Connection checkout, wait time and traffic counters of the current process.
 
     Methods:
     -------
     __init__(database_name: str) -> None
         Initializes the MongoDB connection using the given database name.
+    get_collection(collection_name: str, database_name: str, read_preference: str) -> Collection
+        Returns a collection handle, optionally with a read preference such as 'secondaryPreferred'.
+    get_stats() -> dict
+        Returns the telemetry counters together with the pool settings.
+    set_client(client: MongoClient) -> None
+        Uses the given client, e.g. an in-process stand-in, as the shared client of this process.
     """
 
-    client = None  # Shared MongoClient instance across all MongoDBClient instances
+    _client = None  # Shared MongoClient instance across all MongoDBClient instances of this process
+    telemetry = MongoDBTelemetry()
+    _client_pid = None
+    _lock = threading.Lock()
 
     def __init__(self, database_name: str = DATABASE_NAME) -> None:
         """
@@ -44,21 +174,96 @@ class MongoDBClient:
             If there is an issue connecting to MongoDB or if the environment variable for the MongoDB URL is not set.
         """
         try:
-            # Check if a MongoDB client connection has already been established; if not, create a new one
-            if MongoDBClient.client is None:
-                mongo_db_url = os.getenv(MONGODB_URL_KEY)  # Retrieve MongoDB URL from environment variables
-                if mongo_db_url is None:
-                    raise Exception(f"Environment variable '{MONGODB_URL_KEY}' is not set.")
-                
-                # Establish a new MongoDB client connection
-                MongoDBClient.client = pymongo.MongoClient(mongo_db_url, tlsCAFile=ca)
-                
-            # Use the shared MongoClient for this instance
-            self.client = MongoDBClient.client
-            self.database = self.client[database_name]  # Connect to the specified database
+            # Use the shared MongoClient of this process, creating it on first use or after a fork
+            MongoDBClient.get_client()
             self.database_name = database_name
             logging.info("MongoDB connection successful.")
-            
+
         except Exception as e:
             # Raise a custom exception with traceback details if connection fails
-            raise MyException(e, sys)
\ No newline at end of file
+            raise MyException(e, sys)
+
+    @property
+    def client(self) -> pymongo.MongoClient:
+        return MongoDBClient.get_client()
+
+    @property
+    def database(self):
+        return self.client[self.database_name]
+
+    @classmethod
+    def get_client(cls) -> pymongo.MongoClient:
+        """
+        Returns the MongoClient of the current process, creating it when missing or inherited through fork().
+        """
+        if cls._client is None or cls._client_pid != os.getpid():
+            with cls._lock:
+                if cls._client is None or cls._client_pid != os.getpid():
+                    if cls._client is not None:
+                        logging.info(f"Process {os.getpid()} was forked, creating a new MongoDB client")
+                    cls._client = cls._create_client()
+                    cls._client_pid = os.getpid()
+        return cls._client
+
+    @classmethod
+    def set_client(cls, client) -> None:
+        """
+        Uses the given client, e.g. an in-process stand-in, as the shared client of this process.
+        """
+        with cls._lock:
+            cls._client = client
+            cls._client_pid = os.getpid()
+
+    @classmethod
+    def _create_client(cls) -> pymongo.MongoClient:
+        mongo_db_url = os.getenv(MONGODB_URL_KEY)  # Retrieve MongoDB URL from environment variables
+        if mongo_db_url is None:
+            raise Exception(f"Environment variable '{MONGODB_URL_KEY}' is not set.")
+
+        # Establish a new pooled MongoDB client connection with wire compression and telemetry
+        return pymongo.MongoClient(mongo_db_url,
+                                   tlsCAFile=ca,
+                                   maxPoolSize=MONGODB_MAX_POOL_SIZE,
+                                   minPoolSize=MONGODB_MIN_POOL_SIZE,
+                                   maxIdleTimeMS=MONGODB_MAX_IDLE_TIME_MS,
+                                   waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+                                   connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+                                   serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                                   socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+                                   compressors=MONGODB_COMPRESSORS,
+                                   zlibCompressionLevel=MONGODB_ZLIB_COMPRESSION_LEVEL,
+                                   appname=MONGODB_APP_NAME,
+                                   event_listeners=[cls.telemetry])
+
+    @classmethod
+    def _reset_after_fork(cls) -> None:
+        """
+        Drops the client and counters inherited from the parent; the next use creates a fresh client.
+        """
+        cls._client = None
+        cls._client_pid = None
+        cls._lock = threading.Lock()
+        cls.telemetry.reset()
+
+    def get_collection(self, collection_name: str, database_name: str = None, read_preference: str = None):
+        """
+        Returns a collection of the default or specified database, with the given read preference
+        (e.g. 'secondaryPreferred' for exports) when one is passed.
+        """
+        database = self.database if database_name is None else self.client[database_name]
+        if read_preference is None:
+            return database[collection_name]
+        return database.get_collection(collection_name, read_preference=READ_PREFERENCES[read_preference])
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """
+        Returns the telemetry counters of the current process together with the pool settings.
+        """
+        stats = cls.telemetry.get_stats()
+        stats.update({"pid": os.getpid(), "max_pool_size": MONGODB_MAX_POOL_SIZE, "compressors": MONGODB_COMPRESSORS})
+        return stats
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=MongoDBClient._reset_after_fork)
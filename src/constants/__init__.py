@@ -5,10 +5,36 @@ from datetime import date
 DATABASE_NAME="Proj1"
 COLLECTION_NAME="Proj1-Data"
 MONGODB_URL_KEY="MONGODB_URL"
+MONGODB_MAX_POOL_SIZE: int = 50
+MONGODB_MIN_POOL_SIZE: int = 0
+MONGODB_MAX_IDLE_TIME_MS: int = 300000
+MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = 30000
+MONGODB_CONNECT_TIMEOUT_MS: int = 20000
+MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 30000
+MONGODB_SOCKET_TIMEOUT_MS: int = 300000
+MONGODB_COMPRESSORS: str = "zstd,snappy,zlib"
+MONGODB_ZLIB_COMPRESSION_LEVEL: int = 6
+MONGODB_APP_NAME: str = "proj1-pipeline"
+MONGODB_EXPORT_READ_PREFERENCE: str = "secondaryPreferred"
+# re-encodes every command and reply to count their uncompressed BSON bytes; a debugging aid, off by default
+MONGODB_TELEMETRY_TRACK_BYTES: bool = False
 
 
 PIPE_LINE_NAME: str= ""
 ARTIFACT_DIR: str = "artifact"
+ARTIFACT_TIMESTAMP_FORMAT: str = "%m_%d_%Y_%H_%M_%S"
+# Run directories keep hard links to files stored once by content hash (python -m src.utils.artifact_store gc)
+ARTIFACT_STORE_ENABLED: bool = True
+ARTIFACT_STORE_OBJECTS_DIR: str = os.path.join(ARTIFACT_DIR, "objects")
+ARTIFACT_STORE_KEEP_RUNS: int = 5
+# model currently in production, with the profile of the data it was trained on
+PRODUCTION_MODEL_DIR: str = os.path.join(ARTIFACT_DIR, "production_model")
+
+# Content-addressed cache of stage outputs shared by all runs
+STAGE_CACHE_ENABLED: bool = True
+STAGE_CACHE_DIR: str = os.path.join(ARTIFACT_DIR, "stage_cache")
+STAGE_CACHE_MAX_BYTES: int = 5 * 1024 ** 3
+STAGE_CACHE_MAX_AGE_DAYS: float = 30
 
 
 MODEL_FILE_NAME= "model.pkl"
@@ -19,9 +45,10 @@ PREPROCESSING_OBJECT_FILE_NAME="processing.pkl"
 
 
 
-FILE_NAME: str= "data.csv"
-TRAIN_FILE_NAME: str= "train.csv"
-TEST_FILE_NAME : str ="test.csv"
+FILE_NAME: str= "data.parquet"
+TRAIN_FILE_NAME: str= "train.parquet"
+TEST_FILE_NAME : str ="test.parquet"
+DATA_FILE_COMPRESSION: str = "snappy"
 SCHEMA_FILE_PATH = os.path.join("config", "schema.yaml")
 
 
@@ -29,6 +56,15 @@ AWS_ACCESS_KEY_ID_ENV_KEY= "AWS_ACCESS_KEY_ID"
 AWS_SECRET_ACCESS_KEY_ENV_KEY="AWS_SECRET_ACCESS_KEY"
 REGION_NAME="us-east-1"
 
+# Object storage of the model registry: "s3", or "local" to keep the buckets under LOCAL_STORAGE_DIR
+STORAGE_BACKEND_ENV_KEY: str = "STORAGE_BACKEND"
+STORAGE_BACKEND: str = "s3"
+LOCAL_STORAGE_DIR: str = "local_storage"
+# objects are uploaded and downloaded as parts of this size, max_concurrency parts at a time
+STORAGE_PART_SIZE: int = 16 * 1024 * 1024
+STORAGE_MAX_CONCURRENCY: int = 10
+STORAGE_STREAM_BLOCK_SIZE: int = 1024 * 1024
+
 
 '''
 Data ingestion related constant start with Data_ingestion var name
@@ -39,6 +75,24 @@ DATA_INGESTION_DIR_NAME: str = "data_ingestion"
 DATA_INGESTION_FEATURE_STORE_DIR: str= "feature_store"
 DATA_INGESTION_INGESTED_DIR : str= "ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO: float =0.25
+DATA_INGESTION_SPLIT_KEY: str = "id"
+DATA_INGESTION_SPLIT_STRATIFY_COLUMN = TARGET_COLUMN
+DATA_INGESTION_SPLIT_HISTOGRAM_BINS: int = 4096
+DATA_INGESTION_BATCH_SIZE: int = 50000
+DATA_INGESTION_INCREMENTAL: bool = False
+DATA_INGESTION_N_PARTITIONS: int = 1
+DATA_INGESTION_MAX_WORKERS: int = 8
+DATA_INGESTION_PARTITION_FIELD: str = "_id"
+# Server-side query pushdown; None means the whole collection / all schema columns
+DATA_INGESTION_QUERY_FILTER = None
+DATA_INGESTION_PROJECTION_COLUMNS = None
+DATA_INGESTION_SAMPLE_SIZE = None
+DATA_INGESTION_SAMPLE_STRATIFY_COLUMN = None
+DATA_INGESTION_ROW_LIMIT = None
+DATA_INGESTION_SNAPSHOT_DIR: str = os.path.join(ARTIFACT_DIR, "feature_store_snapshot")
+DATA_INGESTION_SNAPSHOT_FILE_NAME: str = "snapshot.parquet"
+DATA_INGESTION_WATERMARK_FILE_NAME: str = "watermark.yaml"
+DATA_INGESTION_WATERMARK_FIELD: str = "_id"
 
 '''
 Data valdation related contant start with Data_validation var name
@@ -46,6 +100,14 @@ Data valdation related contant start with Data_validation var name
 
 DATA_VALIDATION_DIR_NAME : str="data_validation"
 DATA_VALIDATION_REPORT_FILE_NAME: str="report.yaml"
+DATA_VALIDATION_BATCH_SIZE: int = 1000000
+DATA_VALIDATION_MAX_NULL_RATE: float = 0.05
+DATA_VALIDATION_DRIFT_PROFILE_FILE_NAME: str = "drift_profile.json"
+DATA_VALIDATION_DRIFT_PSI_THRESHOLD: float = 0.2
+DATA_VALIDATION_DRIFT_DETECTION: bool = True
+# Profile of the data the production model was trained on, kept next to the production model
+DATA_VALIDATION_REFERENCE_PROFILE_FILE_PATH: str = os.path.join(PRODUCTION_MODEL_DIR,
+                                                                DATA_VALIDATION_DRIFT_PROFILE_FILE_NAME)
 
 '''
 Data Transfomation related constant start with Data_Transformation var name
@@ -54,6 +116,17 @@ Data Transfomation related constant start with Data_Transformation var name
 DATA_TRANSFOMATION_DIR_NAME: str="data_transformation"
 DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR: str="transformer"
 DATA_TRANSFORMATION_TRANSFROMED_OBJECT_DIR: str= "transformed_object"
+# out-of-core mode fits the encoder and writes the .npy outputs chunk by chunk through memory maps
+DATA_TRANSFORMATION_OUT_OF_CORE: bool = False
+DATA_TRANSFORMATION_BATCH_SIZE: int = 500000
+# one of smoteenn, partitioned_smoteenn, random_undersampling, class_weight, none
+DATA_TRANSFORMATION_RESAMPLING_STRATEGY: str = "smoteenn"
+DATA_TRANSFORMATION_RESAMPLING_N_JOBS: int = -1
+DATA_TRANSFORMATION_RESAMPLING_PARTITION_SIZE: int = 200000
+DATA_TRANSFORMATION_RANDOM_STATE: int = 42
+# share of the train split held out for the trainer's early stopping, before any resampling
+DATA_TRANSFORMATION_VALIDATION_FRACTION: float = 0.1
+DATA_TRANSFORMATION_VALIDATION_FILE_NAME: str = "validation.npy"
 
 '''
 Model trainer related constant start with model_trainer var name
@@ -69,13 +142,75 @@ MODEL_TRAINER_MIN_SAMPLES_LEAF: int=6
 MIN_SAMPLES_SPLIT_MAX_DEPTH: int= 10
 MIN_SAMPLE_SPLIT_CRITERION :str='entropy'
 MIN_SAMPLES_SPLIT_RANDOM_STATE :int=101
+MODEL_TRAINER_N_JOBS: int = -1
+# estimator backend, one of random_forest, hist_gradient_boosting
+MODEL_TRAINER_BACKEND: str = "random_forest"
+MODEL_TRAINER_HGB_LEARNING_RATE: float = 0.1
+MODEL_TRAINER_HGB_MAX_LEAF_NODES: int = 31
+MODEL_TRAINER_HGB_MIN_SAMPLES_LEAF: int = 20
+MODEL_TRAINER_HGB_L2_REGULARIZATION: float = 0.0
+# the forest grows by this many trees at a time and stops once the validation ROC AUC has not improved by
+# more than the tolerance for `patience` consecutive batches
+MODEL_TRAINER_TREE_BATCH_SIZE: int = 20
+MODEL_TRAINER_EARLY_STOPPING_PATIENCE: int = 2
+MODEL_TRAINER_EARLY_STOPPING_TOLERANCE: float = 1e-3
+MODEL_TRAINER_REPORT_FILE_NAME: str = "training_report.yaml"
+MODEL_TRAINER_LEADERBOARD_FILE_NAME: str = "search_leaderboard.yaml"
+# flattened, memory-mappable copy of the trained ensemble saved next to model.pkl
+MODEL_TRAINER_COMPACT_MODEL_DIR: str = "compact_model"
 
 '''
 Model Evaluation related constants
 '''
 MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE: float =0.02
+MODEL_EVALUATION_DIR_NAME: str = "model_evaluation"
+MODEL_EVALUATION_REPORT_FILE_NAME: str = "evaluation_report.yaml"
+# test rows scored per batch, batches are scored concurrently by n_workers threads
+MODEL_EVALUATION_BATCH_SIZE: int = 50000
+MODEL_EVALUATION_N_WORKERS: int = os.cpu_count() or 1
+# the candidate is accepted when the lower bound of the bootstrap confidence interval on
+# (candidate F1 - production F1) is above zero and the F1 gain is at least the changed threshold score
+MODEL_EVALUATION_BOOTSTRAP_RESAMPLES: int = 10000
+MODEL_EVALUATION_CONFIDENCE_LEVEL: float = 0.95
+MODEL_EVALUATION_RANDOM_STATE: int = 42
 MODEL_BUCKET_NAME="my-model-mlopsproj"
 MODEL_PUSHER_S3_KEY="model_registry"
+# key of the production model in the registry bucket
+MODEL_REGISTRY_MODEL_KEY: str = f"{MODEL_PUSHER_S3_KEY}/{MODEL_FILE_NAME}"
+# profile of the data the production model was trained on, published next to it and fetched by data validation
+MODEL_REGISTRY_DRIFT_PROFILE_KEY: str = f"{MODEL_PUSHER_S3_KEY}/{DATA_VALIDATION_DRIFT_PROFILE_FILE_NAME}"
+# on-disk cache of model versions downloaded from the registry, shared by the processes of a host
+MODEL_CACHE_DIR: str = "model_cache"
+MODEL_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
 
 APP_HOST = "0.0.0.0"
-APP_PORT= 5000
\ No newline at end of file
+APP_PORT= 5000
+
+# the prediction service scores concurrent single-record requests together: a batch takes the requests
+# arriving within PREDICTION_MAX_BATCH_DELAY_MS of its first one, up to PREDICTION_MAX_BATCH_SIZE
+PREDICTION_MAX_BATCH_SIZE: int = 256
+PREDICTION_MAX_BATCH_DELAY_MS: float = 5.0
+PREDICTION_METRICS_WINDOW: int = 10000
+# score with the model flattened into a CompactTreeEnsemble at load time (same predictions, faster small batches)
+PREDICTION_USE_COMPACT_MODEL: bool = True
+# the service checks the registry for a new model version every PREDICTION_MODEL_WATCH_INTERVAL_SECONDS (0 disables)
+# and loads and warms it in the background before swapping it in
+PREDICTION_MODEL_WATCH_INTERVAL_SECONDS: float = 30.0
+# shadow mode (sample rate above 0): a new version first scores this fraction of batches next to the serving
+# version, off the request path, and is swapped in once it has been compared on PREDICTION_SHADOW_MIN_RECORDS records,
+# provided it agrees with the serving version on at least PREDICTION_SHADOW_MIN_AGREEMENT of them, its positive rate
+# is within PREDICTION_SHADOW_MAX_POSITIVE_RATE_DRIFT of the serving one and it failed at most
+# PREDICTION_SHADOW_MAX_ERRORS batches; otherwise the serving version is kept
+PREDICTION_SHADOW_SAMPLE_RATE: float = 0.0
+PREDICTION_SHADOW_MIN_RECORDS: int = 10000
+PREDICTION_SHADOW_MIN_AGREEMENT: float = 0.95
+PREDICTION_SHADOW_MAX_POSITIVE_RATE_DRIFT: float = 0.05
+PREDICTION_SHADOW_MAX_ERRORS: int = 0
+
+# bulk scoring streams an input file in chunks of BATCH_PREDICTION_CHUNK_SIZE rows to a pool of worker processes
+# that each load the model once; at most BATCH_PREDICTION_MAX_PENDING_CHUNKS chunks per worker are in flight
+BATCH_PREDICTION_CHUNK_SIZE: int = 100000
+BATCH_PREDICTION_N_WORKERS: int = os.cpu_count() or 1
+BATCH_PREDICTION_MAX_PENDING_CHUNKS: int = 2
+BATCH_PREDICTION_OUTPUT_COLUMN: str = "prediction"
+BATCH_PREDICTION_UPLOAD_DIR: str = "batch_prediction"
@@ -1,11 +1,22 @@
 import sys
+import time
+import queue
+import threading
 import pandas as pd
 import numpy as np
-from typing import Optional
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
 from src.configuration.mongo_db_connection import MongoDBClient
-from src.constants import DATABASE_NAME
+from src.constants import (DATABASE_NAME, DATA_INGESTION_BATCH_SIZE, DATA_INGESTION_PARTITION_FIELD,
+                           MONGODB_EXPORT_READ_PREFERENCE)
 from src.exception import MyException
+from src.logger import logging
+
+# Last item a partition reader puts on its queue
+PartitionDone = namedtuple("PartitionDone", ["rows", "seconds"])
+
 
 class Proj1Data:
     """
@@ -21,7 +32,167 @@ class Proj1Data:
         except Exception as e:
             raise MyException(e, sys)
 
-    def export_collection_as_dataframe(self, collection_name: str, database_name: Optional[str] = None) -> pd.DataFrame:
+    def _get_collection(self, collection_name: str, database_name: Optional[str] = None):
+        """
+        Returns the collection from the default or specified database, read with the export read preference.
+        """
+        return self.mongo_client.get_collection(collection_name, database_name=database_name,
+                                                read_preference=MONGODB_EXPORT_READ_PREFERENCE)
+
+    @staticmethod
+    def _columns_to_dataframe(columns: dict, rows: int, drop_columns: Sequence[str] = ("id",)) -> pd.DataFrame:
+        """
+        Builds a DataFrame from per-column value lists and applies the same preprocessing
+        as the full export: 'id' column removed and 'na' values replaced with NaN.
+        '_id' values, when present, are kept as their hex string form.
+        """
+        for column in columns.values():
+            if len(column) < rows:
+                column.extend([None] * (rows - len(column)))
+        if "_id" in columns:
+            columns["_id"] = [str(value) for value in columns["_id"]]
+        df = pd.DataFrame(columns)
+        drop_columns = [column for column in drop_columns if column in df.columns]
+        if drop_columns:
+            df = df.drop(columns=drop_columns)
+        df.replace({"na": np.nan}, inplace=True)
+        return df
+
+    @staticmethod
+    def _build_projection(projection: Optional[List[str]], keep_object_id: bool) -> dict:
+        """
+        Builds the MongoDB projection document: only the listed fields (all fields when None),
+        '_id' excluded unless it is kept.
+        """
+        projection_document = {field: 1 for field in projection or []}
+        if not keep_object_id:
+            projection_document["_id"] = 0
+        return projection_document
+
+    def _sample_documents(self, collection, query: dict, projection_document: dict, sample_size: int,
+                          stratify_column: Optional[str], limit: Optional[int], batch_size: int) -> Iterator[dict]:
+        """
+        Streams a server-side `$sample` of the matching documents. With a stratify column the sample size is
+        split across its values in proportion to their counts, one `$sample` per value. The limit applies to
+        the whole sample: it caps the sample size before the split and the stream after it, as rounded
+        stratum sizes may add up to a few more documents.
+        """
+        if limit is not None:
+            sample_size = min(sample_size, limit)
+        if stratify_column is None:
+            strata = [(query, sample_size)]
+        else:
+            counts = {group["_id"]: group["count"]
+                      for group in collection.aggregate([{"$match": query},
+                                                         {"$group": {"_id": f"${stratify_column}",
+                                                                     "count": {"$sum": 1}}}])}
+            total_documents = sum(counts.values())
+            strata = [({"$and": [query, {stratify_column: value}]}, round(sample_size * count / total_documents))
+                      for value, count in sorted(counts.items(), key=lambda item: str(item[0]))]
+            logging.info(f"Stratified sample on {stratify_column}: {[size for _, size in strata]}")
+
+        documents = 0
+        for stratum_query, stratum_size in strata:
+            stratum_size = min(stratum_size, sample_size - documents)
+            if stratum_size <= 0:
+                continue
+            pipeline = [{"$match": stratum_query}, {"$sample": {"size": stratum_size}}]
+            if projection_document:
+                pipeline.append({"$project": projection_document})
+            for document in collection.aggregate(pipeline, batchSize=batch_size, allowDiskUse=True):
+                documents += 1
+                yield document
+
+    def export_collection_as_chunks(self, collection_name: str, database_name: Optional[str] = None,
+                                    batch_size: int = DATA_INGESTION_BATCH_SIZE, query: Optional[dict] = None,
+                                    sort: Optional[List[Tuple[str, int]]] = None,
+                                    keep_object_id: bool = False, projection: Optional[List[str]] = None,
+                                    sample_size: Optional[int] = None, stratify_column: Optional[str] = None,
+                                    limit: Optional[int] = None,
+                                    drop_columns: Sequence[str] = ("id",)) -> Iterator[pd.DataFrame]:
+        """
+        Streams a MongoDB collection as a sequence of pandas DataFrame chunks.
+
+        The cursor is read with a projection that excludes '_id' and with the given batch size, so
+        at most one chunk of documents is held in memory at a time. Values are appended straight
+        into per-column lists instead of materializing a list of documents. Filtering, projection,
+        sampling and the row limit are all executed on the server.
+
+        Parameters:
+        ----------
+        collection_name : str
+            The name of the MongoDB collection to export.
+        database_name : Optional[str]
+            Name of the database (optional). Defaults to DATABASE_NAME.
+        batch_size : int
+            Number of documents per cursor round-trip and per yielded chunk.
+        query : Optional[dict]
+            Filter document executed on the server (optional). Defaults to the whole collection.
+        sort : Optional[List[Tuple[str, int]]]
+            Sort specification passed to the cursor (optional). Ignored when sampling.
+        keep_object_id : bool
+            Keep '_id' (as a hex string) in the chunks, e.g. to use it as a merge key or watermark.
+        projection : Optional[List[str]]
+            Fields to fetch (optional). Defaults to all fields.
+        sample_size : Optional[int]
+            Number of documents to draw with `$sample` (optional). Defaults to all matching documents.
+        stratify_column : Optional[str]
+            Field whose value proportions are preserved by the sample (optional).
+        limit : Optional[int]
+            Maximum number of documents to fetch (optional).
+        drop_columns : Sequence[str]
+            Columns removed from every chunk. Defaults to 'id'.
+
+        Yields:
+        -------
+        pd.DataFrame
+            Chunks of at most `batch_size` rows, with 'id' column removed and 'na' values replaced with NaN.
+        """
+        try:
+            collection = self._get_collection(collection_name, database_name)
+            query = query or {}
+            projection_document = self._build_projection(projection, keep_object_id)
+            if sample_size is not None:
+                documents = self._sample_documents(collection, query, projection_document, sample_size,
+                                                   stratify_column, limit, batch_size)
+            else:
+                documents = collection.find(query, projection_document or None).batch_size(batch_size)
+                if sort:
+                    documents = documents.sort(sort)
+                if limit is not None:
+                    documents = documents.limit(limit)
+
+            logging.info(f"Streaming data from mongoDB in batches of {batch_size}")
+            columns, rows, total_rows = {}, 0, 0
+            for document in documents:
+                for key, value in document.items():
+                    column = columns.get(key)
+                    if column is None:
+                        column = columns[key] = [None] * rows
+                    column.append(value)
+                rows += 1
+                if len(document) != len(columns):
+                    # Document is missing some of the fields seen so far; pad them with None
+                    for column in columns.values():
+                        if len(column) < rows:
+                            column.append(None)
+
+                if rows == batch_size:
+                    yield self._columns_to_dataframe(columns, rows, drop_columns)
+                    total_rows += rows
+                    columns, rows = {}, 0
+
+            if rows > 0:
+                yield self._columns_to_dataframe(columns, rows, drop_columns)
+                total_rows += rows
+            logging.info(f"Data streamed with len: {total_rows}")
+
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def export_collection_as_dataframe(self, collection_name: str, database_name: Optional[str] = None,
+                                       batch_size: int = DATA_INGESTION_BATCH_SIZE,
+                                       sort: Optional[List[Tuple[str, int]]] = None) -> pd.DataFrame:
         """
         Exports an entire MongoDB collection as a pandas DataFrame.
 
@@ -31,6 +202,10 @@ class Proj1Data:
             The name of the MongoDB collection to export.
         database_name : Optional[str]
             Name of the database (optional). Defaults to DATABASE_NAME.
+        batch_size : int
+            Number of documents fetched per chunk while streaming the collection.
+        sort : Optional[List[Tuple[str, int]]]
+            Sort specification passed to the cursor (optional).
 
         Returns:
         -------
@@ -38,20 +213,250 @@ class Proj1Data:
             DataFrame containing the collection data, with '_id' column removed and 'na' values replaced with NaN.
         """
         try:
-            # Access specified collection from the default or specified database
-            if database_name is None:
-                collection = self.mongo_client.database[collection_name]
-            else:
-                collection = self.mongo_client[database_name][collection_name]
-
-            # Convert collection data to DataFrame and preprocess
             print("Fetching data from mongoDB")
-            df = pd.DataFrame(list(collection.find()))
+            chunks = list(self.export_collection_as_chunks(collection_name=collection_name,
+                                                           database_name=database_name,
+                                                           batch_size=batch_size, sort=sort))
+            df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
             print(f"Data fecthed with len: {len(df)}")
-            if "id" in df.columns.to_list():
-                df = df.drop(columns=["id"], axis=1)
-            df.replace({"na":np.nan},inplace=True)
             return df
 
         except Exception as e:
-            raise MyException(e, sys)
\ No newline at end of file
+            raise MyException(e, sys)
+
+    @staticmethod
+    def _partition_sort(partition_field: str) -> List[Tuple[str, int]]:
+        """
+        Sort used inside a partition; '_id' breaks ties so the order is deterministic for non-unique fields.
+        """
+        if partition_field == "_id":
+            return [("_id", 1)]
+        return [(partition_field, 1), ("_id", 1)]
+
+    def get_partition_bounds(self, collection_name: str, n_partitions: int,
+                             partition_field: str = DATA_INGESTION_PARTITION_FIELD,
+                             database_name: Optional[str] = None,
+                             query: Optional[dict] = None) -> List[Tuple[Optional[object], Optional[object]]]:
+        """
+        Splits the collection into contiguous [lower, upper) ranges of `partition_field` holding about the same
+        number of matching documents. The first range has no lower bound and the last one no upper bound.
+
+        Boundaries are looked up on the (indexed) partition field only, one document per boundary.
+        """
+        try:
+            collection = self._get_collection(collection_name, database_name)
+            query = query or {}
+            total_documents = collection.count_documents(query)
+            boundaries = []
+            for partition in range(1, n_partitions):
+                cursor = (collection.find(query, {partition_field: 1})
+                          .sort(partition_field, 1)
+                          .skip(partition * total_documents // n_partitions)
+                          .limit(1))
+                for document in cursor:
+                    value = document.get(partition_field)
+                    if value is not None and (not boundaries or value > boundaries[-1]):
+                        boundaries.append(value)
+
+            lower_bounds = [None] + boundaries
+            upper_bounds = boundaries + [None]
+            return list(zip(lower_bounds, upper_bounds))
+        except Exception as e:
+            raise MyException(e, sys)
+
+    @staticmethod
+    def _range_query(partition_field: str, bounds: Tuple[Optional[object], Optional[object]]) -> dict:
+        lower, upper = bounds
+        condition = {}
+        if lower is not None:
+            condition["$gte"] = lower
+        if upper is not None:
+            condition["$lt"] = upper
+        return {partition_field: condition} if condition else {}
+
+    def get_partition_queries(self, collection_name: str, n_partitions: int,
+                              partition_field: str = DATA_INGESTION_PARTITION_FIELD,
+                              database_name: Optional[str] = None, query: Optional[dict] = None) -> List[dict]:
+        """
+        Filter documents of the partitions, in sort order of `partition_field`: one per range of
+        `get_partition_bounds`, preceded, for a field other than '_id', by one for the documents where the field
+        is null or missing, which no $gte/$lt range matches.
+        """
+        bounds = self.get_partition_bounds(collection_name=collection_name, n_partitions=n_partitions,
+                                           partition_field=partition_field, database_name=database_name, query=query)
+        partition_queries = [self._range_query(partition_field, partition_bounds) for partition_bounds in bounds]
+        if partition_field != "_id":
+            # A single unbounded range would also match the null partition
+            partition_queries = [{partition_field: None}] + [partition_query or {partition_field: {"$ne": None}}
+                                                             for partition_query in partition_queries]
+        if query:
+            partition_queries = [{"$and": [query, partition_query]} if partition_query else query
+                                 for partition_query in partition_queries]
+        return partition_queries
+
+    @staticmethod
+    def _put(output: queue.Queue, item, stop: threading.Event) -> bool:
+        """
+        Puts an item on a bounded queue, waiting for room unless the consumer has stopped.
+        """
+        while not stop.is_set():
+            try:
+                output.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _export_partition(self, collection_name: str, database_name: Optional[str], partition_field: str,
+                          partition_query: dict, batch_size: int, projection: Optional[List[str]],
+                          drop_columns: Sequence[str], output: queue.Queue, stop: threading.Event) -> None:
+        """
+        Streams one partition to `output` as chunks followed by a PartitionDone, or by the error that ended it.
+        The reader blocks while the queue is full and gives up once `stop` is set.
+        """
+        start_time = time.perf_counter()
+        rows = 0
+        try:
+            for chunk in self.export_collection_as_chunks(collection_name=collection_name, database_name=database_name,
+                                                          batch_size=batch_size, query=partition_query,
+                                                          sort=self._partition_sort(partition_field),
+                                                          projection=projection, drop_columns=drop_columns):
+                if not self._put(output, chunk, stop):
+                    return
+                rows += len(chunk)
+            self._put(output, PartitionDone(rows, time.perf_counter() - start_time), stop)
+        except Exception as e:
+            self._put(output, e, stop)
+
+    def export_collection_as_partitions(self, collection_name: str, database_name: Optional[str] = None,
+                                        n_partitions: int = 4, max_workers: Optional[int] = None,
+                                        partition_field: str = DATA_INGESTION_PARTITION_FIELD,
+                                        batch_size: int = DATA_INGESTION_BATCH_SIZE, query: Optional[dict] = None,
+                                        projection: Optional[List[str]] = None,
+                                        drop_columns: Sequence[str] = ("id",),
+                                        max_pending_chunks: int = 2) -> Iterator[pd.DataFrame]:
+        """
+        Reads the collection as `n_partitions` ranges of `partition_field` concurrently and streams their chunks
+        in order.
+
+        All partitions go through the shared MongoDBClient connection pool from a bounded thread pool. Each
+        reader streams its partition into a queue of at most `max_pending_chunks` chunks and waits while it is
+        full, and chunks are yielded partition after partition, so at most max_workers * (max_pending_chunks + 1)
+        chunks are in memory whatever the size of the collection. Partitions are sorted by the partition field
+        inside, so the concatenated chunks are the same as a sequential export sorted by that field.
+
+        Parameters:
+        ----------
+        collection_name : str
+            The name of the MongoDB collection to export.
+        database_name : Optional[str]
+            Name of the database (optional). Defaults to DATABASE_NAME.
+        n_partitions : int
+            Number of ranges the collection is split into.
+        max_workers : Optional[int]
+            Maximum number of concurrent partition reads. Defaults to `n_partitions`.
+        partition_field : str
+            Indexed field used to build the ranges. Defaults to '_id'. For any other field, documents where it
+            is null or missing are read as one more partition, first in sort order.
+        batch_size : int
+            Number of documents per cursor round-trip and per yielded chunk.
+        query : Optional[dict]
+            Filter document executed on the server (optional). Defaults to the whole collection.
+        projection : Optional[List[str]]
+            Fields to fetch (optional). Defaults to all fields.
+        drop_columns : Sequence[str]
+            Columns removed from every chunk. Defaults to 'id'.
+        max_pending_chunks : int
+            Chunks a partition reader may read ahead of the consumer.
+
+        Yields:
+        -------
+        pd.DataFrame
+            Chunks of at most `batch_size` rows, with 'id' column removed and 'na' values replaced with NaN.
+        """
+        stop = threading.Event()
+        executor = None
+        try:
+            partition_queries = self.get_partition_queries(collection_name=collection_name, n_partitions=n_partitions,
+                                                           partition_field=partition_field,
+                                                           database_name=database_name, query=query)
+            logging.info(f"Reading {len(partition_queries)} partitions of {collection_name} on {partition_field}")
+            outputs = [queue.Queue(maxsize=max(1, max_pending_chunks)) for _ in partition_queries]
+            executor = ThreadPoolExecutor(max_workers=max_workers or len(partition_queries))
+            # Submitted in order, so the partition being consumed is always running or done
+            for partition_query, output in zip(partition_queries, outputs):
+                executor.submit(self._export_partition, collection_name, database_name, partition_field,
+                                partition_query, batch_size, projection, drop_columns, output, stop)
+            for partition, output in enumerate(outputs):
+                while True:
+                    item = output.get()
+                    if isinstance(item, Exception):
+                        raise item
+                    if isinstance(item, PartitionDone):
+                        logging.info(f"Partition {partition}: {item.rows} rows in {item.seconds:.2f}s "
+                                     f"({item.rows / max(item.seconds, 1e-9):.0f} rows/s)")
+                        break
+                    yield item
+        except Exception as e:
+            raise MyException(e, sys)
+        finally:
+            stop.set()
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+    def export_collection_parallel(self, collection_name: str, database_name: Optional[str] = None,
+                                   n_partitions: int = 4, max_workers: Optional[int] = None,
+                                   partition_field: str = DATA_INGESTION_PARTITION_FIELD,
+                                   batch_size: int = DATA_INGESTION_BATCH_SIZE) -> pd.DataFrame:
+        """
+        Exports an entire MongoDB collection as a pandas DataFrame using concurrent partitioned reads.
+        See `export_collection_as_partitions` for the parameters.
+        """
+        try:
+            partitions = list(self.export_collection_as_partitions(collection_name=collection_name,
+                                                                   database_name=database_name,
+                                                                   n_partitions=n_partitions,
+                                                                   max_workers=max_workers,
+                                                                   partition_field=partition_field,
+                                                                   batch_size=batch_size))
+            return pd.concat(partitions, ignore_index=True) if partitions else pd.DataFrame()
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def benchmark_parallel_export(self, collection_name: str, partition_counts: Sequence[int] = (1, 2, 4, 8),
+                                  partition_field: str = DATA_INGESTION_PARTITION_FIELD,
+                                  database_name: Optional[str] = None,
+                                  batch_size: int = DATA_INGESTION_BATCH_SIZE) -> Dict[int, float]:
+        """
+        Measures export throughput (rows/s) for each partition count and checks that every parallel export
+        matches the sequential export sorted by the partition field.
+
+        Returns:
+        -------
+        Dict[int, float]
+            Rows per second keyed by partition count.
+        """
+        try:
+            start_time = time.perf_counter()
+            sequential_df = self.export_collection_as_dataframe(collection_name=collection_name,
+                                                                database_name=database_name, batch_size=batch_size,
+                                                                sort=self._partition_sort(partition_field))
+            elapsed = time.perf_counter() - start_time
+            logging.info(f"Sequential export: {len(sequential_df) / max(elapsed, 1e-9):.0f} rows/s")
+
+            results = {}
+            for n_partitions in partition_counts:
+                start_time = time.perf_counter()
+                parallel_df = self.export_collection_parallel(collection_name=collection_name,
+                                                              database_name=database_name,
+                                                              n_partitions=n_partitions,
+                                                              partition_field=partition_field,
+                                                              batch_size=batch_size)
+                elapsed = time.perf_counter() - start_time
+                if not parallel_df.equals(sequential_df):
+                    raise Exception(f"Parallel export with {n_partitions} partitions differs from the sequential export")
+                results[n_partitions] = len(parallel_df) / max(elapsed, 1e-9)
+                logging.info(f"{n_partitions} partitions: {results[n_partitions]:.0f} rows/s")
+            return results
+        except Exception as e:
+            raise MyException(e, sys)
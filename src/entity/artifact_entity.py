@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Dict, Optional
 
 @dataclass
 class DataIngestionArtifact:
@@ -8,10 +9,43 @@ class DataIngestionArtifact:
 @dataclass
 class DataValidationArtifact:
     validattion_status:bool
-    validation_report_path:str
+    message: str
+    validation_report_file_path:str
+    drift_profile_file_path: str
 
 @dataclass
 class DataTransformationArtifact:
     transformed_train_file_path:str
     transformed_test_file_path:str
-    transformed_object_file_path:str
\ No newline at end of file
+    transformed_object_file_path:str
+    transformed_validation_file_path: Optional[str] = None
+    class_weights: Optional[Dict[int, float]] = None
+    resampling_strategy: Optional[str] = None
+
+@dataclass
+class ClassificationMetricArtifact:
+    f1_score:float
+    precision_score:float
+    recall_score:float
+
+@dataclass
+class ModelTrainerArtifact:
+    trained_model_file_path:str
+    metric_artifact:ClassificationMetricArtifact
+    training_report_file_path: Optional[str] = None
+    leaderboard_file_path: Optional[str] = None
+    compact_model_dir: Optional[str] = None
+
+@dataclass
+class ModelEvaluationArtifact:
+    is_model_accepted:bool
+    changed_accuracy:float
+    production_model_path:Optional[str]
+    trained_model_path:str
+    evaluation_report_file_path: Optional[str] = None
+
+@dataclass
+class ModelPusherArtifact:
+    bucket_name:str
+    s3_model_path:str
+    s3_drift_profile_path: Optional[str] = None
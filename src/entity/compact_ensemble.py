@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+
+import numpy as np
+from scipy.special import expit
+from typing import Optional
+
+from src.exception import MyException
+from src.logger import logging
+from src.utils.main_utils import replace_on_success, save_numpy_array_data
+
+COMPACT_FORMAT_VERSION = 1
+ARRAY_NAMES = ["feature", "threshold", "first_child", "missing_go_to_left", "value", "roots"]
+META_FILE_NAME = "meta.json"
+
+
+class CompactTreeEnsemble:
+    """
+    Tree ensemble flattened into contiguous arrays indexed by a global node id:
+
+    - feature, threshold: split of every node, a row goes left when x[feature] <= threshold
+    - missing_go_to_left: side taken by NaN values
+    - first_child: the two children of a node are adjacent, so a row moves to first_child + (goes right).
+      Leaves point to themselves with an infinite threshold, so traversal runs a fixed number of steps.
+    - value: class probabilities of random forest leaves, raw scores of gradient boosting leaves
+    - roots: root node of every tree
+
+    Each array is stored as its own .npy file, so an ensemble loads with mmap_mode="r" in milliseconds
+    and server workers share it through the page cache. Predictions walk all trees for a block of rows
+    at once and add up the trees in the order scikit-learn does, so they match the original model.
+    """
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.arrays = arrays
+        self.meta = meta
+        self.classes_ = np.asarray(meta["classes"])
+        self.feature, self.threshold = arrays["feature"], arrays["threshold"]
+        self.first_child, self.missing_go_to_left = arrays["first_child"], arrays["missing_go_to_left"]
+        self.value, self.roots = arrays["value"], arrays["roots"]
+
+    @staticmethod
+    def _flatten_tree(feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                      missing_go_to_left: np.ndarray, value: np.ndarray, offset: int):
+        """
+        Renumbers one tree breadth first so that siblings get consecutive ids starting at `offset`.
+        """
+        order, new_id = [0], {0: 0}
+        for node in order:
+            if left[node] >= 0:
+                for child in (left[node], right[node]):
+                    new_id[int(child)] = len(order)
+                    order.append(int(child))
+        order = np.asarray(order)
+        is_leaf = left[order] < 0
+        first_child = [offset + (index if leaf else new_id[int(left[node])])
+                       for index, (node, leaf) in enumerate(zip(order, is_leaf))]
+        return {"feature": np.where(is_leaf, 0, feature[order]).astype(np.int32),
+                "threshold": np.where(is_leaf, np.inf, threshold[order]).astype(np.float64),
+                "first_child": np.asarray(first_child, dtype=np.int32),
+                "missing_go_to_left": np.where(is_leaf, True, missing_go_to_left[order].astype(bool)),
+                "value": np.asarray(value, dtype=np.float64)[order]}
+
+    @classmethod
+    def from_model(cls, model) -> "CompactTreeEnsemble":
+        """
+        Flattens a fitted RandomForestClassifier or binary HistGradientBoostingClassifier.
+        """
+        try:
+            model_type = type(model).__name__
+            trees = []
+            if model_type == "RandomForestClassifier":
+                kind, baseline = "random_forest", 0.0
+                for estimator in model.estimators_:
+                    tree = estimator.tree_
+                    value = tree.value[:, 0, :].astype(np.float64)
+                    normalizer = value.sum(axis=1, keepdims=True)
+                    normalizer[normalizer == 0.0] = 1.0
+                    trees.append((tree.feature, tree.threshold, tree.children_left, tree.children_right,
+                                  tree.missing_go_to_left, value / normalizer))
+            elif model_type == "HistGradientBoostingClassifier":
+                if len(model.classes_) != 2:
+                    raise ValueError("Only binary gradient boosting models can be exported")
+                kind, baseline = "gradient_boosting", float(np.ravel(model._baseline_prediction)[0])
+                for (predictor,) in model._predictors:
+                    nodes = predictor.nodes
+                    if nodes["is_categorical"].any():
+                        raise ValueError("Categorical splits are not supported by the compact format")
+                    is_leaf = nodes["is_leaf"].astype(bool)
+                    trees.append((nodes["feature_idx"], nodes["num_threshold"],
+                                  np.where(is_leaf, -1, nodes["left"].astype(np.int64)),
+                                  np.where(is_leaf, -1, nodes["right"].astype(np.int64)),
+                                  nodes["missing_go_to_left"], nodes["value"][:, None]))
+            else:
+                raise ValueError(f"Unsupported model type {model_type}")
+
+            flat_trees, roots, offset = [], [], 0
+            for tree in trees:
+                flat_trees.append(cls._flatten_tree(*tree, offset=offset))
+                roots.append(offset)
+                offset += len(flat_trees[-1]["feature"])
+
+            arrays = {name: np.concatenate([tree[name] for tree in flat_trees]) for name in ARRAY_NAMES[:-1]}
+            arrays["roots"] = np.asarray(roots, dtype=np.int32)
+            meta = {"version": COMPACT_FORMAT_VERSION, "kind": kind, "classes": model.classes_.tolist(),
+                    "n_features": int(model.n_features_in_), "n_trees": len(trees), "n_nodes": offset,
+                    "max_depth": cls._max_depth(arrays), "baseline": baseline}
+            return cls(arrays, meta)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @staticmethod
+    def _max_depth(arrays: dict) -> int:
+        """
+        Number of steps after which every row has reached a leaf in every tree.
+        """
+        first_child = arrays["first_child"]
+        node, depth = arrays["roots"].astype(np.int64), 0
+        while True:
+            node = node[first_child[node] != node]
+            if len(node) == 0:
+                return depth
+            node, depth = np.concatenate([first_child[node], first_child[node] + 1]), depth + 1
+
+    def save(self, directory: str) -> None:
+        try:
+            os.makedirs(directory, exist_ok=True)
+            for name in ARRAY_NAMES:
+                save_numpy_array_data(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(self.arrays[name]))
+            with replace_on_success(os.path.join(directory, META_FILE_NAME)) as temporary_file_path:
+                with open(temporary_file_path, "w") as file:
+                    json.dump(self.meta, file)
+            logging.info(f"Saved compact {self.meta['kind']} ensemble of {self.meta['n_trees']} trees "
+                         f"({self.meta['n_nodes']} nodes) at {directory}")
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = "r") -> "CompactTreeEnsemble":
+        try:
+            start_time = time.perf_counter()
+            with open(os.path.join(directory, META_FILE_NAME), "r") as file:
+                meta = json.load(file)
+            if meta["version"] != COMPACT_FORMAT_VERSION:
+                raise ValueError(f"Compact ensemble version {meta['version']} is not supported")
+            arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAY_NAMES}
+            logging.info(f"Loaded compact ensemble from {directory} in {(time.perf_counter() - start_time) * 1e3:.2f} ms")
+            return cls(arrays, meta)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """
+        Walks every tree for every row in lockstep; returns the leaf values as (trees, rows, outputs).
+        X is transposed so that the rows read at each step come from one feature column.
+        """
+        n_rows = len(X)
+        flat_X = np.ascontiguousarray(X.T).ravel()
+        row_index = np.arange(n_rows, dtype=np.intp)
+        node = np.repeat(self.roots.astype(np.intp)[:, None], n_rows, axis=1)
+        for _ in range(self.meta["max_depth"]):
+            x = np.take(flat_X, np.take(self.feature, node) * n_rows + row_index)
+            go_left = np.less_equal(x, np.take(self.threshold, node))
+            go_left |= np.isnan(x) & np.take(self.missing_go_to_left, node)
+            node = np.take(self.first_child, node).astype(np.intp)
+            node += ~go_left
+        return np.take(self.value, node, axis=0)
+
+    def _raw_predict(self, X: np.ndarray, block_size: int = 512) -> np.ndarray:
+        """
+        Sum of the leaf values over the trees (plus the baseline for gradient boosting), computed block by
+        block so the (trees, rows) working arrays stay in cache.
+        """
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.meta["n_features"]:
+            raise ValueError(f"Expected an array with {self.meta['n_features']} features, got shape {X.shape}")
+        raw = np.empty((len(X), self.value.shape[1]), dtype=np.float64)
+        for start in range(0, len(X), block_size):
+            leaf_values = self._leaf_values(X[start:start + block_size])
+            # Trees are added one at a time, in order, as scikit-learn accumulates them
+            total = np.zeros(leaf_values.shape[1:], dtype=np.float64)
+            if self.meta["kind"] == "gradient_boosting":
+                total += self.meta["baseline"]
+            for tree_values in leaf_values:
+                total += tree_values
+            raw[start:start + block_size] = total
+        return raw
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        raw = self._raw_predict(X)
+        if self.meta["kind"] == "random_forest":
+            return raw / self.meta["n_trees"]
+        positive = expit(raw[:, 0])
+        return np.column_stack([1 - positive, positive])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        raw = self._raw_predict(X)
+        if self.meta["kind"] == "random_forest":
+            return self.classes_[np.argmax(raw, axis=1)]
+        # "> 0" as scikit-learn, so a raw score of exactly 0 predicts the first class
+        return self.classes_[(raw[:, 0] > 0).astype(int)]
+
+    def __repr__(self) -> str:
+        return f"CompactTreeEnsemble(kind={self.meta['kind']}, trees={self.meta['n_trees']}, nodes={self.meta['n_nodes']})"
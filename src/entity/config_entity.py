@@ -1,19 +1,42 @@
 import os
 from src.constants import *
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields, replace
 from datetime import datetime
+from typing import List, Optional
 
-TIMESTAMP: str = datetime.now().strftime("%m_%d_%Y_%H_%M_%S")
+TIMESTAMP: str = datetime.now().strftime(ARTIFACT_TIMESTAMP_FORMAT)
 
 @dataclass
 class TrainingPipelineConfig:
     pipeline_name: str = PIPE_LINE_NAME
     artifact_dir: str = os.path.join(ARTIFACT_DIR, TIMESTAMP)
     timestamp: str = TIMESTAMP
+    use_artifact_store: bool = ARTIFACT_STORE_ENABLED
 
 
 training_pipeline_config: TrainingPipelineConfig = TrainingPipelineConfig()
 
+
+def new_training_pipeline_config() -> TrainingPipelineConfig:
+    """
+    Pipeline config of a new run, with its own timestamped artifact dir.
+    """
+    timestamp = datetime.now().strftime(ARTIFACT_TIMESTAMP_FORMAT)
+    return TrainingPipelineConfig(artifact_dir=os.path.join(ARTIFACT_DIR, timestamp), timestamp=timestamp)
+
+
+def rebase_config(config, run_config: TrainingPipelineConfig):
+    """
+    Copy of a stage config whose paths under the import-time run dir point into the artifact dir of run_config.
+    """
+    prefix = training_pipeline_config.artifact_dir
+    changes = {}
+    for config_field in fields(config):
+        value = getattr(config, config_field.name)
+        if isinstance(value, str) and (value == prefix or value.startswith(prefix + os.sep)):
+            changes[config_field.name] = run_config.artifact_dir + value[len(prefix):]
+    return replace(config, **changes)
+
 @dataclass
 class DataIngestionConfig:
     data_ingestion_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_INGESTION_DIR_NAME)
@@ -21,23 +44,132 @@ class DataIngestionConfig:
     training_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TRAIN_FILE_NAME)
     testing_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TEST_FILE_NAME)
     train_test_split_ratio: float = DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
+    split_key: str = DATA_INGESTION_SPLIT_KEY
+    split_stratify_column: Optional[str] = DATA_INGESTION_SPLIT_STRATIFY_COLUMN
     collection_name:str = DATA_INGESTION_COLLECTION_NAME
+    batch_size: int = DATA_INGESTION_BATCH_SIZE
+    incremental: bool = DATA_INGESTION_INCREMENTAL
+    n_partitions: int = DATA_INGESTION_N_PARTITIONS
+    max_workers: int = DATA_INGESTION_MAX_WORKERS
+    partition_field: str = DATA_INGESTION_PARTITION_FIELD
+    query_filter: Optional[dict] = DATA_INGESTION_QUERY_FILTER
+    projection_columns: Optional[List[str]] = DATA_INGESTION_PROJECTION_COLUMNS
+    sample_size: Optional[int] = DATA_INGESTION_SAMPLE_SIZE
+    sample_stratify_column: Optional[str] = DATA_INGESTION_SAMPLE_STRATIFY_COLUMN
+    row_limit: Optional[int] = DATA_INGESTION_ROW_LIMIT
+    snapshot_file_path: str = os.path.join(DATA_INGESTION_SNAPSHOT_DIR, DATA_INGESTION_SNAPSHOT_FILE_NAME)
+    watermark_file_path: str = os.path.join(DATA_INGESTION_SNAPSHOT_DIR, DATA_INGESTION_WATERMARK_FILE_NAME)
+    watermark_field: str = DATA_INGESTION_WATERMARK_FIELD
 
 @dataclass
 class DataValidationConfig:
     data_validation_dir : str = os.path.join(training_pipeline_config.artifact_dir, DATA_VALIDATION_DIR_NAME)
     validation_report_file_path : str = os.path.join(data_validation_dir, DATA_VALIDATION_REPORT_FILE_NAME)
+    batch_size: int = DATA_VALIDATION_BATCH_SIZE
+    max_null_rate: float = DATA_VALIDATION_MAX_NULL_RATE
+    drift_profile_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_DRIFT_PROFILE_FILE_NAME)
+    reference_profile_file_path: str = DATA_VALIDATION_REFERENCE_PROFILE_FILE_PATH
+    reference_profile_bucket_name: str = MODEL_BUCKET_NAME
+    reference_profile_s3_key_path: str = MODEL_REGISTRY_DRIFT_PROFILE_KEY
+    drift_psi_threshold: float = DATA_VALIDATION_DRIFT_PSI_THRESHOLD
+    drift_detection: bool = DATA_VALIDATION_DRIFT_DETECTION
+    use_cache: bool = STAGE_CACHE_ENABLED
 
 
 @dataclass
-class DataTransformation:
+class DataTransformationConfig:
     data_transformation_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_TRANSFOMATION_DIR_NAME)
     transformed_train_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-                                                    TRAIN_FILE_NAME.replace("csv", "npy"))
+                                                    TRAIN_FILE_NAME.replace("parquet", "npy"))
     transformed_test_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-                                                   TEST_FILE_NAME.replace("csv", "npy"))
+                                                   TEST_FILE_NAME.replace("parquet", "npy"))
+    transformed_validation_file_path: str = os.path.join(data_transformation_dir,
+                                                         DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                         DATA_TRANSFORMATION_VALIDATION_FILE_NAME)
     transformed_object_file_path: str = os.path.join(data_transformation_dir,
                                                      DATA_TRANSFORMATION_TRANSFROMED_OBJECT_DIR,
                                                      PREPROCESSING_OBJECT_FILE_NAME)
+    out_of_core: bool = DATA_TRANSFORMATION_OUT_OF_CORE
+    batch_size: int = DATA_TRANSFORMATION_BATCH_SIZE
+    resampling_strategy: str = DATA_TRANSFORMATION_RESAMPLING_STRATEGY
+    resampling_n_jobs: int = DATA_TRANSFORMATION_RESAMPLING_N_JOBS
+    resampling_partition_size: int = DATA_TRANSFORMATION_RESAMPLING_PARTITION_SIZE
+    random_state: int = DATA_TRANSFORMATION_RANDOM_STATE
+    validation_fraction: float = DATA_TRANSFORMATION_VALIDATION_FRACTION
+    use_cache: bool = STAGE_CACHE_ENABLED
+
     
-    
\ No newline at end of file
+
+@dataclass
+class ModelTrainerConfig:
+    model_trainer_dir: str = os.path.join(training_pipeline_config.artifact_dir, MODEL_TRAINER_DIR_NAME)
+    trained_model_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_TRAINED_MODEL_DIR, MODEL_FILE_NAME)
+    training_report_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_REPORT_FILE_NAME)
+    leaderboard_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_LEADERBOARD_FILE_NAME)
+    compact_model_dir: str = os.path.join(model_trainer_dir, MODEL_TRAINER_TRAINED_MODEL_DIR, MODEL_TRAINER_COMPACT_MODEL_DIR)
+    expected_accuracy: float = MODEL_TRAINER_EXPECTED_SCORE
+    model_config_file_path: str = MODEL_TRAINER_MODEL_CONFIG_FILE_PATH
+    n_jobs: int = MODEL_TRAINER_N_JOBS
+    backend: str = MODEL_TRAINER_BACKEND
+    tree_batch_size: int = MODEL_TRAINER_TREE_BATCH_SIZE
+    early_stopping_patience: int = MODEL_TRAINER_EARLY_STOPPING_PATIENCE
+    early_stopping_tolerance: float = MODEL_TRAINER_EARLY_STOPPING_TOLERANCE
+    _n_estimators = MODEL_TRAINER_N_ESTIMATORS
+    _min_samples_split = MODEL_TRAINER_MIN_SAMPLES_SPLIT
+    _min_samples_leaf = MODEL_TRAINER_MIN_SAMPLES_LEAF
+    _max_depth = MIN_SAMPLES_SPLIT_MAX_DEPTH
+    _criterion = MIN_SAMPLE_SPLIT_CRITERION
+    _random_state = MIN_SAMPLES_SPLIT_RANDOM_STATE
+    _hgb_learning_rate = MODEL_TRAINER_HGB_LEARNING_RATE
+    _hgb_max_leaf_nodes = MODEL_TRAINER_HGB_MAX_LEAF_NODES
+    _hgb_min_samples_leaf = MODEL_TRAINER_HGB_MIN_SAMPLES_LEAF
+    _hgb_l2_regularization = MODEL_TRAINER_HGB_L2_REGULARIZATION
+
+
+@dataclass
+class ModelEvaluationConfig:
+    model_evaluation_dir: str = os.path.join(training_pipeline_config.artifact_dir, MODEL_EVALUATION_DIR_NAME)
+    evaluation_report_file_path: str = os.path.join(model_evaluation_dir, MODEL_EVALUATION_REPORT_FILE_NAME)
+    bucket_name: str = MODEL_BUCKET_NAME
+    s3_model_key_path: str = MODEL_REGISTRY_MODEL_KEY
+    changed_threshold_score: float = MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE
+    batch_size: int = MODEL_EVALUATION_BATCH_SIZE
+    n_workers: int = MODEL_EVALUATION_N_WORKERS
+    bootstrap_resamples: int = MODEL_EVALUATION_BOOTSTRAP_RESAMPLES
+    confidence_level: float = MODEL_EVALUATION_CONFIDENCE_LEVEL
+    random_state: int = MODEL_EVALUATION_RANDOM_STATE
+    use_cache: bool = STAGE_CACHE_ENABLED
+
+
+@dataclass
+class ModelPusherConfig:
+    bucket_name: str = MODEL_BUCKET_NAME
+    s3_model_key_path: str = MODEL_REGISTRY_MODEL_KEY
+    s3_drift_profile_key_path: str = MODEL_REGISTRY_DRIFT_PROFILE_KEY
+    reference_profile_file_path: str = DATA_VALIDATION_REFERENCE_PROFILE_FILE_PATH
+
+
+@dataclass
+class VehiclePredictorConfig:
+    model_file_path: str = MODEL_REGISTRY_MODEL_KEY
+    model_bucket_name: str = MODEL_BUCKET_NAME
+    max_batch_size: int = PREDICTION_MAX_BATCH_SIZE
+    max_batch_delay_ms: float = PREDICTION_MAX_BATCH_DELAY_MS
+    metrics_window: int = PREDICTION_METRICS_WINDOW
+    use_compact_model: bool = PREDICTION_USE_COMPACT_MODEL
+    watch_interval_seconds: float = PREDICTION_MODEL_WATCH_INTERVAL_SECONDS
+    shadow_sample_rate: float = PREDICTION_SHADOW_SAMPLE_RATE
+    shadow_min_records: int = PREDICTION_SHADOW_MIN_RECORDS
+    shadow_min_agreement: float = PREDICTION_SHADOW_MIN_AGREEMENT
+    shadow_max_positive_rate_drift: float = PREDICTION_SHADOW_MAX_POSITIVE_RATE_DRIFT
+    shadow_max_errors: int = PREDICTION_SHADOW_MAX_ERRORS
+
+
+@dataclass
+class BatchPredictionConfig:
+    predictor_config: VehiclePredictorConfig = field(default_factory=VehiclePredictorConfig)
+    chunk_size: int = BATCH_PREDICTION_CHUNK_SIZE
+    n_workers: int = BATCH_PREDICTION_N_WORKERS
+    max_pending_chunks: int = BATCH_PREDICTION_MAX_PENDING_CHUNKS
+    output_column: str = BATCH_PREDICTION_OUTPUT_COLUMN
+    upload_dir: str = BATCH_PREDICTION_UPLOAD_DIR
@@ -0,0 +1,55 @@
+import sys
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from src.exception import MyException
+from src.logger import logging
+
+
+class MyModel:
+    def __init__(self, preprocessing_object: object, trained_model_object: object):
+        """
+        :param preprocessing_object: Input Object of preprocesser (fitted FeatureEncoder)
+        :param trained_model_object: Input Object of trained model
+        """
+        self.preprocessing_object = preprocessing_object
+        self.trained_model_object = trained_model_object
+
+    def predict(self, dataframe: pd.DataFrame):
+        """
+        Function accepts raw insurance records as a dataframe, encodes them with preprocessing_object
+        and performs prediction on the encoded features.
+        """
+        try:
+            logging.info("Starting prediction process.")
+
+            # Step 1: Encode the raw records into the fixed feature layout of the trained model
+            transformed_feature = self.preprocessing_object.transform(dataframe)
+
+            # Step 2: Perform prediction using the trained model
+            logging.info("Using the trained model to get predictions")
+            predictions = self.trained_model_object.predict(transformed_feature)
+
+            return predictions
+
+        except Exception as e:
+            logging.error("Error occurred in predict method", exc_info=True)
+            raise MyException(e, sys) from e
+
+    def predict_records(self, records: List[dict]) -> np.ndarray:
+        """
+        Predicts a list of raw records (e.g. request payloads) without building a DataFrame.
+        """
+        try:
+            transformed_feature = self.preprocessing_object.transform_records(records)
+            return self.trained_model_object.predict(transformed_feature)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def __repr__(self):
+        return f"{type(self.trained_model_object).__name__}()"
+
+    def __str__(self):
+        return f"{type(self.trained_model_object).__name__}()"
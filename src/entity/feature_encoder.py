@@ -0,0 +1,180 @@
+import sys
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Mapping, Optional, Union
+
+from src.exception import MyException
+from src.logger import logging
+
+ENCODER_VERSION = 1
+
+
+class FeatureEncoder:
+    """
+    Fixed-layout encoder turning raw insurance records into a float32 feature matrix.
+
+    The output columns are fixed by schema.yaml, not by the categories present in a batch:
+    standard-scaled columns (num_features), min-max scaled columns (mm_columns), the remaining numerical
+    columns as they are, binary-mapped categorical columns (binary_columns) and one indicator column per
+    listed category (one_hot_columns). Scaling is folded into one multiply-add per column and every column
+    is written straight into a preallocated array, so a single record and a large batch go through exactly
+    the same code path and give identical values.
+    """
+
+    def __init__(self, standard_columns: List[str], minmax_columns: List[str], passthrough_columns: List[str],
+                 binary_columns: Dict[str, Dict[str, float]], one_hot_columns: Dict[str, Dict[str, str]]):
+        self.version = ENCODER_VERSION
+        self.standard_columns = list(standard_columns)
+        self.minmax_columns = list(minmax_columns)
+        self.passthrough_columns = list(passthrough_columns)
+        self.binary_columns = {column: dict(mapping) for column, mapping in binary_columns.items()}
+        self.one_hot_columns = {column: dict(mapping) for column, mapping in one_hot_columns.items()}
+        self.numeric_columns = self.standard_columns + self.minmax_columns + self.passthrough_columns
+        self.feature_names = (self.numeric_columns + list(self.binary_columns)
+                              + [name for mapping in self.one_hot_columns.values() for name in mapping.values()])
+        # out = value * scale + offset for numeric columns; identity until fitted
+        self.scale = np.ones(len(self.numeric_columns), dtype=np.float64)
+        self.offset = np.zeros(len(self.numeric_columns), dtype=np.float64)
+        self.is_fitted = False
+        self._reset_statistics()
+
+    def _reset_statistics(self) -> None:
+        columns = len(self.numeric_columns)
+        self.n_samples_seen = np.zeros(columns, dtype=np.int64)
+        self.mean = np.zeros(columns, dtype=np.float64)
+        self.m2 = np.zeros(columns, dtype=np.float64)
+        self.data_min = np.full(columns, np.inf)
+        self.data_max = np.full(columns, -np.inf)
+
+    @classmethod
+    def from_schema(cls, schema_config: dict, target_column: str) -> "FeatureEncoder":
+        scaled_columns = set(schema_config["num_features"]) | set(schema_config["mm_columns"])
+        excluded_columns = scaled_columns | set(schema_config["drop_columns"]) | {target_column}
+        return cls(standard_columns=schema_config["num_features"],
+                   minmax_columns=schema_config["mm_columns"],
+                   passthrough_columns=[column for column in schema_config["numerical_columns"]
+                                        if column not in excluded_columns],
+                   binary_columns=schema_config.get("binary_columns") or {},
+                   one_hot_columns=schema_config.get("one_hot_columns") or {})
+
+    @property
+    def input_columns(self) -> List[str]:
+        return self.numeric_columns + list(self.binary_columns) + list(self.one_hot_columns)
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_names)
+
+    @staticmethod
+    def _numeric_values(values) -> np.ndarray:
+        if isinstance(values, pd.Series):
+            return values.to_numpy(dtype=np.float64, na_value=np.nan)
+        return np.asarray(values, dtype=np.float64)
+
+    def partial_fit(self, dataframe: pd.DataFrame) -> "FeatureEncoder":
+        """
+        Folds one chunk into the running count, mean, sum of squared deviations (merged with Chan's
+        parallel update), minimum and maximum of every numeric column, then refreshes the folded scaling:
+        (x - mean) / std for standard columns, (x - min) / (max - min) for min-max columns. Constant
+        columns get a unit scale, as scikit-learn's scalers do.
+        """
+        try:
+            for index, column in enumerate(self.numeric_columns):
+                values = self._numeric_values(dataframe[column])
+                values = values[~np.isnan(values)]
+                if len(values) == 0:
+                    continue
+                count, chunk_mean = len(values), values.mean()
+                chunk_m2 = np.square(values - chunk_mean).sum()
+                total = self.n_samples_seen[index] + count
+                delta = chunk_mean - self.mean[index]
+                self.mean[index] += delta * count / total
+                self.m2[index] += chunk_m2 + delta * delta * self.n_samples_seen[index] * count / total
+                self.n_samples_seen[index] = total
+                self.data_min[index] = min(self.data_min[index], values.min())
+                self.data_max[index] = max(self.data_max[index], values.max())
+
+            for index, column in enumerate(self.numeric_columns):
+                if self.n_samples_seen[index] == 0:
+                    continue
+                if column in self.standard_columns:
+                    center, spread = self.mean[index], np.sqrt(self.m2[index] / self.n_samples_seen[index])
+                elif column in self.minmax_columns:
+                    center, spread = self.data_min[index], self.data_max[index] - self.data_min[index]
+                else:
+                    continue
+                spread = spread if spread > 0 else 1.0
+                self.scale[index], self.offset[index] = 1.0 / spread, -center / spread
+            self.is_fitted = True
+            return self
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def fit(self, dataframe: pd.DataFrame) -> "FeatureEncoder":
+        self._reset_statistics()
+        self.partial_fit(dataframe)
+        logging.info(f"Fitted feature encoder v{self.version} with {self.n_features} features")
+        return self
+
+    @staticmethod
+    def _lookup(values, mapping: Mapping[str, float], default: float) -> np.ndarray:
+        """
+        Maps category labels to numbers through the categorical codes, so the work per row is one
+        array lookup whatever the number of rows.
+        """
+        if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+            categories, codes = values.cat.categories, values.cat.codes.to_numpy()
+        else:
+            codes, categories = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=True)
+        table = np.array([mapping.get(str(category), default) for category in categories] + [np.nan],
+                         dtype=np.float32)
+        return table[codes]  # code -1 (missing) picks the trailing NaN
+
+    def transform(self, data: Union[pd.DataFrame, Mapping[str, Iterable]], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Encodes a DataFrame or a {column: values} mapping into `out`, or into a new (rows, n_features)
+        float32 array. Unknown binary categories raise a ValueError; unknown one-hot categories encode as
+        all zeros.
+        """
+        if not self.is_fitted:
+            raise ValueError("FeatureEncoder must be fitted before transform")
+        rows = len(data[self.input_columns[0]])
+        if out is None:
+            out = np.empty((rows, self.n_features), dtype=np.float32)
+        position = 0
+        for index, column in enumerate(self.numeric_columns):
+            values = self._numeric_values(data[column])
+            out[:, position] = values * self.scale[index] + self.offset[index]
+            position += 1
+        for column, mapping in self.binary_columns.items():
+            encoded = self._lookup(data[column], mapping, default=np.nan)
+            if np.isnan(encoded).any():
+                raise ValueError(f"{column} has values outside {list(mapping)}")
+            out[:, position] = encoded
+            position += 1
+        for column, mapping in self.one_hot_columns.items():
+            offsets = self._lookup(data[column], {category: offset for offset, category in enumerate(mapping)},
+                                   default=-1)
+            offsets = np.nan_to_num(offsets, nan=-1).astype(np.int64)
+            block = out[:, position:position + len(mapping)]
+            block[:] = 0
+            known = np.flatnonzero(offsets >= 0)
+            block[known, offsets[known]] = 1
+            position += len(mapping)
+        return out
+
+    def transform_records(self, records: List[Mapping[str, object]]) -> np.ndarray:
+        """
+        Encodes a list of raw records (e.g. request payloads) through the same code path as transform.
+        """
+        return self.transform({column: [record.get(column) for record in records] for column in self.input_columns})
+
+    def fit_transform(self, dataframe: pd.DataFrame) -> np.ndarray:
+        return self.fit(dataframe).transform(dataframe)
+
+    def get_feature_names_out(self) -> np.ndarray:
+        return np.asarray(self.feature_names, dtype=object)
+
+    def __repr__(self) -> str:
+        return f"FeatureEncoder(version={self.version}, features={self.feature_names})"
@@ -0,0 +1,146 @@
+import sys
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple, Type
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.metrics import roc_auc_score
+
+from src.exception import MyException
+from src.logger import logging
+
+
+class ModelBackend(ABC):
+    """
+    Estimator family the trainer can select by name. Every backend produces a scikit-learn classifier with
+    predict and predict_proba, which MyModel wraps the same way, so evaluation, pushing and serving do not
+    depend on the backend.
+
+    A backend builds an estimator with `n_estimators` trees (or boosting iterations) and fits it with early
+    stopping on held-out rows.
+    """
+
+    name: str = None
+
+    def __init__(self, params: dict, n_jobs: int = -1, random_state: Optional[int] = None,
+                 class_weights: Optional[Dict[int, float]] = None):
+        self.params = dict(params)
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.class_weights = class_weights
+
+    @abstractmethod
+    def build(self, n_estimators: int, early_stopping: bool = False):
+        pass
+
+    @abstractmethod
+    def fit_with_early_stopping(self, x_train: np.ndarray, y_train: np.ndarray, x_validation: np.ndarray,
+                                y_validation: np.ndarray, max_estimators: int, batch_size: int, patience: int,
+                                tolerance: float) -> Tuple[object, List[dict]]:
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def n_estimators(model) -> int:
+        pass
+
+
+class RandomForestBackend(ModelBackend):
+    name = "random_forest"
+
+    def build(self, n_estimators: int, early_stopping: bool = False) -> RandomForestClassifier:
+        return RandomForestClassifier(n_estimators=n_estimators, n_jobs=self.n_jobs, random_state=self.random_state,
+                                      warm_start=early_stopping, class_weight=self.class_weights, **self.params)
+
+    def fit_with_early_stopping(self, x_train, y_train, x_validation, y_validation, max_estimators,
+                                batch_size, patience, tolerance):
+        """
+        Grows the forest `batch_size` trees at a time with warm_start. After each batch the validation ROC
+        AUC is updated from the new trees only, since a forest's probability is the mean over its trees.
+        The returned forest is truncated to the batch with the best validation ROC AUC.
+        """
+        try:
+            model = self.build(n_estimators=0, early_stopping=True)
+            probability_sum = np.zeros(len(y_validation), dtype=np.float64)
+            best_score, best_trees, batches_without_improvement = -np.inf, 0, 0
+            history = []
+            while model.n_estimators < max_estimators:
+                trees_before = model.n_estimators
+                model.set_params(n_estimators=min(trees_before + batch_size, max_estimators))
+                model.fit(x_train, y_train)
+
+                positive_index = list(model.classes_).index(1) if 1 in model.classes_ else len(model.classes_) - 1
+                for tree in model.estimators_[trees_before:]:
+                    probability_sum += tree.predict_proba(x_validation)[:, positive_index]
+                score = float(roc_auc_score(y_validation, probability_sum / model.n_estimators))
+                history.append({"trees": model.n_estimators, "validation_roc_auc": round(score, 6)})
+                logging.info(f"{model.n_estimators} trees: validation ROC AUC {score:.5f}")
+
+                if score > best_score + tolerance:
+                    best_score, best_trees, batches_without_improvement = score, model.n_estimators, 0
+                else:
+                    batches_without_improvement += 1
+                    if batches_without_improvement >= patience:
+                        logging.info(f"Early stopping at {model.n_estimators} trees, no improvement since {best_trees} trees")
+                        break
+            model.estimators_ = model.estimators_[:best_trees]
+            model.n_estimators = best_trees
+            return model, history
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @staticmethod
+    def n_estimators(model: RandomForestClassifier) -> int:
+        return len(model.estimators_)
+
+
+class HistGradientBoostingBackend(ModelBackend):
+    """
+    Histogram-based gradient boosting: features are binned once into uint8 (at most 255 bins) and the
+    trees are grown on the compact binned matrix, using all cores through OpenMP.
+    """
+
+    name = "hist_gradient_boosting"
+
+    def build(self, n_estimators: int, early_stopping: bool = False) -> HistGradientBoostingClassifier:
+        return HistGradientBoostingClassifier(max_iter=n_estimators, early_stopping=early_stopping,
+                                              scoring="roc_auc", random_state=self.random_state,
+                                              class_weight=self.class_weights, **self.params)
+
+    def fit_with_early_stopping(self, x_train, y_train, x_validation, y_validation, max_estimators,
+                                batch_size, patience, tolerance):
+        """
+        Boosts up to `max_estimators` iterations and stops once the validation ROC AUC has not improved by
+        `tolerance` for `patience` batches of `batch_size` iterations. validation_score_[0] is the score
+        before the first iteration, so the history starts at iteration `batch_size` and ends at the last one.
+        """
+        try:
+            model = self.build(n_estimators=max_estimators, early_stopping=True)
+            model.set_params(n_iter_no_change=patience * batch_size, tol=tolerance)
+            model.fit(x_train, y_train, X_val=x_validation, y_val=y_validation)
+            iterations = list(range(batch_size, model.n_iter_ + 1, batch_size))
+            if not iterations or iterations[-1] != model.n_iter_:
+                iterations.append(model.n_iter_)
+            history = [{"trees": iteration, "validation_roc_auc": round(float(model.validation_score_[iteration]), 6)}
+                       for iteration in iterations]
+            logging.info(f"Boosting stopped at {model.n_iter_} iterations, "
+                         f"validation ROC AUC {model.validation_score_[-1]:.5f}")
+            return model, history
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @staticmethod
+    def n_estimators(model: HistGradientBoostingClassifier) -> int:
+        return int(model.n_iter_)
+
+
+MODEL_BACKENDS: Dict[str, Type[ModelBackend]] = {
+    RandomForestBackend.name: RandomForestBackend,
+    HistGradientBoostingBackend.name: HistGradientBoostingBackend,
+}
+
+
+def get_model_backend(name: str) -> Type[ModelBackend]:
+    if name not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend '{name}', expected one of {list(MODEL_BACKENDS)}")
+    return MODEL_BACKENDS[name]
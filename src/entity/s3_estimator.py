@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+from typing import Optional
+
+from pandas import DataFrame
+
+from src.exception import MyException
+from src.logger import logging
+from src.cloud_storage.aws_storage import StorageService, get_storage_service
+from src.entity.estimator import MyModel
+from src.utils.main_utils import load_object
+from src.utils.model_cache import ModelCache
+
+
+class Proj1Estimator:
+    """
+    Client of the model registry: saves models to the bucket and loads them through the local model cache.
+
+    Loading a model costs one metadata call when its version is already cached on disk, and no unpickling
+    when it is already the loaded model of this estimator.
+    """
+
+    def __init__(self, bucket_name: str, model_path: str, storage_service: Optional[StorageService] = None,
+                 model_cache: Optional[ModelCache] = None):
+        """
+        :param bucket_name: Name of your model bucket
+        :param model_path: Location of your model in bucket
+        :param storage_service: Storage backend, by default the one selected by the STORAGE_BACKEND env variable
+        :param model_cache: On-disk cache of downloaded model versions
+        """
+        self.bucket_name = bucket_name
+        self.model_path = model_path
+        self.s3 = storage_service or get_storage_service()
+        self.model_cache = model_cache or ModelCache()
+        self.loaded_model: Optional[MyModel] = None
+        self.loaded_model_version: Optional[str] = None
+        self._load_lock = threading.Lock()
+
+    def is_model_present(self, model_path: str) -> bool:
+        try:
+            return self.s3.get_object_metadata(self.bucket_name, model_path) is not None
+        except MyException as e:
+            logging.info(e)
+            return False
+
+    def get_model_version(self) -> str:
+        """
+        Content hash of the current model version, from a metadata call only.
+        """
+        try:
+            metadata = self.s3.get_object_metadata(self.bucket_name, self.model_path)
+            if metadata is None:
+                raise FileNotFoundError(f"{self.bucket_name}/{self.model_path} does not exist")
+            return ModelCache.get_content_id(metadata)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _load_file(self, file_path: str, version: str) -> None:
+        if self.loaded_model is None or version != self.loaded_model_version:
+            self.loaded_model = load_object(file_path)
+            self.loaded_model_version = version
+            logging.info(f"Loaded model {self.bucket_name}/{self.model_path} version {version[:12]}")
+
+    def load_model(self, version: Optional[str] = None) -> MyModel:
+        """
+        Load the current model version from the model cache; threads loading at the same time share one load.
+        A given version (content id) is loaded from the cache entry another process of the host loaded it
+        into, or from the registry when it is still the current version there.
+        """
+        try:
+            with self._load_lock:
+                if version is not None and version == self.loaded_model_version:
+                    return self.loaded_model
+                if version is not None:
+                    try:
+                        with self.model_cache.open_cached_file(version, os.path.basename(self.model_path)) as file_path:
+                            self._load_file(file_path, version)
+                        return self.loaded_model
+                    except FileNotFoundError:
+                        logging.info(f"Model version {version[:12]} is not cached, loading it from the registry")
+                with self.model_cache.open_file(self.s3, self.bucket_name, self.model_path) as (file_path, metadata):
+                    current_version = ModelCache.get_content_id(metadata)
+                    if version is not None and current_version != version:
+                        raise FileNotFoundError(f"Model version {version[:12]} is neither cached nor current "
+                                                f"({current_version[:12]}) in {self.bucket_name}/{self.model_path}")
+                    self._load_file(file_path, current_version)
+                return self.loaded_model
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def save_model(self, from_file: str, remove: bool = False) -> None:
+        """
+        Save the model to the model_path
+        :param from_file: Your local system model path
+        :param remove: By default it is false that mean you will have your model locally available in your system folder
+        """
+        try:
+            self.s3.upload_file(from_file, to_filename=self.model_path, bucket_name=self.bucket_name, remove=remove)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def predict(self, dataframe: DataFrame):
+        try:
+            if self.loaded_model is None:
+                self.loaded_model = self.load_model()
+            return self.loaded_model.predict(dataframe=dataframe)
+        except Exception as e:
+            raise MyException(e, sys) from e
@@ -0,0 +1,157 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+from pandas import DataFrame
+
+from src.exception import MyException
+from src.logger import logging
+from src.constants import SCHEMA_FILE_PATH
+from src.entity.config_entity import BatchPredictionConfig, VehiclePredictorConfig
+from src.pipline.prediction_pipeline import VehicleDataClassifier
+from src.utils.main_utils import ChunkedDataFrameWriter, iter_dataframe_chunks, read_yaml_file
+
+# Classifier of a worker process, created by its initializer; it loads the version a chunk asks for
+_worker_classifier: Optional[VehicleDataClassifier] = None
+
+
+def _init_worker(predictor_config: VehiclePredictorConfig) -> None:
+    global _worker_classifier
+    _worker_classifier = VehicleDataClassifier(prediction_pipeline_config=predictor_config)
+
+
+def _predict_chunk(dataframe: DataFrame, version: str) -> np.ndarray:
+    serving = _worker_classifier.serving
+    if serving is None or serving.version != version:
+        _worker_classifier.load(version)
+    return _worker_classifier.serving.predict(dataframe)
+
+
+class BatchPrediction:
+    """
+    Scores whole customer files: the input (csv or parquet) is streamed in chunks to a pool of worker
+    processes and the chunks are written back out with a prediction column in input order.
+
+    The pool is long-lived: it is started once (by the service lifespan, or on first use) and shared by
+    every file scored until stop. Each file is scored by the version the classifier serves when it starts;
+    the version travels with every chunk, and a worker loads it from the host's model cache the first time
+    it sees it, so bulk and online predictions come from the same model.
+
+    At most n_workers * max_pending_chunks chunks are read ahead of the writer, so memory stays bounded by
+    the chunk size whatever the size of the file. Workers only send predictions back; the main process
+    keeps the chunks it is waiting on.
+    """
+
+    def __init__(self, batch_prediction_config: BatchPredictionConfig = BatchPredictionConfig(),
+                 classifier: Optional[VehicleDataClassifier] = None):
+        """
+        :param batch_prediction_config: Configuration for bulk scoring
+        :param classifier: Classifier whose serving version scores the files, by default a new one
+        """
+        self.batch_prediction_config = batch_prediction_config
+        self.classifier = classifier or VehicleDataClassifier(
+            prediction_pipeline_config=batch_prediction_config.predictor_config)
+        self.n_workers = max(1, batch_prediction_config.n_workers)
+        self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def start(self) -> "BatchPrediction":
+        """
+        Starts the worker pool, unless scoring runs in this process (n_workers == 1).
+        """
+        with self._executor_lock:
+            if self._executor is None and self.n_workers > 1:
+                # spawn: the service calling this runs threads, which a forked worker must not inherit
+                self._executor = ProcessPoolExecutor(max_workers=self.n_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"),
+                                                     initializer=_init_worker,
+                                                     initargs=(self.batch_prediction_config.predictor_config,))
+                logging.info(f"Started bulk scoring pool of {self.n_workers} workers")
+            return self
+
+    def stop(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def __enter__(self) -> "BatchPrediction":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def _write_chunk(self, writer: ChunkedDataFrameWriter, dataframe: DataFrame, predictions: np.ndarray) -> None:
+        writer.write(dataframe.assign(**{self.batch_prediction_config.output_column: predictions}))
+
+    def score_file(self, input_file_path: str, output_file_path: str) -> dict:
+        """
+        Method Name : score_file
+        Description : This method scores every row of a csv or parquet file and writes the rows with their
+                      prediction to a csv or parquet file, based on the file extensions
+        Output      : rows scored, model version, elapsed seconds and rows per second
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            config = self.batch_prediction_config
+            max_pending = self.n_workers * max(1, config.max_pending_chunks)
+            serving = self.classifier.get_serving()
+            executor = self.start()._executor
+            start_time = time.perf_counter()
+            rows, chunks = 0, 0
+            logging.info(f"Scoring {input_file_path} in chunks of {config.chunk_size} rows with {self.n_workers} "
+                         f"workers and model version {serving.version[:12]}")
+
+            with ChunkedDataFrameWriter(os.path.abspath(output_file_path), schema_config=self._schema_config) as writer:
+                chunk_iterator = iter_dataframe_chunks(input_file_path, batch_size=config.chunk_size)
+                if executor is None:
+                    for dataframe in chunk_iterator:
+                        self._write_chunk(writer, dataframe, serving.predict(dataframe))
+                        rows, chunks = rows + len(dataframe), chunks + 1
+                else:
+                    pending: deque = deque()
+                    try:
+                        for dataframe in chunk_iterator:
+                            if len(pending) >= max_pending:
+                                done_dataframe, future = pending.popleft()
+                                self._write_chunk(writer, done_dataframe, future.result())
+                                rows, chunks = rows + len(done_dataframe), chunks + 1
+                            future: Future = executor.submit(_predict_chunk, dataframe, serving.version)
+                            pending.append((dataframe, future))
+                        while pending:
+                            done_dataframe, future = pending.popleft()
+                            self._write_chunk(writer, done_dataframe, future.result())
+                            rows, chunks = rows + len(done_dataframe), chunks + 1
+                    finally:
+                        # The pool outlives this file: chunks of a failed file must not keep it busy
+                        for _, future in pending:
+                            future.cancel()
+
+            elapsed = time.perf_counter() - start_time
+            result = {"rows": rows, "chunks": chunks, "workers": self.n_workers, "version": serving.version,
+                      "seconds": round(elapsed, 3), "rows_per_second": round(rows / max(elapsed, 1e-9), 1),
+                      "output_file_path": output_file_path}
+            logging.info(f"Bulk scoring finished: {result}")
+            return result
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a csv or parquet file with the production model")
+    parser.add_argument("input", help="csv or parquet file of raw insurance records")
+    parser.add_argument("output", help="csv or parquet file to write the records with their prediction to")
+    parser.add_argument("--chunk-size", type=int, default=BatchPredictionConfig.chunk_size)
+    parser.add_argument("--workers", type=int, default=BatchPredictionConfig.n_workers)
+    args = parser.parse_args()
+
+    with BatchPrediction(BatchPredictionConfig(chunk_size=args.chunk_size, n_workers=args.workers)) as batch_prediction:
+        print(batch_prediction.score_file(args.input, args.output))
@@ -0,0 +1,362 @@
+import sys
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional, Union
+
+import numpy as np
+from pandas import DataFrame
+from pydantic import BaseModel
+
+from src.exception import MyException
+from src.logger import logging
+from src.entity.config_entity import VehiclePredictorConfig
+from src.entity.s3_estimator import Proj1Estimator
+from src.entity.estimator import MyModel
+from src.entity.compact_ensemble import CompactTreeEnsemble
+
+
+class VehicleData(BaseModel):
+    """
+    Raw insurance record as sent to the prediction service.
+    """
+
+    Gender: str
+    Age: int
+    Driving_License: int
+    Region_Code: int
+    Previously_Insured: int
+    Vehicle_Age: str
+    Vehicle_Damage: str
+    Annual_Premium: float
+    Policy_Sales_Channel: int
+    Vintage: int
+
+    def get_vehicle_data_as_dict(self) -> dict:
+        """
+        This function returns a dictionary from VehicleData class input
+        """
+        try:
+            return self.model_dump()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_vehicle_input_data_frame(self) -> DataFrame:
+        """
+        This function returns a DataFrame from VehicleData class input
+        """
+        try:
+            return DataFrame([self.get_vehicle_data_as_dict()])
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+
+# Scored once after loading, so the first request does not pay for lazy initialisation
+WARMUP_RECORD = VehicleData(Gender="Male", Age=35, Driving_License=1, Region_Code=28, Previously_Insured=0,
+                            Vehicle_Age="1-2 Year", Vehicle_Damage="Yes", Annual_Premium=30000.0,
+                            Policy_Sales_Channel=26, Vintage=150).get_vehicle_data_as_dict()
+
+
+@dataclass
+class ServingModel:
+    """
+    One loaded and warmed model version. The classifier swaps it as a whole, so every batch is scored
+    end to end by a single version.
+    """
+    version: str
+    model: MyModel
+    compact_model: Optional[CompactTreeEnsemble]
+    info: dict = field(default_factory=dict)
+
+    def predict_features(self, features: np.ndarray) -> np.ndarray:
+        model = self.compact_model if self.compact_model is not None else self.model.trained_model_object
+        return model.predict(features)
+
+    def predict_records(self, records: List[dict]) -> np.ndarray:
+        return self.predict_features(self.model.preprocessing_object.transform_records(records))
+
+    def predict(self, dataframe: DataFrame) -> np.ndarray:
+        return self.predict_features(self.model.preprocessing_object.transform(dataframe))
+
+
+class ShadowStats:
+    """
+    Agreement between the serving version and the shadow version on the records both scored.
+    """
+
+    def __init__(self, serving_version: str, shadow_version: str):
+        self._lock = threading.Lock()
+        self.serving_version = serving_version
+        self.shadow_version = shadow_version
+        self.batches = 0
+        self.records = 0
+        self.agreements = 0
+        self.serving_positives = 0
+        self.shadow_positives = 0
+        self.errors = 0
+
+    def record(self, serving_predictions: np.ndarray, shadow_predictions: np.ndarray) -> None:
+        with self._lock:
+            self.batches += 1
+            self.records += len(serving_predictions)
+            self.agreements += int(np.count_nonzero(serving_predictions == shadow_predictions))
+            self.serving_positives += int(np.count_nonzero(serving_predictions == 1))
+            self.shadow_positives += int(np.count_nonzero(shadow_predictions == 1))
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            records = max(self.records, 1)
+            return {"serving_version": self.serving_version, "shadow_version": self.shadow_version,
+                    "batches": self.batches, "records": self.records, "errors": self.errors,
+                    "agreement_rate": round(self.agreements / records, 4),
+                    "serving_positive_rate": round(self.serving_positives / records, 4),
+                    "shadow_positive_rate": round(self.shadow_positives / records, 4)}
+
+
+class VehicleDataClassifier:
+    """
+    Holds the production model for the prediction service: loaded from the model registry, optionally
+    flattened into a CompactTreeEnsemble (identical predictions without scikit-learn's per-call overhead),
+    and warmed up before serving.
+
+    A background watcher polls the registry version with a metadata call. A new version is downloaded,
+    loaded and warmed on the watcher thread while the current one keeps serving, then swapped in by a
+    single reference assignment: batches already running finish on the old version, the next ones use the
+    new one, and no request waits on the load. In shadow mode the new version first scores a sample of
+    batches next to the serving version on its own thread. After shadow_min_records it is swapped in if it
+    passes the promotion gates (agreement, positive rate drift, errors); otherwise, or as soon as it fails
+    more than shadow_max_errors batches, it is rejected and the serving version is kept until the registry
+    moves to another version.
+    """
+
+    def __init__(self, prediction_pipeline_config: VehiclePredictorConfig = VehiclePredictorConfig()) -> None:
+        """
+        :param prediction_pipeline_config: Configuration for prediction the value
+        """
+        try:
+            self.prediction_pipeline_config = prediction_pipeline_config
+            self.estimator = Proj1Estimator(bucket_name=prediction_pipeline_config.model_bucket_name,
+                                            model_path=prediction_pipeline_config.model_file_path)
+            self.serving: Optional[ServingModel] = None
+            self.shadow: Optional[ServingModel] = None
+            self.shadow_stats: Optional[ShadowStats] = None
+            self.rejected_version: Optional[str] = None
+            self.reloads = 0
+            self._reload_lock = threading.Lock()
+            self._stop_watching = threading.Event()
+            self._watcher: Optional[threading.Thread] = None
+            self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-scoring")
+            # Held while a sampled batch is being shadow scored
+            self._shadow_lock = threading.Lock()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @property
+    def model(self) -> Optional[MyModel]:
+        serving = self.serving
+        return serving.model if serving is not None else None
+
+    @property
+    def model_info(self) -> dict:
+        serving = self.serving
+        return serving.info if serving is not None else {}
+
+    def _load_version(self, version: Optional[str] = None) -> ServingModel:
+        """
+        Loads the current registry version, or the given one, flattens it when configured and warms it with
+        a full batch.
+        """
+        start_time = time.perf_counter()
+        model = self.estimator.load_model(version)
+        compact_model = None
+        if self.prediction_pipeline_config.use_compact_model:
+            try:
+                compact_model = CompactTreeEnsemble.from_model(model.trained_model_object)
+            except MyException as e:
+                logging.info(f"Serving the scikit-learn model, it cannot be flattened: {e}")
+        serving = ServingModel(version=self.estimator.loaded_model_version, model=model, compact_model=compact_model)
+        serving.predict_records([WARMUP_RECORD] * max(1, self.prediction_pipeline_config.max_batch_size))
+        serving.info = {"version": serving.version, "model": repr(model), "compact": compact_model is not None,
+                        "load_seconds": round(time.perf_counter() - start_time, 3)}
+        return serving
+
+    def load(self, version: Optional[str] = None) -> "VehicleDataClassifier":
+        """
+        Method Name : load
+        Description : This method loads the production model from the registry, or the given version, e.g.
+                      the one another process serves, flattens it when configured and warms it up
+        Output      : the loaded classifier
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            with self._reload_lock:
+                self.serving = self._load_version(version)
+                logging.info(f"Prediction model ready: {self.serving.info}")
+            return self
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _swap(self, serving: ServingModel) -> None:
+        previous, self.serving = self.serving, serving
+        self.reloads += 1
+        logging.info(f"Swapped serving model {previous.version[:12]} -> {serving.version[:12]}: {serving.info}")
+
+    def get_promotion_failures(self, shadow_stats: ShadowStats) -> List[str]:
+        """
+        Promotion gates the shadow version fails on the records compared so far, empty when it can be promoted.
+        """
+        config = self.prediction_pipeline_config
+        stats = shadow_stats.get_stats()
+        failures = []
+        if stats["records"] > 0 and stats["agreement_rate"] < config.shadow_min_agreement:
+            failures.append(f"agreement {stats['agreement_rate']} below {config.shadow_min_agreement}")
+        positive_rate_drift = abs(stats["shadow_positive_rate"] - stats["serving_positive_rate"])
+        if stats["records"] > 0 and positive_rate_drift > config.shadow_max_positive_rate_drift:
+            failures.append(f"positive rate drift {positive_rate_drift:.4f} above "
+                            f"{config.shadow_max_positive_rate_drift}")
+        if stats["errors"] > config.shadow_max_errors:
+            failures.append(f"{stats['errors']} failed batches, at most {config.shadow_max_errors} allowed")
+        return failures
+
+    def reload_if_changed(self) -> bool:
+        """
+        Method Name : reload_if_changed
+        Description : This method checks the registry version and loads a new version next to the serving one,
+                      then swaps it in, directly or once shadow mode has compared it on enough records and it
+                      passed the promotion gates. A rejected version is not loaded again.
+        Output      : whether the serving version changed
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            with self._reload_lock:
+                if self.serving is None:
+                    self.serving = self._load_version()
+                    return True
+                version = self.estimator.get_model_version()
+                if version == self.serving.version:
+                    if self.shadow is not None:
+                        logging.info(f"Registry is back on the serving version, dropping shadow {self.shadow.version[:12]}")
+                        self.shadow, self.shadow_stats = None, None
+                    self.rejected_version = None
+                    return False
+                if version == self.rejected_version:
+                    return False
+
+                config = self.prediction_pipeline_config
+                if config.shadow_sample_rate <= 0:
+                    self._swap(self._load_version())
+                    return True
+                if self.shadow is None or self.shadow.version != version:
+                    shadow = self._load_version()
+                    self.shadow_stats = ShadowStats(self.serving.version, shadow.version)
+                    self.shadow = shadow
+                    logging.info(f"Shadowing model version {shadow.version[:12]} on {config.shadow_sample_rate:.0%} "
+                                 f"of batches: {shadow.info}")
+                    return False
+                # Too many failed batches reject the shadow early: failed batches add no compared records
+                if self.shadow_stats.records >= config.shadow_min_records \
+                        or self.shadow_stats.errors > config.shadow_max_errors:
+                    shadow, self.shadow = self.shadow, None
+                    failures = self.get_promotion_failures(self.shadow_stats)
+                    if failures:
+                        self.rejected_version = shadow.version
+                        logging.warning(f"Shadow version {shadow.version[:12]} rejected, keeping {self.serving.version[:12]}: "
+                                        f"{'; '.join(failures)}. Shadow comparison: {self.shadow_stats.get_stats()}")
+                        return False
+                    logging.info(f"Shadow comparison before promotion: {self.shadow_stats.get_stats()}")
+                    self._swap(shadow)
+                    return True
+                return False
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _watch(self, interval: float) -> None:
+        while not self._stop_watching.wait(interval):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                logging.error(f"Model reload check failed, the serving model is unchanged: {e}")
+
+    def start_watching(self) -> None:
+        """
+        Starts the background thread polling the registry, unless the watch interval is 0.
+        """
+        interval = self.prediction_pipeline_config.watch_interval_seconds
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+        self._watcher.start()
+        logging.info(f"Watching {self.estimator.bucket_name}/{self.estimator.model_path} every {interval:g}s")
+
+    def stop_watching(self) -> None:
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def get_reload_stats(self) -> dict:
+        shadow_stats = self.shadow_stats
+        return {"serving_version": self.serving.version if self.serving is not None else None,
+                "reloads": self.reloads, "rejected_version": self.rejected_version,
+                "shadow": shadow_stats.get_stats() if shadow_stats is not None else None}
+
+    def _compare_with_shadow(self, shadow: ServingModel, shadow_stats: ShadowStats, method: str,
+                             data: Union[List[dict], DataFrame], predictions: np.ndarray) -> None:
+        try:
+            shadow_stats.record(predictions, getattr(shadow, method)(data))
+        except Exception as e:
+            shadow_stats.record_error()
+            logging.error(f"Shadow scoring with {shadow.version[:12]} failed: {e}")
+        finally:
+            self._shadow_lock.release()
+
+    def _score_shadow(self, method: str, data: Union[List[dict], DataFrame], predictions: np.ndarray) -> None:
+        # A sampled batch is skipped while the previous one is still being shadow scored, so shadow work never
+        # queues up behind the serving path
+        shadow, shadow_stats = self.shadow, self.shadow_stats
+        if shadow is None or shadow_stats is None \
+                or random.random() >= self.prediction_pipeline_config.shadow_sample_rate \
+                or not self._shadow_lock.acquire(blocking=False):
+            return
+        try:
+            self._shadow_executor.submit(self._compare_with_shadow, shadow, shadow_stats, method, data, predictions)
+        except Exception:
+            self._shadow_lock.release()
+            raise
+
+    def get_serving(self) -> ServingModel:
+        """
+        Version serving requests right now, loaded on first use.
+        """
+        if self.serving is None:
+            self.load()
+        return self.serving
+
+    def predict_records(self, records: List[dict]) -> np.ndarray:
+        """
+        Scores a list of raw records as one vectorized batch.
+        """
+        try:
+            predictions = self.get_serving().predict_records(records)
+            self._score_shadow("predict_records", records, predictions)
+            return predictions
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def predict(self, dataframe: DataFrame) -> np.ndarray:
+        """
+        Scores a dataframe of raw records as one vectorized batch.
+        """
+        try:
+            predictions = self.get_serving().predict(dataframe)
+            self._score_shadow("predict", dataframe, predictions)
+            return predictions
+        except Exception as e:
+            raise MyException(e, sys) from e
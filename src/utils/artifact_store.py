@@ -0,0 +1,241 @@
+import os
+import sys
+import json
+import stat
+import shutil
+import argparse
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from src.exception import MyException
+from src.logger import logging
+from src.constants import (ARTIFACT_DIR, ARTIFACT_STORE_OBJECTS_DIR, ARTIFACT_STORE_KEEP_RUNS,
+                           ARTIFACT_TIMESTAMP_FORMAT)
+from src.utils.stage_cache import get_file_hash
+
+RUN_MANIFEST_FILE_NAME = "manifest.json"
+
+
+class ArtifactStore:
+    """
+    Content-addressed store behind the timestamped run directories of the artifact dir.
+
+    Committing a run moves every file of its directory into objects/<sha256[:2]>/<sha256>, once per content,
+    and hard-links it back to its path in the run, so runs that produced identical files share one copy on
+    disk. Since a write through one link would change every run that links the object, artifact writers
+    never rewrite a file in place: they replace it (see replace_on_success), which gives the path a new inode.
+    Objects are also made read-only.
+    Each run directory gets a manifest of {relative path: sha256, size}; a run is copied to another artifact
+    dir by transferring only the objects missing there.
+
+    An object is garbage once no kept run manifest references it and no other hard link points to it.
+    """
+
+    def __init__(self, artifact_dir: str = ARTIFACT_DIR, objects_dir: str = ARTIFACT_STORE_OBJECTS_DIR):
+        self.artifact_dir = artifact_dir
+        self.objects_dir = objects_dir
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def get_runs(self) -> List[str]:
+        """
+        Run directory names of the artifact dir, oldest first.
+        """
+        runs = []
+        for name in os.listdir(self.artifact_dir) if os.path.isdir(self.artifact_dir) else []:
+            try:
+                runs.append((datetime.strptime(name, ARTIFACT_TIMESTAMP_FORMAT), name))
+            except ValueError:
+                continue  # objects, stage cache and other non-run directories
+        return [name for _, name in sorted(runs)]
+
+    @staticmethod
+    def read_manifest(run_dir: str) -> Dict[str, dict]:
+        manifest_file_path = os.path.join(run_dir, RUN_MANIFEST_FILE_NAME)
+        if not os.path.exists(manifest_file_path):
+            return {}
+        with open(manifest_file_path, "r") as file:
+            return json.load(file)
+
+    def _add_file(self, file_path: str) -> Tuple[str, bool]:
+        """
+        Stores a file by content and replaces it with a hard link to the stored object.
+
+        :return: sha256 of the file and whether the store already had it
+        """
+        digest = get_file_hash(file_path)
+        object_path = self._object_path(digest)
+        if os.path.exists(object_path):
+            if not os.path.samefile(object_path, file_path):
+                os.remove(file_path)
+                try:
+                    os.link(object_path, file_path)
+                except OSError:
+                    shutil.copy2(object_path, file_path)
+            return digest, True
+
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        try:
+            os.link(file_path, object_path)
+        except OSError:
+            # Different file system: the store keeps a copy and the run keeps its file
+            shutil.copy2(file_path, object_path)
+        os.chmod(object_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        return digest, False
+
+    def commit_run(self, run_dir: str) -> dict:
+        """
+        Method Name : commit_run
+        Description : This method moves the files of a run directory into the store, links them back and
+                      writes the run manifest
+        Output      : commit statistics
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            manifest = self.read_manifest(run_dir)
+            new_bytes, shared_bytes = 0, 0
+            for directory, _, file_names in os.walk(run_dir):
+                for file_name in file_names:
+                    file_path = os.path.join(directory, file_name)
+                    relative_path = os.path.relpath(file_path, run_dir).replace(os.sep, "/")
+                    if relative_path == RUN_MANIFEST_FILE_NAME or os.path.islink(file_path):
+                        continue
+                    entry = manifest.get(relative_path)
+                    if entry is not None and os.path.exists(self._object_path(entry["sha256"])) \
+                            and os.path.samefile(self._object_path(entry["sha256"]), file_path):
+                        continue  # committed before
+                    size = os.path.getsize(file_path)
+                    digest, existed = self._add_file(file_path)
+                    manifest[relative_path] = {"sha256": digest, "size": size}
+                    if existed:
+                        shared_bytes += size
+                    else:
+                        new_bytes += size
+
+            with open(os.path.join(run_dir, RUN_MANIFEST_FILE_NAME), "w") as file:
+                json.dump(manifest, file, indent=1, sort_keys=True)
+            stats = {"files": len(manifest), "new_bytes": new_bytes, "deduplicated_bytes": shared_bytes}
+            logging.info(f"Committed run {run_dir} to the artifact store: {stats}")
+            return stats
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def copy_run(self, run_name: str, destination_artifact_dir: str) -> dict:
+        """
+        Method Name : copy_run
+        Description : This method recreates a committed run in another artifact dir, copying only the objects
+                      that its store does not have yet
+        Output      : copy statistics
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            destination = ArtifactStore(destination_artifact_dir,
+                                        os.path.join(destination_artifact_dir,
+                                                     os.path.relpath(self.objects_dir, self.artifact_dir)))
+            manifest = self.read_manifest(os.path.join(self.artifact_dir, run_name))
+            if not manifest:
+                raise FileNotFoundError(f"Run {run_name} has no manifest, commit it first")
+            destination_run_dir = os.path.join(destination_artifact_dir, run_name)
+            copied_bytes = 0
+            for relative_path, entry in manifest.items():
+                object_path = destination._object_path(entry["sha256"])
+                if not os.path.exists(object_path):
+                    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                    shutil.copy2(self._object_path(entry["sha256"]), object_path)
+                    copied_bytes += entry["size"]
+                file_path = os.path.join(destination_run_dir, *relative_path.split("/"))
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                os.link(object_path, file_path)
+            with open(os.path.join(destination_run_dir, RUN_MANIFEST_FILE_NAME), "w") as file:
+                json.dump(manifest, file, indent=1, sort_keys=True)
+            return {"files": len(manifest), "copied_bytes": copied_bytes}
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def garbage_collect(self, keep: int = ARTIFACT_STORE_KEEP_RUNS, dry_run: bool = False) -> dict:
+        """
+        Method Name : garbage_collect
+        Description : This method deletes all but the `keep` most recent runs, then the objects no remaining
+                      run references
+        Output      : removed runs and freed bytes
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            runs = self.get_runs()
+            removed_runs = runs[:max(0, len(runs) - keep)]
+            for run_name in removed_runs:
+                logging.info(f"Removing run {run_name}")
+                if not dry_run:
+                    shutil.rmtree(os.path.join(self.artifact_dir, run_name))
+
+            referenced = set()
+            for run_name in runs[len(removed_runs):]:
+                manifest = self.read_manifest(os.path.join(self.artifact_dir, run_name))
+                referenced.update(entry["sha256"] for entry in manifest.values())
+            # In a dry run the links of the removed runs still exist and are discounted instead
+            removed_links = Counter()
+            if dry_run:
+                for run_name in removed_runs:
+                    manifest = self.read_manifest(os.path.join(self.artifact_dir, run_name))
+                    removed_links.update(entry["sha256"] for entry in manifest.values())
+
+            removed_objects, freed_bytes = 0, 0
+            for directory, _, file_names in os.walk(self.objects_dir):
+                for digest in file_names:
+                    object_path = os.path.join(directory, digest)
+                    status = os.stat(object_path)
+                    # Other hard links (e.g. stage cache entries) keep an object alive
+                    if digest in referenced or status.st_nlink - removed_links[digest] > 1:
+                        continue
+                    removed_objects += 1
+                    freed_bytes += status.st_size
+                    if not dry_run:
+                        os.remove(object_path)
+            result = {"removed_runs": removed_runs, "kept_runs": len(runs) - len(removed_runs),
+                      "removed_objects": removed_objects, "freed_bytes": freed_bytes, "dry_run": dry_run}
+            logging.info(f"Artifact store garbage collection: {result}")
+            return result
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_usage(self) -> dict:
+        """
+        Bytes stored once in the store against the bytes the run manifests reference.
+        """
+        stored = sum(os.path.getsize(os.path.join(directory, name))
+                     for directory, _, names in os.walk(self.objects_dir) for name in names)
+        referenced = sum(entry["size"] for run_name in self.get_runs()
+                         for entry in self.read_manifest(os.path.join(self.artifact_dir, run_name)).values())
+        return {"runs": len(self.get_runs()), "stored_bytes": stored, "referenced_bytes": referenced}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the deduplicated artifact store")
+    parser.add_argument("--artifact-dir", default=ARTIFACT_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    gc_parser = subparsers.add_parser("gc", help="keep the last N runs and delete unreferenced objects")
+    gc_parser.add_argument("--keep", type=int, default=ARTIFACT_STORE_KEEP_RUNS)
+    gc_parser.add_argument("--dry-run", action="store_true")
+    commit_parser = subparsers.add_parser("commit", help="move the files of existing runs into the store")
+    commit_parser.add_argument("runs", nargs="*", help="run directory names, all runs by default")
+    copy_parser = subparsers.add_parser("copy", help="copy a run to another artifact dir")
+    copy_parser.add_argument("run")
+    copy_parser.add_argument("destination")
+    subparsers.add_parser("usage", help="show stored and referenced bytes")
+    args = parser.parse_args()
+
+    store = ArtifactStore(args.artifact_dir, os.path.join(args.artifact_dir,
+                                                          os.path.relpath(ARTIFACT_STORE_OBJECTS_DIR, ARTIFACT_DIR)))
+    if args.command == "gc":
+        print(store.garbage_collect(keep=args.keep, dry_run=args.dry_run))
+    elif args.command == "commit":
+        for run_name in args.runs or store.get_runs():
+            print(run_name, store.commit_run(os.path.join(args.artifact_dir, run_name)))
+    elif args.command == "copy":
+        print(store.copy_run(args.run, args.destination))
+    else:
+        print(store.get_usage())
@@ -0,0 +1,275 @@
+import sys
+import json
+import base64
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from typing import Dict, List, Optional
+
+from src.exception import MyException
+from src.logger import logging
+from src.utils.main_utils import get_stable_hash, replace_on_success
+
+PROFILE_VERSION = 1
+PSI_EPSILON = 1e-4
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch keeping at most `max_centroids` (mean, weight) centroids.
+
+    Columns with no more distinct values than centroids are kept exactly; otherwise neighbouring values are
+    merged into equal-weight centroids, which bounds the CDF error to about 1 / max_centroids.
+    """
+
+    def __init__(self, max_centroids: int = 200):
+        self.max_centroids = max_centroids
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        means, inverse = np.unique(means, return_inverse=True)
+        weights = np.bincount(inverse, weights=weights)
+        if len(means) > self.max_centroids:
+            cumulative = np.cumsum(weights) - weights
+            groups = np.minimum((cumulative / weights.sum() * self.max_centroids).astype(np.int64),
+                                self.max_centroids - 1)
+            group_weights = np.bincount(groups, weights=weights)
+            means = np.bincount(groups, weights=means * weights)[group_weights > 0] / group_weights[group_weights > 0]
+            weights = group_weights[group_weights > 0]
+        self.means, self.weights = means, weights
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) > 0:
+            self._compress(np.concatenate([self.means, values]),
+                           np.concatenate([self.weights, np.ones(len(values))]))
+
+    def merge(self, other: "QuantileSketch") -> None:
+        self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+
+    def cdf(self, points: np.ndarray) -> np.ndarray:
+        """
+        Share of the values lower than or equal to each point.
+        """
+        if self.count == 0:
+            return np.zeros(len(points))
+        cumulative = np.concatenate([[0.0], np.cumsum(self.weights)]) / self.count
+        return cumulative[np.searchsorted(self.means, points, side="right")]
+
+    def quantiles(self, probabilities: np.ndarray) -> np.ndarray:
+        if self.count == 0:
+            return np.full(len(probabilities), np.nan)
+        cumulative = np.cumsum(self.weights) / self.count
+        return self.means[np.minimum(np.searchsorted(cumulative, probabilities), len(self.means) - 1)]
+
+    def to_dict(self) -> dict:
+        return {"type": "quantile", "max_centroids": self.max_centroids,
+                "means": self.means.tolist(), "weights": self.weights.tolist()}
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "QuantileSketch":
+        sketch = cls(max_centroids=content["max_centroids"])
+        sketch.means = np.asarray(content["means"], dtype=np.float64)
+        sketch.weights = np.asarray(content["weights"], dtype=np.float64)
+        return sketch
+
+
+class FrequencySketch:
+    """
+    Exact, mergeable frequency table of a categorical column.
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts.values())
+
+    def update(self, values: pd.Series) -> None:
+        for value, count in values.dropna().astype(str).value_counts().items():
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+
+    def merge(self, other: "FrequencySketch") -> None:
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+
+    def to_dict(self) -> dict:
+        return {"type": "frequency", "counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "FrequencySketch":
+        sketch = cls()
+        sketch.counts = dict(content["counts"])
+        return sketch
+
+
+class DistinctCountSketch:
+    """
+    HyperLogLog distinct-count sketch with 2**precision one-byte registers, merged by register-wise max.
+    """
+
+    def __init__(self, precision: int = 11):
+        self.precision = precision
+        self.registers = np.zeros(2 ** precision, dtype=np.uint8)
+
+    def update(self, values: pd.Series) -> None:
+        values = values.dropna()
+        if len(values) == 0:
+            return
+        hashed = get_stable_hash(values)
+        index = (hashed >> np.uint64(64 - self.precision)).astype(np.int64)
+        remaining = hashed << np.uint64(self.precision)
+        # Position of the leftmost 1-bit of the remaining bits, from the float exponent of the value
+        bit_length = np.frexp(remaining.astype(np.float64))[1]
+        rank = np.minimum(64 - bit_length + 1, 64 - self.precision + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "DistinctCountSketch") -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype(np.float64))
+        empty_registers = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and empty_registers > 0:
+            estimate = m * np.log(m / empty_registers)
+        return float(estimate)
+
+    def to_dict(self) -> dict:
+        return {"type": "distinct", "precision": self.precision,
+                "registers": base64.b64encode(self.registers.tobytes()).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "DistinctCountSketch":
+        sketch = cls(precision=content["precision"])
+        sketch.registers = np.frombuffer(base64.b64decode(content["registers"]), dtype=np.uint8).copy()
+        return sketch
+
+
+SKETCH_TYPES = {"quantile": QuantileSketch, "frequency": FrequencySketch, "distinct": DistinctCountSketch}
+
+
+def population_stability_index(expected: np.ndarray, actual: np.ndarray) -> float:
+    expected = np.maximum(expected, PSI_EPSILON)
+    actual = np.maximum(actual, PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+class DataProfile:
+    """
+    Per-column drift summary of a dataset, built chunk by chunk and mergeable across chunks, splits and runs:
+    quantile sketches for numeric columns, frequency tables for categorical columns and distinct-count
+    sketches for the configured high-cardinality columns.
+    """
+
+    def __init__(self, numerical_columns: List[str], categorical_columns: List[str],
+                 distinct_count_columns: Optional[List[str]] = None):
+        self.rows = 0
+        self.sketches: Dict[str, dict] = {}
+        for column in numerical_columns:
+            self.sketches.setdefault(column, {})["quantile"] = QuantileSketch()
+        for column in categorical_columns:
+            self.sketches.setdefault(column, {})["frequency"] = FrequencySketch()
+        for column in distinct_count_columns or []:
+            self.sketches.setdefault(column, {})["distinct"] = DistinctCountSketch()
+
+    @classmethod
+    def from_schema(cls, schema_config: dict) -> "DataProfile":
+        return cls(numerical_columns=schema_config["numerical_columns"],
+                   categorical_columns=schema_config["categorical_columns"],
+                   distinct_count_columns=schema_config.get("distinct_count_columns"))
+
+    def update(self, dataframe: DataFrame) -> None:
+        self.rows += len(dataframe)
+        for column, sketches in self.sketches.items():
+            if column not in dataframe.columns:
+                continue
+            for sketch in sketches.values():
+                if isinstance(sketch, QuantileSketch):
+                    sketch.update(pd.to_numeric(dataframe[column], errors="coerce").to_numpy(dtype=np.float64,
+                                                                                            na_value=np.nan))
+                else:
+                    sketch.update(dataframe[column])
+
+    def merge(self, other: "DataProfile") -> None:
+        self.rows += other.rows
+        for column, sketches in other.sketches.items():
+            for kind, sketch in sketches.items():
+                if kind in self.sketches.get(column, {}):
+                    self.sketches[column][kind].merge(sketch)
+                else:
+                    self.sketches.setdefault(column, {})[kind] = sketch
+
+    def compare(self, reference: "DataProfile", psi_threshold: float) -> dict:
+        """
+        Scores every column against a reference profile: PSI over the reference deciles and a KS distance
+        for numeric columns, PSI over the categories for categorical columns and the distinct-count ratio.
+        """
+        columns = {}
+        for column, sketches in self.sketches.items():
+            reference_sketches = reference.sketches.get(column, {})
+            scores = {}
+            if "quantile" in sketches and "quantile" in reference_sketches:
+                current, expected = sketches["quantile"], reference_sketches["quantile"]
+                edges = np.unique(expected.quantiles(np.linspace(0.1, 0.9, 9)))
+                expected_share = np.diff(np.concatenate([[0.0], expected.cdf(edges), [1.0]]))
+                current_share = np.diff(np.concatenate([[0.0], current.cdf(edges), [1.0]]))
+                points = np.union1d(expected.means, current.means)
+                scores["psi"] = round(population_stability_index(expected_share, current_share), 6)
+                scores["ks"] = round(float(np.max(np.abs(expected.cdf(points) - current.cdf(points)))), 6)
+            if "frequency" in sketches and "frequency" in reference_sketches:
+                current, expected = sketches["frequency"], reference_sketches["frequency"]
+                categories = sorted(set(current.counts) | set(expected.counts))
+                expected_share = np.array([expected.counts.get(value, 0) for value in categories]) / max(expected.count, 1)
+                current_share = np.array([current.counts.get(value, 0) for value in categories]) / max(current.count, 1)
+                scores["psi"] = round(population_stability_index(expected_share, current_share), 6)
+                scores["new_categories"] = [value for value in categories if value not in expected.counts]
+            if "distinct" in sketches and "distinct" in reference_sketches:
+                scores["distinct_count"] = round(sketches["distinct"].estimate())
+                scores["reference_distinct_count"] = round(reference_sketches["distinct"].estimate())
+            if scores:
+                scores["drift"] = bool(scores.get("psi", 0.0) > psi_threshold or scores.get("new_categories"))
+                columns[column] = scores
+        drifted_columns = [column for column, scores in columns.items() if scores["drift"]]
+        return {"drift_detected": len(drifted_columns) > 0, "drifted_columns": drifted_columns,
+                "psi_threshold": psi_threshold, "rows": self.rows, "reference_rows": reference.rows,
+                "columns": columns}
+
+    def to_dict(self) -> dict:
+        return {"version": PROFILE_VERSION, "rows": self.rows,
+                "columns": {column: {kind: sketch.to_dict() for kind, sketch in sketches.items()}
+                            for column, sketches in self.sketches.items()}}
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "DataProfile":
+        profile = cls([], [])
+        profile.rows = content["rows"]
+        profile.sketches = {column: {kind: SKETCH_TYPES[kind].from_dict(sketch) for kind, sketch in sketches.items()}
+                            for column, sketches in content["columns"].items()}
+        return profile
+
+    def save(self, file_path: str) -> None:
+        try:
+            with replace_on_success(file_path) as temporary_file_path:
+                with open(temporary_file_path, "w") as file:
+                    json.dump(self.to_dict(), file, separators=(",", ":"))
+            logging.info(f"Saved data profile at {file_path}")
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @classmethod
+    def load(cls, file_path: str) -> "DataProfile":
+        try:
+            with open(file_path, "r") as file:
+                return cls.from_dict(json.load(file))
+        except Exception as e:
+            raise MyException(e, sys) from e
@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.metrics import roc_auc_score
+from threadpoolctl import threadpool_limits
+from typing import Dict, List, Optional
+
+from src.exception import MyException
+from src.logger import logging
+from src.utils.main_utils import load_numpy_array_data
+from src.entity.model_backends import get_model_backend
+
+
+def sample_candidates(param_space: Dict[str, object], n_candidates: int, random_state: int) -> List[dict]:
+    """
+    Samples distinct hyperparameter candidates from model.yaml: a list is sampled uniformly, a mapping
+    is a {distribution: randint | uniform | loguniform, low, high} distribution.
+    """
+    rng = np.random.default_rng(random_state)
+    candidates, seen = [], set()
+    for _ in range(n_candidates * 20):
+        candidate = {}
+        for name, space in param_space.items():
+            if isinstance(space, dict):
+                low, high = space["low"], space["high"]
+                if space["distribution"] == "randint":
+                    value = int(rng.integers(low, high + 1))
+                elif space["distribution"] == "loguniform":
+                    value = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+                else:
+                    value = float(rng.uniform(low, high))
+            else:
+                value = space[int(rng.integers(len(space)))]
+                value = value.item() if isinstance(value, np.generic) else value
+            candidate[name] = value
+        key = tuple(sorted(candidate.items()))
+        if key not in seen:
+            seen.add(key)
+            candidates.append(candidate)
+        if len(candidates) == n_candidates:
+            break
+    return candidates
+
+
+def _evaluate_candidate(train_file_path: str, validation_file_path: str, train_rows: np.ndarray,
+                        validation_rows: np.ndarray, backend: str, params: dict, n_estimators: int,
+                        class_weights: Optional[dict], random_state: int) -> dict:
+    """
+    Fits one candidate in a worker process on a single thread. The worker memory-maps the train and
+    validation matrices from their paths, so only row indices and parameters cross the process boundary.
+    """
+    train_arr = load_numpy_array_data(train_file_path, mmap_mode="r")
+    validation_arr = load_numpy_array_data(validation_file_path, mmap_mode="r")
+    x_train, y_train = train_arr[train_rows, :-1], train_arr[train_rows, -1]
+    x_validation, y_validation = validation_arr[validation_rows, :-1], validation_arr[validation_rows, -1]
+    start_time = time.perf_counter()
+    model = get_model_backend(backend)(params, n_jobs=1, random_state=random_state,
+                                       class_weights=class_weights).build(n_estimators)
+    with threadpool_limits(limits=1):
+        model.fit(x_train, y_train)
+    score = roc_auc_score(y_validation, model.predict_proba(x_validation)[:, list(model.classes_).index(1)])
+    return {"score": float(score), "seconds": time.perf_counter() - start_time}
+
+
+def successive_halving_search(train_file_path: str, validation_file_path: str, backend: str,
+                              param_space: Dict[str, object], search_config: dict, max_trees: int,
+                              fixed_params: Optional[dict] = None, class_weights: Optional[dict] = None) -> List[dict]:
+    """
+    Method Name : successive_halving_search
+    Description : This method scores candidates sampled for a backend on a process pool, first on
+                  min_rows rows with min_trees trees (boosting iterations for boosting backends). Each rung keeps the best 1/eta candidates and multiplies their rows and
+                  trees by eta, up to the full train split and max_trees, until one candidate would be left.
+                  Candidates are trained on the (possibly resampled) train matrix and scored on the
+                  validation rows held out before resampling, at most max_validation_rows of them.
+    Output      : leaderboard, best candidate first
+    On Failure  : Raise MyException
+    """
+    try:
+        eta, random_state = search_config["eta"], search_config["random_state"]
+        n_workers = search_config.get("n_workers") or os.cpu_count() or 1
+        rng = np.random.default_rng(random_state)
+        train_pool = rng.permutation(len(load_numpy_array_data(train_file_path, mmap_mode="r")))
+        validation_rows = np.sort(rng.permutation(len(load_numpy_array_data(validation_file_path, mmap_mode="r")))
+                                  [:search_config["max_validation_rows"]])
+
+        candidates = [{**(fixed_params or {}), **params}
+                      for params in sample_candidates(param_space, search_config["n_candidates"], random_state)]
+        leaderboard = [{"candidate": index, "params": params, "rungs": []} for index, params in enumerate(candidates)]
+        alive = list(range(len(candidates)))
+        budget_rows, budget_trees, rung = search_config["min_rows"], search_config["min_trees"], 0
+        logging.info(f"Successive halving over {len(candidates)} {backend} candidates with {n_workers} workers")
+
+        # Workers are spawned rather than forked, so they do not inherit the parent's BLAS/OpenMP thread state
+        with ProcessPoolExecutor(max_workers=n_workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            while True:
+                budget_rows, budget_trees = min(budget_rows, len(train_pool)), min(budget_trees, max_trees)
+                train_rows = np.sort(train_pool[:budget_rows])
+                start_time = time.perf_counter()
+                futures = {index: executor.submit(_evaluate_candidate, train_file_path, validation_file_path,
+                                                  train_rows, validation_rows, backend, candidates[index],
+                                                  budget_trees, class_weights, random_state)
+                           for index in alive}
+                for index, future in futures.items():
+                    result = future.result()
+                    leaderboard[index]["rungs"].append({"rung": rung, "rows": int(budget_rows), "trees": int(budget_trees),
+                                                        "roc_auc": round(result["score"], 6),
+                                                        "seconds": round(result["seconds"], 3)})
+                alive.sort(key=lambda index: leaderboard[index]["rungs"][-1]["roc_auc"], reverse=True)
+                logging.info(f"Rung {rung}: {len(alive)} candidates on {budget_rows} rows and {budget_trees} trees "
+                             f"in {time.perf_counter() - start_time:.2f}s, best ROC AUC "
+                             f"{leaderboard[alive[0]]['rungs'][-1]['roc_auc']}")
+
+                # Stop once a single candidate would survive: the trainer gives it the full budget anyway
+                full_budget = budget_rows == len(train_pool) and budget_trees == max_trees
+                if len(alive) <= eta or full_budget:
+                    break
+                alive = alive[:max(1, len(alive) // eta)]
+                budget_rows, budget_trees, rung = budget_rows * eta, budget_trees * eta, rung + 1
+
+        # Candidates that went further rank first, then by their last score
+        for entry in leaderboard:
+            entry["last_rung"] = entry["rungs"][-1]["rung"]
+            entry["roc_auc"] = entry["rungs"][-1]["roc_auc"]
+        leaderboard.sort(key=lambda entry: (entry["last_rung"], entry["roc_auc"]), reverse=True)
+        for rank, entry in enumerate(leaderboard, start=1):
+            entry["rank"] = rank
+        logging.info(f"Best candidate: {leaderboard[0]['params']} (ROC AUC {leaderboard[0]['roc_auc']})")
+        return leaderboard
+    except Exception as e:
+        raise MyException(e, sys) from e
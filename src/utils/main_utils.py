@@ -1,14 +1,47 @@
 import os 
 import sys
+import threading
+from contextlib import contextmanager
  
 import numpy as np
 import dill
 import yaml
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pandas import DataFrame
+from typing import Iterator, List, Optional
+
+from src.constants import DATA_FILE_COMPRESSION
 
 from src.exception import MyException
 from src.logger import logging
 
+def get_temporary_file_path(file_path: str) -> str:
+    """
+    Returns a path next to file_path, unique to the calling thread, creating the directory.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f".{os.path.basename(file_path)}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+@contextmanager
+def replace_on_success(file_path: str) -> Iterator[str]:
+    """
+    Yields a temporary path next to file_path and moves it over file_path once the block succeeds.
+
+    Artifact files are never rewritten in place: the artifact store and the stage cache hard-link one inode
+    into several runs, and a write through one of the links would change all of them. A replaced path gets
+    a new inode and leaves the other links as they were; readers never see a partial file either.
+    """
+    temporary_file_path = get_temporary_file_path(file_path)
+    try:
+        yield temporary_file_path
+        os.replace(temporary_file_path, file_path)
+    finally:
+        if os.path.exists(temporary_file_path):
+            os.remove(temporary_file_path)
+
 def read_yaml_file(file_path:str)->dict:
     try:
         with open(file_path, 'r') as yaml_file:
@@ -18,41 +51,315 @@ def read_yaml_file(file_path:str)->dict:
     
 def write_yaml_file(file_path: str ,content: object ,replace : bool =False):
     try:
-        if replace:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w') as yaml_file:
-            yaml.dump(content, yaml_file, default_flow_style=False)
+        with replace_on_success(file_path) as temporary_file_path:
+            with open(temporary_file_path, 'w') as yaml_file:
+                yaml.dump(content, yaml_file, default_flow_style=False)
     except Exception as e:
         raise MyException(e,sys) from e
     
-def lod_object(file_path:str)->object:
+def load_object(file_path:str)->object:
     try:
         with open(file_path, 'rb') as file:
             return dill.load(file)
     except Exception as e:
         raise MyException(e,sys) from e
 
+lod_object = load_object
+
 def save_numpy_array_data(file_path:str , array :np.array):
 
     try:
-        dir_path = os.path.dirname(file_path)
-        os.makedirs(dir_path,exist_ok=True)
-        with open(file_path, 'wb') as file:
-            np.save(file,array)
+        with replace_on_success(file_path) as temporary_file_path:
+            with open(temporary_file_path, 'wb') as file:
+                np.save(file,array)
     except Exception as e:  
         raise MyException(e,sys) from e
+
+def open_numpy_memmap(file_path: str, shape: tuple, dtype=np.float32) -> np.memmap:
+    """
+    Creates a .npy file of the given shape and returns it as a writable memory map, so an array larger
+    than RAM can be filled chunk by chunk.
+
+    An existing file is unlinked first, so the map is a new inode and never writes through a hard link
+    shared with the artifact store or the stage cache.
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        if os.path.lexists(file_path):
+            os.remove(file_path)
+        return np.lib.format.open_memmap(file_path, mode="w+", dtype=dtype, shape=shape)
+    except Exception as e:
+        raise MyException(e,sys) from e
+
+def load_numpy_array_data(file_path: str, mmap_mode: Optional[str] = None) -> np.ndarray:
+    """
+    Loads a .npy file; with mmap_mode="r" the array is memory-mapped instead of read, so several
+    processes can share it through the page cache without copies.
+    """
+    try:
+        return np.load(file_path, mmap_mode=mmap_mode)
+    except Exception as e:
+        raise MyException(e,sys) from e
     
 def save_object(file_path:str , obj:object)->None:
     logging.info(f"Saving object at {file_path}")
     try:
-        os.mkdir(os.path.dirname(file_path),exist_ok=True)
-        with open(file_path, 'wb') as file:
-            dill.dump(obj,file)
+        with replace_on_success(file_path) as temporary_file_path:
+            with open(temporary_file_path, 'wb') as file:
+                dill.dump(obj,file)
     except Exception as e:
         raise MyException(e,sys) from e
 
 
+def get_schema_column_types(schema_config: dict) -> dict:
+    """
+    Returns the {column: type} mapping declared under 'columns' in schema.yaml.
+    """
+    return {column: column_type for item in schema_config["columns"] for column, column_type in item.items()}
 
-    
+
+def get_dtype_plan(schema_config: dict) -> dict:
+    """
+    Builds the compact {column: dtype} plan from schema.yaml:
+    categoricals for 'categor' columns (categories from 'categorical_domains'), the smallest integer
+    width holding the 'value_ranges' bounds for 'int' columns and float32 for 'float' columns.
+    """
+    categorical_domains = schema_config.get("categorical_domains") or {}
+    value_ranges = schema_config.get("value_ranges") or {}
+    dtype_plan = {}
+    for column, column_type in get_schema_column_types(schema_config).items():
+        if column_type == "categor":
+            dtype_plan[column] = pd.CategoricalDtype(categorical_domains.get(column))
+        elif column_type == "float":
+            dtype_plan[column] = np.dtype(np.float32)
+        elif column_type == "int":
+            low, high = value_ranges.get(column, [np.iinfo(np.int64).min, np.iinfo(np.int64).max])
+            dtype_plan[column] = next(np.dtype(dtype) for dtype in (np.int8, np.int16, np.int32, np.int64)
+                                      if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max)
+    return dtype_plan
+
+
+def apply_dtype_plan(dataframe: DataFrame, dtype_plan: dict) -> DataFrame:
+    """
+    Casts the dataframe columns to the compact dtypes of the plan.
+
+    Integer columns holding nulls use the matching nullable pandas dtype (e.g. Int8), and integer columns with
+    values outside the declared range stay int64. Categorical values outside the declared domain are kept as
+    extra categories rather than turned into NaN. Data validation reports both cases.
+    """
+    try:
+        dataframe = dataframe.copy(deep=False)
+        for column, dtype in dtype_plan.items():
+            if column not in dataframe.columns:
+                continue
+            series = dataframe[column]
+            if isinstance(dtype, pd.CategoricalDtype):
+                if dtype.categories is not None:
+                    unknown_values = series[~series.isin(dtype.categories) & series.notna()].unique()
+                    if len(unknown_values) > 0:
+                        logging.warning(f"Values outside the schema domain in {column}: {list(unknown_values)}")
+                        dtype = pd.CategoricalDtype(list(dtype.categories) + sorted(map(str, unknown_values)))
+                        series = series.astype(str).where(series.notna())
+                dataframe[column] = series.astype(dtype)
+            elif dtype.kind == "i":
+                series = pd.to_numeric(series)
+                if series.isna().any():
+                    dataframe[column] = series.astype(dtype.name.capitalize())
+                    continue
+                if len(series) > 0 and (series.min() < np.iinfo(dtype).min or series.max() > np.iinfo(dtype).max):
+                    logging.warning(f"Values of {column} fall outside {dtype}, keeping int64")
+                    dtype = np.dtype(np.int64)
+                dataframe[column] = series.astype(dtype)
+            else:
+                dataframe[column] = pd.to_numeric(series).astype(dtype)
+        return dataframe
+    except Exception as e:
+        raise MyException(e,sys) from e
+
+
+def get_memory_usage(dataframe: DataFrame) -> int:
+    """
+    Returns the resident size of the dataframe in bytes, including python string objects.
+    """
+    return int(dataframe.memory_usage(deep=True).sum())
+
+
+def get_arrow_schema(schema_config: dict, dataframe: DataFrame) -> pa.Schema:
+    """
+    Builds the arrow schema used to store a dataframe: the compact dtype plan of schema.yaml for known
+    columns, types inferred from the dataframe for any other column.
+
+    Integers are stored as int64: parquet keeps them in at least 32 bits anyway and encodes small values
+    compactly, and a stored column never fails on a value outside its declared range.
+    """
+    dtype_plan = get_dtype_plan(schema_config)
+    inferred_schema = pa.Schema.from_pandas(dataframe, preserve_index=False)
+    fields = []
+    for column in dataframe.columns:
+        dtype = dtype_plan.get(column)
+        if dtype is None:
+            fields.append(inferred_schema.field(column))
+        elif isinstance(dtype, pd.CategoricalDtype):
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        elif dtype.kind == "i":
+            fields.append(pa.field(column, pa.int64()))
+        else:
+            fields.append(pa.field(column, pa.from_numpy_dtype(dtype)))
+    return pa.schema(fields)
+
+
+class ChunkedDataFrameWriter:
+    """
+    Writes dataframe chunks incrementally to a single parquet (or csv) file.
+
+    The arrow schema is fixed from schema.yaml and the first chunk, so every chunk is cast to the same types.
+    Chunks go to a temporary file that replaces file_path when the writer is closed without an error.
+    """
+
+    def __init__(self, file_path: str, schema_config: Optional[dict] = None, compression: str = DATA_FILE_COMPRESSION):
+        self.file_path = file_path
+        self.schema_config = schema_config or {"columns": []}
+        self.compression = compression
+        self.rows = 0
+        self._writer = None
+        self._temporary_file_path = get_temporary_file_path(file_path)
+
+    def write(self, dataframe: DataFrame) -> None:
+        try:
+            if not self.file_path.endswith(".parquet"):
+                dataframe.to_csv(self._temporary_file_path, index=False, header=self.rows == 0,
+                                 mode="w" if self.rows == 0 else "a")
+            else:
+                if self._writer is None:
+                    schema = get_arrow_schema(self.schema_config, dataframe)
+                    self._writer = pq.ParquetWriter(self._temporary_file_path, schema, compression=self.compression)
+                table = pa.Table.from_pandas(dataframe.reindex(columns=self._writer.schema.names),
+                                             schema=self._writer.schema, preserve_index=False)
+                self._writer.write_table(table)
+            self.rows += len(dataframe)
+        except Exception as e:
+            raise MyException(e,sys) from e
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        """
+        Finishes the file and moves it into place; with an error, the partial file is discarded instead.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if not os.path.exists(self._temporary_file_path):
+            return
+        if error is None:
+            os.replace(self._temporary_file_path, self.file_path)
+        else:
+            os.remove(self._temporary_file_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(exc_value)
+
+
+def write_dataframe(file_path: str, dataframe: DataFrame, schema_config: Optional[dict] = None,
+                    compression: str = DATA_FILE_COMPRESSION) -> None:
+    """
+    Saves a dataframe as parquet (typed from schema.yaml, compressed) or as csv, based on the file extension.
+    """
+    try:
+        with ChunkedDataFrameWriter(file_path, schema_config=schema_config, compression=compression) as writer:
+            writer.write(dataframe)
+    except Exception as e:
+        raise MyException(e,sys) from e
+
+
+def get_file_columns(file_path: str) -> List[str]:
+    """
+    Returns the column names of a parquet or csv file without loading its data.
+    """
+    try:
+        if file_path.endswith(".parquet"):
+            return pq.read_schema(file_path).names
+        return pd.read_csv(file_path, nrows=0).columns.to_list()
+    except Exception as e:
+        raise MyException(e,sys) from e
+
+
+def get_file_row_count(file_path: str) -> int:
+    """
+    Returns the number of rows of a parquet file from its footer, or of a csv file by streaming it.
+    """
+    try:
+        if file_path.endswith(".parquet"):
+            return pq.ParquetFile(file_path).metadata.num_rows
+        first_column = get_file_columns(file_path)[:1]
+        return sum(len(chunk) for chunk in pd.read_csv(file_path, usecols=first_column, chunksize=1_000_000))
+    except Exception as e:
+        raise MyException(e,sys) from e
+
+
+def iter_dataframe_chunks(file_path: str, batch_size: int, columns: Optional[List[str]] = None,
+                          dtype_plan: Optional[dict] = None) -> Iterator[DataFrame]:
+    """
+    Streams a parquet or csv file as dataframe chunks of at most `batch_size` rows.
+    """
+    try:
+        if file_path.endswith(".parquet"):
+            parquet_file = pq.ParquetFile(file_path)
+            if columns is not None:
+                columns = [column for column in columns if column in parquet_file.schema_arrow.names]
+            chunks = (batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns))
+        else:
+            usecols = None if columns is None else (lambda column: column in columns)
+            chunks = pd.read_csv(file_path, usecols=usecols, chunksize=batch_size)
+        for chunk in chunks:
+            yield apply_dtype_plan(chunk, dtype_plan) if dtype_plan is not None else chunk
+    except Exception as e:
+        raise MyException(e,sys) from e
+
+
+def get_stable_hash(values: pd.Series) -> np.ndarray:
+    """
+    Maps values to stable uint64 hashes.
+
+    Integer values go through splitmix64, so a value always gets the same hash regardless of pandas version,
+    integer width or row order; other values are hashed through their string form.
+    """
+    if pd.api.types.is_integer_dtype(values) and not values.isna().any():
+        hashed = values.to_numpy(dtype=np.int64).astype(np.uint64)
+        with np.errstate(over="ignore"):
+            hashed = hashed + np.uint64(0x9E3779B97F4A7C15)
+            hashed = (hashed ^ (hashed >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            hashed = (hashed ^ (hashed >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            hashed = hashed ^ (hashed >> np.uint64(31))
+    else:
+        hashed = pd.util.hash_array(values.astype(str).to_numpy(dtype=object))
+    return hashed
+
+
+def get_split_hash(values: pd.Series) -> np.ndarray:
+    """
+    Maps split keys to stable pseudo-random numbers in [0, 1), see get_stable_hash.
+    """
+    return (get_stable_hash(values) >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def read_dataframe(file_path: str, columns: Optional[List[str]] = None, dtype_plan: Optional[dict] = None) -> DataFrame:
+    """
+    Loads a parquet or csv file. When columns are given only those present in the file are read,
+    and when a dtype plan is given the columns are cast to its compact dtypes.
+    """
+    try:
+        if file_path.endswith(".parquet"):
+            if columns is not None:
+                available_columns = set(pq.read_schema(file_path).names)
+                columns = [column for column in columns if column in available_columns]
+            dataframe = pq.read_table(file_path, columns=columns).to_pandas()
+        else:
+            usecols = None if columns is None else (lambda column: column in columns)
+            dataframe = pd.read_csv(file_path, usecols=usecols)
+        if dtype_plan is not None:
+            dataframe = apply_dtype_plan(dataframe, dtype_plan)
+        return dataframe
+    except Exception as e:
+        raise MyException(e,sys) from e
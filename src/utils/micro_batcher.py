@@ -0,0 +1,142 @@
+import asyncio
+import sys
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from src.exception import MyException
+from src.logger import logging
+
+
+class BatchMetrics:
+    """
+    Rolling window of per-batch size, queue delay and inference time, with running totals.
+    """
+
+    def __init__(self, window: int):
+        self._lock = threading.Lock()
+        self.batch_sizes = deque(maxlen=window)
+        self.queue_delays_ms = deque(maxlen=window)
+        self.inference_ms = deque(maxlen=window)
+        self.batches = 0
+        self.records = 0
+        self.errors = 0
+        self.started_at = time.time()
+
+    def record(self, batch_size: int, queue_delays_ms: List[float], inference_ms: float) -> None:
+        with self._lock:
+            self.batches += 1
+            self.records += batch_size
+            self.batch_sizes.append(batch_size)
+            self.queue_delays_ms.extend(queue_delays_ms)
+            self.inference_ms.append(inference_ms)
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    @staticmethod
+    def _summary(values) -> dict:
+        if not values:
+            return {}
+        array = np.fromiter(values, dtype=np.float64)
+        p50, p95, p99 = np.percentile(array, [50, 95, 99])
+        return {"mean": round(float(array.mean()), 3), "p50": round(float(p50), 3), "p95": round(float(p95), 3),
+                "p99": round(float(p99), 3), "max": round(float(array.max()), 3)}
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            elapsed = max(time.time() - self.started_at, 1e-9)
+            return {"batches": self.batches, "records": self.records, "errors": self.errors,
+                    "records_per_second": round(self.records / elapsed, 2),
+                    "batch_size": self._summary(self.batch_sizes),
+                    "queue_delay_ms": self._summary(self.queue_delays_ms),
+                    "inference_ms": self._summary(self.inference_ms)}
+
+
+class MicroBatcher:
+    """
+    Gathers single records submitted by concurrent requests and scores them together.
+
+    A batch starts with the oldest waiting record and takes every record that arrives within max_delay_ms
+    of it, up to max_batch_size. It is scored by `predict_batch` (a list of records in, one prediction per
+    record out) on a dedicated thread, so the event loop keeps accepting requests while a batch runs, and
+    the records arriving meanwhile form the next batch.
+    """
+
+    def __init__(self, predict_batch: Callable[[List[dict]], np.ndarray], max_batch_size: int,
+                 max_delay_ms: float, metrics_window: int):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000
+        self.metrics = BatchMetrics(window=metrics_window)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="micro-batcher")
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+        logging.info(f"Micro-batcher started: up to {self.max_batch_size} records or {self.max_delay * 1000:g} ms")
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, record: dict):
+        """
+        Queues one record and waits for its prediction.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((record, future, time.perf_counter()))
+        return await future
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = batch[0][2] + self.max_delay
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            batch = [item for item in batch if not item[1].cancelled()]  # clients that went away
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                predictions = await loop.run_in_executor(self._executor, self.predict_batch,
+                                                         [record for record, _, _ in batch])
+            except Exception as e:
+                self.metrics.record_error()
+                logging.error(f"Micro-batch of {len(batch)} records failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(MyException(e, sys))
+                continue
+            finished = time.perf_counter()
+            for (_, future, _), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(prediction)
+            self.metrics.record(len(batch), [(started - enqueued) * 1000 for _, _, enqueued in batch],
+                                (finished - started) * 1000)
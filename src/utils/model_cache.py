@@ -0,0 +1,184 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+from src.exception import MyException
+from src.logger import logging
+from src.constants import MODEL_CACHE_DIR, MODEL_CACHE_MAX_BYTES
+
+ENTRY_INFO_FILE_NAME = "entry.json"
+
+
+class ModelCache:
+    """
+    Size-bounded on-disk cache of registry artifacts (models and preprocessors), shared by all processes
+    of a host.
+
+    An entry is keyed by the content hash of the object (its sha256 metadata, or its ETag when the object
+    has none), so a version is downloaded once and identical versions share an entry. Looking an object up
+    costs one metadata call: the ETag and checksum it returns identify the entry, and only a missing entry
+    is downloaded. Concurrent loaders of the same entry, threads or processes, wait on a file lock while
+    one of them downloads it. Entries are evicted least recently used first once the cache grows past
+    max_bytes.
+
+    A cached file is only read under a shared lock of its entry, and eviction removes an entry under an
+    exclusive one, skipping entries that are being read, so no reader sees its file deleted.
+    """
+
+    def __init__(self, cache_dir: str = MODEL_CACHE_DIR, max_bytes: int = MODEL_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "downloaded_bytes": 0}
+
+    @property
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, **increments: int) -> None:
+        with self._stats_lock:
+            for name, increment in increments.items():
+                self._stats[name] += increment
+
+    @staticmethod
+    def get_content_id(metadata: dict) -> str:
+        """
+        Identifier of an object version: its sha256, or a hash of its ETag when no checksum was recorded.
+        """
+        if metadata.get("sha256"):
+            return metadata["sha256"]
+        return "etag-" + hashlib.sha256(metadata["etag"].encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, content_id: str) -> str:
+        return os.path.join(self.cache_dir, "objects", content_id)
+
+    @contextmanager
+    def _lock(self, content_id: str, shared: bool = False, blocking: bool = True) -> Iterator[bool]:
+        """
+        Shared or exclusive lock of one entry across threads and processes; flock locks are held per open
+        file. A non-blocking lock yields whether it was acquired.
+        """
+        lock_dir = os.path.join(self.cache_dir, "locks")
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(os.path.join(lock_dir, f"{content_id}.lock"), "a") as lock_file:
+            operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            try:
+                fcntl.flock(lock_file, operation if blocking else operation | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _download(self, storage_service, bucket_name: str, s3_key: str, content_id: str, metadata: dict) -> None:
+        """
+        Downloads a missing entry under its exclusive lock, unless another loader did while this one waited.
+        """
+        entry_dir = self._entry_dir(content_id)
+        info_file_path = os.path.join(entry_dir, ENTRY_INFO_FILE_NAME)
+        with self._lock(content_id):
+            if os.path.exists(info_file_path):
+                return
+            storage_service.download_file(bucket_name, s3_key, os.path.join(entry_dir, os.path.basename(s3_key)))
+            with open(info_file_path, "w") as file:
+                json.dump({"bucket_name": bucket_name, "s3_key": s3_key, "metadata": metadata,
+                           "downloaded_at": time.time()}, file)
+            self._count(misses=1, downloaded_bytes=metadata["size"])
+            logging.info(f"Cached {bucket_name}/{s3_key} as {content_id[:12]}")
+        self.evict(keep=content_id)
+
+    @contextmanager
+    def open_file(self, storage_service, bucket_name: str, s3_key: str) -> Iterator[Tuple[str, dict]]:
+        """
+        Method Name : open_file
+        Description : This method yields the local path of an object, downloading it into the cache only
+                      when the version reported by its metadata is not cached yet. The entry cannot be
+                      evicted until the block exits, so the file must be read inside it.
+        Output      : local file path and object metadata
+        On Failure  : Write an exception log and then raise an exception
+        """
+        try:
+            metadata = storage_service.get_object_metadata(bucket_name, s3_key)
+            if metadata is None:
+                raise FileNotFoundError(f"{bucket_name}/{s3_key} does not exist")
+            content_id = self.get_content_id(metadata)
+            entry_dir = self._entry_dir(content_id)
+            file_path = os.path.join(entry_dir, os.path.basename(s3_key))
+            info_file_path = os.path.join(entry_dir, ENTRY_INFO_FILE_NAME)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+        downloaded = False
+        while True:
+            with self._lock(content_id, shared=True):
+                if os.path.exists(info_file_path):
+                    try:
+                        os.utime(info_file_path)  # last access time drives LRU eviction
+                        if not downloaded:
+                            self._count(hits=1)
+                    except Exception as e:
+                        raise MyException(e, sys) from e
+                    yield file_path, metadata
+                    return
+            # Missing, or evicted between the download and the shared lock
+            try:
+                self._download(storage_service, bucket_name, s3_key, content_id, metadata)
+                downloaded = True
+            except Exception as e:
+                raise MyException(e, sys) from e
+
+    @contextmanager
+    def open_cached_file(self, content_id: str, file_name: str) -> Iterator[str]:
+        """
+        Yields the path of a file of an entry already in the cache, under the entry's shared lock, without
+        any storage call. Raises FileNotFoundError when the entry is not cached.
+        """
+        with self._lock(content_id, shared=True):
+            info_file_path = os.path.join(self._entry_dir(content_id), ENTRY_INFO_FILE_NAME)
+            if not os.path.exists(info_file_path):
+                raise FileNotFoundError(f"Model cache entry {content_id[:12]} is not cached")
+            os.utime(info_file_path)
+            self._count(hits=1)
+            yield os.path.join(self._entry_dir(content_id), file_name)
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """
+        Removes least recently used entries, except `keep`, until the cache fits in max_bytes.
+        """
+        try:
+            objects_dir = os.path.join(self.cache_dir, "objects")
+            entries = []
+            for content_id in os.listdir(objects_dir):
+                entry_dir = os.path.join(objects_dir, content_id)
+                info_file_path = os.path.join(entry_dir, ENTRY_INFO_FILE_NAME)
+                if content_id == keep or not os.path.exists(info_file_path):
+                    continue
+                size = sum(os.path.getsize(os.path.join(entry_dir, name)) for name in os.listdir(entry_dir))
+                entries.append((os.path.getmtime(info_file_path), size, content_id))
+
+            total_size = sum(size for _, size, _ in entries)
+            if keep is not None and os.path.isdir(self._entry_dir(keep)):
+                total_size += sum(os.path.getsize(os.path.join(self._entry_dir(keep), name))
+                                  for name in os.listdir(self._entry_dir(keep)))
+            for _, size, content_id in sorted(entries):
+                if total_size <= self.max_bytes:
+                    break
+                # An entry being read holds a shared lock and is skipped
+                with self._lock(content_id, blocking=False) as locked:
+                    if not locked:
+                        continue
+                    shutil.rmtree(self._entry_dir(content_id), ignore_errors=True)
+                total_size -= size
+                logging.info(f"Evicted model cache entry {content_id[:12]}")
+        except Exception as e:
+            raise MyException(e, sys) from e
@@ -0,0 +1,158 @@
+import sys
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+from joblib import Parallel, delayed
+from typing import Dict, List, Optional, Tuple
+
+from src.exception import MyException
+from src.logger import logging
+
+RESAMPLING_STRATEGIES = ["smoteenn", "partitioned_smoteenn", "random_undersampling", "class_weight", "none"]
+
+
+def get_class_weights(y: np.ndarray) -> Dict[int, float]:
+    """
+    Returns 'balanced' class weights, n_samples / (n_classes * class count), as scikit-learn computes them.
+    """
+    classes, counts = np.unique(np.asarray(y).astype(np.int64), return_counts=True)
+    return {int(label): float(len(y) / (len(classes) * count)) for label, count in zip(classes, counts)}
+
+
+def get_validation_mask(rows: int, validation_fraction: float, random_state: Optional[int]) -> np.ndarray:
+    """
+    Marks a random `validation_fraction` of the row indices as held out. It is drawn on the rows before
+    resampling, so no synthetic or duplicated row has a source on the other side of the split.
+    """
+    mask = np.zeros(rows, dtype=bool)
+    mask[np.random.default_rng(random_state).permutation(rows)[:int(rows * validation_fraction)]] = True
+    return mask
+
+
+def _smoteenn(X: np.ndarray, y: np.ndarray, random_state: Optional[int], n_jobs: int) -> Tuple[np.ndarray, np.ndarray]:
+    # imblearn imports are kept local so the cheap strategies do not need the package at import time
+    from imblearn.combine import SMOTEENN
+    from imblearn.over_sampling import SMOTE
+    from imblearn.under_sampling import EditedNearestNeighbours
+    from sklearn.neighbors import NearestNeighbors
+
+    # Neighbour searches run on n_jobs cores; scikit-learn processes the queries in memory-bounded blocks
+    smote = SMOTE(sampling_strategy="minority", random_state=random_state,
+                  k_neighbors=NearestNeighbors(n_neighbors=6, n_jobs=n_jobs))
+    enn = EditedNearestNeighbours(sampling_strategy="all", n_neighbors=NearestNeighbors(n_neighbors=4, n_jobs=n_jobs))
+    return SMOTEENN(sampling_strategy="minority", random_state=random_state, smote=smote, enn=enn).fit_resample(X, y)
+
+
+def _partitioned_smoteenn(X: np.ndarray, y: np.ndarray, random_state: Optional[int], n_jobs: int,
+                          partition_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Runs SMOTEENN independently on stratified random partitions of about `partition_size` rows, in
+    parallel. Neighbours are only searched within a partition, which approximates the exact search
+    at a cost that grows linearly with the number of rows.
+    """
+    n_partitions = max(1, int(np.ceil(len(y) / partition_size)))
+    if n_partitions == 1:
+        return _smoteenn(X, y, random_state, n_jobs)
+    rng = np.random.default_rng(random_state)
+    partitions = [[] for _ in range(n_partitions)]
+    for label in np.unique(y):
+        indices = rng.permutation(np.flatnonzero(y == label))
+        for partition, part in zip(partitions, np.array_split(indices, n_partitions)):
+            partition.append(part)
+    partitions = [np.sort(np.concatenate(partition)) for partition in partitions]
+    seeds = rng.integers(0, 2 ** 31 - 1, size=n_partitions)
+    results = Parallel(n_jobs=n_jobs)(delayed(_smoteenn)(X[indices], y[indices], int(seed), 1)
+                                      for indices, seed in zip(partitions, seeds))
+    return np.concatenate([X_part for X_part, _ in results]), np.concatenate([y_part for _, y_part in results])
+
+
+def _random_undersampling(X: np.ndarray, y: np.ndarray, random_state: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Keeps every row of the minority class and an equally large random sample of each other class.
+    """
+    rng = np.random.default_rng(random_state)
+    classes, counts = np.unique(y, return_counts=True)
+    keep = np.sort(np.concatenate([rng.choice(np.flatnonzero(y == label), size=counts.min(), replace=False)
+                                   for label in classes]))
+    return X[keep], y[keep]
+
+
+def resample(X: np.ndarray, y: np.ndarray, strategy: str, random_state: Optional[int] = None, n_jobs: int = -1,
+             partition_size: int = 200000) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rebalances a training matrix with one of RESAMPLING_STRATEGIES. 'class_weight' and 'none' return
+    the data unchanged; with 'class_weight' the trainer applies get_class_weights instead.
+    """
+    try:
+        if strategy not in RESAMPLING_STRATEGIES:
+            raise ValueError(f"Unknown resampling strategy '{strategy}', expected one of {RESAMPLING_STRATEGIES}")
+        y = np.asarray(y)
+        start_time = time.perf_counter()
+        if strategy == "smoteenn":
+            X_resampled, y_resampled = _smoteenn(X, y, random_state, n_jobs)
+        elif strategy == "partitioned_smoteenn":
+            X_resampled, y_resampled = _partitioned_smoteenn(X, y, random_state, n_jobs, partition_size)
+        elif strategy == "random_undersampling":
+            X_resampled, y_resampled = _random_undersampling(X, y, random_state)
+        else:
+            X_resampled, y_resampled = X, y
+        logging.info(f"Resampled {len(y)} rows to {len(y_resampled)} with '{strategy}' "
+                     f"in {time.perf_counter() - start_time:.2f}s")
+        return X_resampled, y_resampled
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def benchmark_resampling(rows_list: List[int], strategies: List[str] = RESAMPLING_STRATEGIES,
+                         minority_share: float = 0.12, random_state: int = 42, n_jobs: int = -1) -> List[dict]:
+    """
+    Compares the wall time, peak traced memory and minority-class recall of a model trained after each
+    strategy, on synthetic imbalanced data with 11 features (the size of the encoded insurance data).
+    """
+    from sklearn.datasets import make_classification
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.metrics import recall_score
+
+    results = []
+    for rows in rows_list:
+        X, y = make_classification(n_samples=int(rows / 0.8), n_features=11, n_informative=6,
+                                   weights=[1 - minority_share], flip_y=0.02, random_state=random_state)
+        X = X.astype(np.float32)
+        X_train, y_train, X_test, y_test = X[:rows], y[:rows], X[rows:], y[rows:]
+        for strategy in strategies:
+            tracemalloc.start()
+            start_time = time.perf_counter()
+            X_resampled, y_resampled = resample(X_train, y_train, strategy, random_state=random_state, n_jobs=n_jobs)
+            seconds = time.perf_counter() - start_time
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            sample_weight = None
+            if strategy == "class_weight":
+                class_weights = get_class_weights(y_resampled)
+                sample_weight = np.vectorize(class_weights.get)(y_resampled)
+            model = HistGradientBoostingClassifier(random_state=random_state)
+            model.fit(X_resampled, y_resampled, sample_weight=sample_weight)
+            result = {"rows": rows, "strategy": strategy, "resampled_rows": len(y_resampled),
+                      "seconds": round(seconds, 3), "peak_memory_mb": round(peak_bytes / 1e6, 1),
+                      "recall": round(float(recall_score(y_test, model.predict(X_test))), 4)}
+            logging.info(f"Resampling benchmark: {result}")
+            results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark class-imbalance resampling strategies")
+    parser.add_argument("--rows", default="100000,1000000,5000000",
+                        help="comma separated training set sizes")
+    parser.add_argument("--strategies", default=",".join(RESAMPLING_STRATEGIES),
+                        help="comma separated strategies")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args()
+    print(f"{'rows':>10} {'strategy':>22} {'resampled':>10} {'seconds':>9} {'peak MB':>9} {'recall':>7}")
+    for result in benchmark_resampling([int(rows) for rows in args.rows.split(",")],
+                                       strategies=args.strategies.split(","), n_jobs=args.n_jobs):
+        print(f"{result['rows']:>10} {result['strategy']:>22} {result['resampled_rows']:>10} "
+              f"{result['seconds']:>9} {result['peak_memory_mb']:>9} {result['recall']:>7}")
@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+
+import yaml
+from typing import Dict, List, Optional
+
+from src.exception import MyException
+from src.logger import logging
+from src.constants import STAGE_CACHE_DIR, STAGE_CACHE_MAX_BYTES, STAGE_CACHE_MAX_AGE_DAYS
+
+MANIFEST_FILE_NAME = "manifest.json"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def get_file_hash(file_path: str) -> str:
+    """
+    Returns the sha256 of a file's content, read in blocks.
+    """
+    try:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def link_or_copy(source_path: str, destination_path: str) -> None:
+    """
+    Hard-links a file into place, falling back to a copy across file systems.
+
+    Sharing the inode is safe because artifact writers replace files instead of rewriting them in place
+    (see main_utils.replace_on_success): a rewrite of either path leaves the other one as it was.
+    """
+    os.makedirs(os.path.dirname(destination_path) or ".", exist_ok=True)
+    if os.path.exists(destination_path):
+        os.remove(destination_path)
+    try:
+        os.link(source_path, destination_path)
+    except OSError:
+        shutil.copy2(source_path, destination_path)
+
+
+class StageCache:
+    """
+    Content-addressed cache of pipeline stage outputs.
+
+    A stage fingerprint covers the content of its input files, the schema.yaml sections and config values it
+    depends on and the source code of the stage. Outputs stored under a fingerprint are linked back into the
+    run's artifact directory when the same fingerprint comes up again; outputs are hard-linked both ways, so
+    an entry costs no copy of the data. Entries are evicted by age and then
+    least recently used first once the cache grows past its size limit.
+    """
+
+    def __init__(self, stage_name: str, cache_dir: str = STAGE_CACHE_DIR, max_bytes: int = STAGE_CACHE_MAX_BYTES,
+                 max_age_days: float = STAGE_CACHE_MAX_AGE_DAYS):
+        self.stage_name = stage_name
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+
+    def fingerprint(self, input_file_paths: List[str], schema_sections: Optional[dict] = None,
+                    config: Optional[dict] = None, code_file_paths: Optional[List[str]] = None) -> str:
+        """
+        Returns the sha256 fingerprint of a stage run from everything that determines its outputs.
+        """
+        try:
+            content = {
+                "stage": self.stage_name,
+                "inputs": [get_file_hash(file_path) if os.path.exists(file_path) else None
+                           for file_path in input_file_paths],
+                "schema": schema_sections or {},
+                "config": config or {},
+                "code": [get_file_hash(file_path) for file_path in code_file_paths or []],
+            }
+            return hashlib.sha256(yaml.safe_dump(content, sort_keys=True).encode("utf-8")).hexdigest()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _entry_dir(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, self.stage_name, fingerprint)
+
+    def restore(self, fingerprint: str, outputs: Dict[str, str]) -> bool:
+        """
+        Links the cached outputs of a fingerprint to their destination paths.
+
+        :param outputs: {output name: destination path}
+        :return: True on a cache hit, False when any output is missing from the cache
+        """
+        try:
+            entry_dir = self._entry_dir(fingerprint)
+            manifest_file_path = os.path.join(entry_dir, MANIFEST_FILE_NAME)
+            if not os.path.exists(manifest_file_path):
+                return False
+            with open(manifest_file_path, "r") as file:
+                manifest = json.load(file)
+            if not all(name in manifest["outputs"] for name in outputs):
+                return False
+            for name, destination_path in outputs.items():
+                link_or_copy(os.path.join(entry_dir, name), destination_path)
+            os.utime(manifest_file_path)  # last access time drives LRU eviction
+            logging.info(f"{self.stage_name} cache hit for {fingerprint[:12]}")
+            return True
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def store(self, fingerprint: str, outputs: Dict[str, str]) -> None:
+        """
+        Stores stage outputs under a fingerprint, then evicts old entries.
+
+        :param outputs: {output name: path of the produced file}
+        """
+        try:
+            entry_dir = self._entry_dir(fingerprint)
+            staging_dir = f"{entry_dir}.tmp{os.getpid()}"
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            os.makedirs(staging_dir)
+            for name, file_path in outputs.items():
+                link_or_copy(file_path, os.path.join(staging_dir, name))
+            with open(os.path.join(staging_dir, MANIFEST_FILE_NAME), "w") as file:
+                json.dump({"stage": self.stage_name, "fingerprint": fingerprint, "created_at": time.time(),
+                           "outputs": sorted(outputs)}, file)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(staging_dir, entry_dir)
+            logging.info(f"Stored {self.stage_name} outputs in cache under {fingerprint[:12]}")
+            self.evict()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def evict(self) -> None:
+        """
+        Removes entries (of every stage) older than max_age_days, then least recently used entries until the
+        cache fits in max_bytes.
+        """
+        try:
+            entries = []
+            for stage_name in os.listdir(self.cache_dir):
+                stage_dir = os.path.join(self.cache_dir, stage_name)
+                for fingerprint in os.listdir(stage_dir):
+                    manifest_file_path = os.path.join(stage_dir, fingerprint, MANIFEST_FILE_NAME)
+                    if not os.path.exists(manifest_file_path):
+                        continue
+                    entry_dir = os.path.join(stage_dir, fingerprint)
+                    size = sum(os.path.getsize(os.path.join(entry_dir, name)) for name in os.listdir(entry_dir))
+                    entries.append((os.path.getmtime(manifest_file_path), size, entry_dir))
+
+            entries.sort()
+            total_size = sum(size for _, size, _ in entries)
+            oldest_allowed = time.time() - self.max_age_days * 24 * 3600
+            for last_access, size, entry_dir in entries:
+                if last_access >= oldest_allowed and total_size <= self.max_bytes:
+                    break
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total_size -= size
+                logging.info(f"Evicted stage cache entry {entry_dir}")
+        except Exception as e:
+            raise MyException(e, sys) from e
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cloud_storage.aws_storage import LocalStorageService
+
+
+def make_records(n: int, seed: int = 0, start_id: int = 1, age_shift: int = 0) -> pd.DataFrame:
+    """
+    Raw insurance records in the layout of config/schema.yaml, with a response that depends on the features.
+    """
+    rng = np.random.default_rng(seed)
+    records = pd.DataFrame({
+        "id": np.arange(start_id, start_id + n),
+        "Gender": rng.choice(["Male", "Female"], n),
+        "Age": rng.integers(20, 85, n) + age_shift,
+        "Driving_License": rng.integers(0, 2, n),
+        "Region_Code": rng.integers(0, 53, n),
+        "Previously_Insured": rng.integers(0, 2, n),
+        "Vehicle_Age": rng.choice(["< 1 Year", "1-2 Year", "> 2 Years"], n),
+        "Vehicle_Damage": rng.choice(["Yes", "No"], n),
+        "Annual_Premium": rng.uniform(2630, 100000, n),
+        "Policy_Sales_Channel": rng.integers(1, 164, n),
+        "Vintage": rng.integers(10, 300, n),
+    })
+    logit = -3.0 + 2.2 * (records["Previously_Insured"] == 0) + 1.5 * (records["Vehicle_Damage"] == "Yes")
+    records["Response"] = (rng.random(n) < 1 / (1 + np.exp(-logit))).astype(int)
+    return records
+
+
+@pytest.fixture
+def local_storage(tmp_path) -> LocalStorageService:
+    return LocalStorageService(root_dir=str(tmp_path / "local_storage"), part_size=64 * 1024, max_concurrency=4)
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.utils.artifact_store import ArtifactStore
+from src.utils.main_utils import (open_numpy_memmap, save_numpy_array_data, save_object, write_dataframe,
+                                  write_yaml_file)
+from src.utils.stage_cache import get_file_hash
+
+RUNS = ["01_01_2026_00_00_00", "01_02_2026_00_00_00"]
+
+
+def write_run(run_dir: str) -> None:
+    save_object(os.path.join(run_dir, "model_trainer", "model.pkl"), {"weights": [1, 2, 3]})
+    save_numpy_array_data(os.path.join(run_dir, "data_transformation", "train.npy"), np.arange(10.0))
+    write_yaml_file(os.path.join(run_dir, "report.yaml"), {"accuracy": 0.9})
+    write_dataframe(os.path.join(run_dir, "data_ingestion", "train.parquet"), pd.DataFrame({"a": [1, 2, 3]}))
+
+
+def assert_matches_manifest(store: ArtifactStore, run_dir: str) -> None:
+    for relative_path, entry in store.read_manifest(run_dir).items():
+        assert get_file_hash(os.path.join(run_dir, *relative_path.split("/"))) == entry["sha256"], relative_path
+        assert get_file_hash(store._object_path(entry["sha256"])) == entry["sha256"]
+
+
+def test_committed_runs_share_objects(tmp_path):
+    store = ArtifactStore(str(tmp_path), str(tmp_path / "objects"))
+    for run_name in RUNS:
+        write_run(str(tmp_path / run_name))
+        store.commit_run(str(tmp_path / run_name))
+    usage = store.get_usage()
+    assert usage["runs"] == 2
+    assert usage["stored_bytes"] * 2 == usage["referenced_bytes"]
+    assert os.path.samefile(tmp_path / RUNS[0] / "model_trainer" / "model.pkl",
+                            tmp_path / RUNS[1] / "model_trainer" / "model.pkl")
+
+
+def test_rewrite_after_commit_leaves_other_runs_intact(tmp_path):
+    store = ArtifactStore(str(tmp_path), str(tmp_path / "objects"))
+    for run_name in RUNS:
+        write_run(str(tmp_path / run_name))
+        store.commit_run(str(tmp_path / run_name))
+
+    rewritten_run_dir = str(tmp_path / RUNS[1])
+    save_object(os.path.join(rewritten_run_dir, "model_trainer", "model.pkl"), {"weights": [4, 5, 6]})
+    save_numpy_array_data(os.path.join(rewritten_run_dir, "data_transformation", "train.npy"), np.zeros(10))
+    write_yaml_file(os.path.join(rewritten_run_dir, "report.yaml"), {"accuracy": 0.5})
+    write_dataframe(os.path.join(rewritten_run_dir, "data_ingestion", "train.parquet"), pd.DataFrame({"a": [0]}))
+    memmap = open_numpy_memmap(os.path.join(rewritten_run_dir, "data_transformation", "train.npy"), shape=(10,))
+    memmap[:] = 7
+    memmap.flush()
+    del memmap
+
+    assert_matches_manifest(store, str(tmp_path / RUNS[0]))
+    store.commit_run(rewritten_run_dir)
+    assert_matches_manifest(store, rewritten_run_dir)
+    assert np.load(os.path.join(rewritten_run_dir, "data_transformation", "train.npy"))[0] == 7
+
+
+def test_garbage_collect_keeps_recent_runs(tmp_path):
+    store = ArtifactStore(str(tmp_path), str(tmp_path / "objects"))
+    for run_name in RUNS:
+        write_run(str(tmp_path / run_name))
+        store.commit_run(str(tmp_path / run_name))
+    save_object(str(tmp_path / RUNS[1] / "model_trainer" / "model.pkl"), {"weights": [7]})
+    store.commit_run(str(tmp_path / RUNS[1]))
+
+    dry_run = store.garbage_collect(keep=1, dry_run=True)
+    result = store.garbage_collect(keep=1)
+    assert result["removed_runs"] == [RUNS[0]] and result["removed_objects"] == dry_run["removed_objects"] == 1
+    assert_matches_manifest(store, str(tmp_path / RUNS[1]))
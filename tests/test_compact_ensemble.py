@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from src.entity.compact_ensemble import CompactTreeEnsemble
+from src.exception import MyException
+
+
+def make_data(rows: int = 600, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=(rows, 5))
+    y = (x[:, 0] + 0.5 * x[:, 1] * x[:, 2] + rng.normal(scale=0.5, size=rows) > 0).astype(int)
+    x[rng.random(x.shape) < 0.05] = np.nan
+    return x, y
+
+
+@pytest.mark.parametrize("model", [
+    RandomForestClassifier(n_estimators=15, max_depth=6, random_state=0),
+    HistGradientBoostingClassifier(max_iter=30, max_leaf_nodes=15, random_state=0),
+], ids=["random_forest", "hist_gradient_boosting"])
+def test_predictions_match_the_scikit_learn_model(tmp_path, model):
+    x, y = make_data()
+    model.fit(x, y)
+    x_test, _ = make_data(rows=700, seed=1)
+    x_test[:5] = np.nan
+
+    compact_model = CompactTreeEnsemble.from_model(model)
+    compact_model.save(str(tmp_path / "compact"))
+    for candidate in (compact_model, CompactTreeEnsemble.load(str(tmp_path / "compact"))):
+        assert np.array_equal(candidate.predict_proba(x_test), model.predict_proba(x_test))
+        assert np.array_equal(candidate.predict(x_test), model.predict(x_test))
+        assert np.array_equal(candidate.predict_proba(x_test[:1]), model.predict_proba(x_test[:1]))
+        assert np.array_equal(candidate.predict(x_test[:1]), model.predict(x_test[:1]))
+
+
+def test_unsupported_estimators_are_rejected():
+    x, y = make_data()
+    with pytest.raises(MyException, match="Unsupported model type"):
+        CompactTreeEnsemble.from_model(LogisticRegression().fit(np.nan_to_num(x), y))
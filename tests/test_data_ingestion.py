@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import make_records
+from src.components.data_ingestion import DataIngestion
+from src.configuration.mongo_db_connection import MongoDBClient
+from src.constants import DATABASE_NAME
+from src.entity.config_entity import DataIngestionConfig, TrainingPipelineConfig, rebase_config
+from src.exception import MyException
+from src.utils.main_utils import read_dataframe, read_yaml_file
+
+mongomock = pytest.importorskip("mongomock")
+
+COLLECTION_NAME = "records"
+
+
+def make_data_ingestion(tmp_path, **config_values) -> DataIngestion:
+    config = rebase_config(DataIngestionConfig(collection_name=COLLECTION_NAME, incremental=True,
+                                               snapshot_file_path=str(tmp_path / "snapshot" / "snapshot.parquet"),
+                                               watermark_file_path=str(tmp_path / "snapshot" / "watermark.yaml"),
+                                               **config_values),
+                           TrainingPipelineConfig(artifact_dir=str(tmp_path / "artifact")))
+    return DataIngestion(config)
+
+
+@pytest.fixture
+def collection():
+    client = mongomock.MongoClient()
+    MongoDBClient.set_client(client)
+    collection = client[DATABASE_NAME][COLLECTION_NAME]
+    collection.insert_many(make_records(300).to_dict("records"))
+    return collection
+
+
+@pytest.mark.parametrize("option", [{"sample_size": 100}, {"row_limit": 100}, {"n_partitions": 4}])
+def test_incremental_ingestion_rejects_options_it_cannot_apply(tmp_path, collection, option):
+    with pytest.raises(MyException, match=list(option)[0]):
+        make_data_ingestion(tmp_path, **option).export_data_into_feature_store()
+
+
+def test_incremental_ingestion_applies_the_query_filter(tmp_path, collection):
+    male = make_data_ingestion(tmp_path, query_filter={"Gender": "Male"}).refresh_snapshot()
+    assert set(male["Gender"]) == {"Male"}
+
+    # A snapshot built with another filter is not reused
+    female = make_data_ingestion(tmp_path, query_filter={"Gender": "Female"}).refresh_snapshot()
+    assert set(female["Gender"]) == {"Female"}
+    assert len(male) + len(female) == 300
+
+    collection.insert_many(make_records(10, seed=1, start_id=301).to_dict("records"))
+    refreshed = make_data_ingestion(tmp_path, query_filter={"Gender": "Female"}).refresh_snapshot()
+    assert set(refreshed["Gender"]) == {"Female"}
+    assert len(refreshed) == collection.count_documents({"Gender": "Female"})
+
+
+def test_watermark_delta_is_merged_and_deduplicated_on_id(tmp_path, collection):
+    start = datetime(2024, 1, 1)
+    collection.update_many({}, {"$set": {"updated_at": start}})
+    snapshot = make_data_ingestion(tmp_path, watermark_field="updated_at").refresh_snapshot()
+    assert len(snapshot) == 300
+
+    # One existing document is updated and two new ones arrive after the watermark
+    collection.update_one({"id": 7}, {"$set": {"Age": 99, "updated_at": start + timedelta(days=1)}})
+    new_records = make_records(2, seed=1, start_id=301).to_dict("records")
+    collection.insert_many([dict(record, updated_at=start + timedelta(days=1)) for record in new_records])
+    refreshed = make_data_ingestion(tmp_path, watermark_field="updated_at").refresh_snapshot()
+
+    assert len(refreshed) == 302
+    assert refreshed["id"].is_unique
+    assert refreshed.loc[refreshed["id"] == 7, "Age"].tolist() == [99]
+    assert "updated_at" not in refreshed.columns and "_id" not in refreshed.columns
+    watermark = read_yaml_file(str(tmp_path / "snapshot" / "watermark.yaml"))
+    assert watermark["value"] == start + timedelta(days=1) and watermark["rows"] == 302
+
+    # Nothing newer than the watermark: documents sharing the boundary value are re-fetched but not duplicated
+    assert len(make_data_ingestion(tmp_path, watermark_field="updated_at").refresh_snapshot()) == 302
+
+
+def test_feature_store_and_splits_are_typed_parquet(tmp_path, collection):
+    config = rebase_config(DataIngestionConfig(collection_name=COLLECTION_NAME),
+                           TrainingPipelineConfig(artifact_dir=str(tmp_path / "artifact")))
+    artifact = DataIngestion(config).initiate_data_ingestion()
+
+    # Types come from schema.yaml, not from re-parsing text
+    arrow_schema = pq.read_schema(config.feature_store_file_path)
+    assert pa.types.is_dictionary(arrow_schema.field("Vehicle_Age").type)
+    assert arrow_schema.field("Age").type == pa.int64()
+    assert arrow_schema.field("Annual_Premium").type == pa.float32()
+
+    train = read_dataframe(artifact.trained_file_path)
+    test = read_dataframe(artifact.test_file_path, columns=["Age", "Response", "not_a_column"])
+    assert list(test.columns) == ["Age", "Response"]
+    assert len(train) + len(test) == 300
+    assert isinstance(train["Gender"].dtype, pd.CategoricalDtype)
@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.components.data_transformation import DataTransformation
+from src.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
+from src.entity.config_entity import DataTransformationConfig, TrainingPipelineConfig, rebase_config
+from src.utils.main_utils import load_numpy_array_data, write_dataframe
+
+from conftest import make_records
+
+
+def run_data_transformation(tmp_path, **config_values):
+    records = make_records(1000)
+    train_file_path, test_file_path = str(tmp_path / "train.parquet"), str(tmp_path / "test.parquet")
+    write_dataframe(train_file_path, records.iloc[:800])
+    write_dataframe(test_file_path, records.iloc[800:])
+    config = rebase_config(DataTransformationConfig(**config_values),
+                           TrainingPipelineConfig(artifact_dir=str(tmp_path / "artifact")))
+    validation_artifact = DataValidationArtifact(validattion_status=True, message="",
+                                                 validation_report_file_path="", drift_profile_file_path="")
+    return DataTransformation(DataIngestionArtifact(train_file_path, test_file_path), config,
+                              validation_artifact).initiate_data_transformation()
+
+
+def test_out_of_core_mode_falls_back_to_class_weight(tmp_path):
+    artifact = run_data_transformation(tmp_path, out_of_core=True, resampling_strategy="smoteenn", use_cache=False)
+    assert artifact.resampling_strategy == "class_weight"
+    assert artifact.class_weights is not None
+    assert len(load_numpy_array_data(artifact.transformed_train_file_path)) == 720
+    assert len(load_numpy_array_data(artifact.transformed_validation_file_path)) == 80
+
+
+@pytest.mark.parametrize("resampling_strategy", ["class_weight", "none"])
+def test_out_of_core_mode_keeps_supported_strategies(tmp_path, resampling_strategy):
+    artifact = run_data_transformation(tmp_path, out_of_core=True, resampling_strategy=resampling_strategy,
+                                       use_cache=False)
+    assert artifact.resampling_strategy == resampling_strategy
+    assert (artifact.class_weights is not None) == (resampling_strategy == "class_weight")
+    assert os.path.exists(artifact.transformed_object_file_path)
+
+
+def test_validation_rows_are_held_out_before_resampling(tmp_path):
+    in_memory = run_data_transformation(tmp_path / "in_memory", resampling_strategy="random_undersampling",
+                                        use_cache=False)
+    out_of_core = run_data_transformation(tmp_path / "out_of_core", out_of_core=True,
+                                          resampling_strategy="none", use_cache=False)
+    validation = load_numpy_array_data(in_memory.transformed_validation_file_path)
+    assert len(validation) == 80
+    # The same real rows in both modes, whatever the resampling did to the rest of the train split
+    np.testing.assert_allclose(validation, load_numpy_array_data(out_of_core.transformed_validation_file_path),
+                               rtol=1e-6)
+    assert len(load_numpy_array_data(in_memory.transformed_train_file_path)) < 720
+
+
+@pytest.mark.parametrize("resampling_strategy", ["none", "class_weight"])
+def test_out_of_core_output_matches_the_in_memory_output(tmp_path, resampling_strategy):
+    in_memory = run_data_transformation(tmp_path / "in_memory", resampling_strategy=resampling_strategy,
+                                        use_cache=False)
+    out_of_core = run_data_transformation(tmp_path / "out_of_core", out_of_core=True,
+                                          resampling_strategy=resampling_strategy, use_cache=False)
+    assert out_of_core.class_weights == in_memory.class_weights
+    for file_path in ["transformed_train_file_path", "transformed_validation_file_path",
+                      "transformed_test_file_path"]:
+        expected = load_numpy_array_data(getattr(in_memory, file_path))
+        # Memory-mapped, as the trainer opens it
+        actual = load_numpy_array_data(getattr(out_of_core, file_path), mmap_mode="r")
+        assert actual.shape == expected.shape
+        assert np.array_equal(actual, expected)
@@ -0,0 +1,86 @@
+import functools
+import os
+
+import pytest
+
+from conftest import make_records
+import src.components.data_validation as data_validation_module
+from src.components.data_validation import DataValidation
+from src.constants import AWS_ACCESS_KEY_ID_ENV_KEY, AWS_SECRET_ACCESS_KEY_ENV_KEY, STORAGE_BACKEND_ENV_KEY
+from src.entity.artifact_entity import DataIngestionArtifact
+from src.entity.config_entity import DataValidationConfig
+from src.utils.main_utils import read_yaml_file, write_dataframe
+from src.utils.stage_cache import StageCache
+
+
+def make_data_validation(tmp_path, **config_values) -> DataValidation:
+    validation_dir = str(tmp_path / "data_validation")
+    config = DataValidationConfig(data_validation_dir=validation_dir,
+                                  validation_report_file_path=os.path.join(validation_dir, "report.yaml"),
+                                  drift_profile_file_path=os.path.join(validation_dir, "drift_profile.json"),
+                                  reference_profile_file_path=str(tmp_path / "reference" / "drift_profile.json"),
+                                  **config_values)
+    return DataValidation(DataIngestionArtifact(str(tmp_path / "train.parquet"), str(tmp_path / "test.parquet")),
+                          config)
+
+
+def test_report_flags_bad_dtype_range_and_domain(tmp_path):
+    records = make_records(1000)
+    write_dataframe(str(tmp_path / "clean.parquet"), records)
+    records["Age"] = records["Age"].astype(str)
+    records.loc[[3, 5], "Region_Code"] = 500
+    records.loc[7, "Gender"] = "Unknown"
+    write_dataframe(str(tmp_path / "bad.parquet"), records)
+    data_validation = make_data_validation(tmp_path, batch_size=256)
+
+    assert data_validation.validate_file(str(tmp_path / "clean.parquet"))["errors"] == []
+
+    report = data_validation.validate_file(str(tmp_path / "bad.parquet"))
+    assert report["rows"] == 1000
+    assert not report["columns"]["Age"]["dtype_ok"]
+    assert report["columns"]["Region_Code"]["out_of_range"] == 2
+    assert report["columns"]["Gender"]["unknown_values"] == 1
+    assert report["columns"]["Gender"]["unknown_examples"] == ["Unknown"]
+    errors = sorted(report["errors"])
+    assert len(errors) == 3
+    assert errors[0].startswith("Age: dtype") and errors[0].endswith("does not conform to int")
+    assert errors[1:] == ["Gender: 1 values outside the domain, e.g. ['Unknown']",
+                          "Region_Code: 2 values outside [0, 127]"]
+
+
+@pytest.fixture
+def splits(tmp_path):
+    records = make_records(1000)
+    write_dataframe(str(tmp_path / "train.parquet"), records.iloc[:800])
+    write_dataframe(str(tmp_path / "test.parquet"), records.iloc[800:])
+
+
+def count_fetches(monkeypatch) -> list:
+    fetches = []
+    monkeypatch.setattr(DataValidation, "fetch_reference_profile", lambda self: fetches.append(self) or False)
+    return fetches
+
+
+def test_reference_profile_is_not_fetched_without_drift_detection(tmp_path, splits, monkeypatch):
+    fetches = count_fetches(monkeypatch)
+    artifact = make_data_validation(tmp_path, drift_detection=False, use_cache=False).initiate_data_validation()
+    assert fetches == []
+    assert artifact.validattion_status
+    assert read_yaml_file(artifact.validation_report_file_path)["drift"] is None
+
+
+def test_reference_profile_is_not_fetched_on_a_cache_hit(tmp_path, splits, monkeypatch):
+    monkeypatch.setattr(data_validation_module, "StageCache",
+                        functools.partial(StageCache, cache_dir=str(tmp_path / "stage_cache")))
+    fetches = count_fetches(monkeypatch)
+    make_data_validation(tmp_path, use_cache=True).initiate_data_validation()
+    make_data_validation(tmp_path, use_cache=True).initiate_data_validation()
+    assert len(fetches) == 1
+
+
+def test_missing_registry_credentials_skip_the_fetch(tmp_path, monkeypatch):
+    monkeypatch.setenv(STORAGE_BACKEND_ENV_KEY, "s3")
+    monkeypatch.delenv(AWS_ACCESS_KEY_ID_ENV_KEY, raising=False)
+    monkeypatch.delenv(AWS_SECRET_ACCESS_KEY_ENV_KEY, raising=False)
+    monkeypatch.setattr(data_validation_module, "get_storage_service", lambda: pytest.fail("registry was contacted"))
+    assert not make_data_validation(tmp_path).fetch_reference_profile()
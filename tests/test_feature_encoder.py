@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from conftest import make_records
+from src.constants import SCHEMA_FILE_PATH, TARGET_COLUMN
+from src.entity.feature_encoder import FeatureEncoder
+from src.utils.main_utils import apply_dtype_plan, get_dtype_plan, read_yaml_file
+
+
+@pytest.fixture
+def schema_config() -> dict:
+    return read_yaml_file(SCHEMA_FILE_PATH)
+
+
+def test_single_rows_encode_like_the_batch(schema_config):
+    records = make_records(200)
+    encoder = FeatureEncoder.from_schema(schema_config, TARGET_COLUMN)
+    batch = encoder.fit_transform(records)
+    assert batch.shape == (200, encoder.n_features) and batch.dtype == np.float32
+
+    rows = np.vstack([encoder.transform(records.iloc[[index]]) for index in range(len(records))])
+    assert np.array_equal(rows, batch)
+    assert np.array_equal(encoder.transform_records(records.to_dict("records")), batch)
+    # Categorical columns encode the same as plain strings
+    categorical_plan = {column: dtype for column, dtype in get_dtype_plan(schema_config).items()
+                        if column in schema_config["categorical_columns"]}
+    assert np.array_equal(encoder.transform(apply_dtype_plan(records, categorical_plan)), batch)
+
+
+def test_partial_fit_on_chunks_matches_a_single_fit(schema_config):
+    records = make_records(1000)
+    fitted = FeatureEncoder.from_schema(schema_config, TARGET_COLUMN).fit(records)
+    chunked = FeatureEncoder.from_schema(schema_config, TARGET_COLUMN)
+    for start in range(0, len(records), 300):
+        chunked.partial_fit(records.iloc[start:start + 300])
+
+    assert np.array_equal(chunked.n_samples_seen, fitted.n_samples_seen)
+    np.testing.assert_allclose(chunked.scale, fitted.scale, rtol=1e-12)
+    np.testing.assert_allclose(chunked.offset, fitted.offset, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(chunked.transform(records), fitted.transform(records), rtol=1e-6, atol=1e-6)
@@ -0,0 +1,22 @@
+import numpy as np
+
+from src.utils.hyperparameter_search import successive_halving_search
+from src.utils.main_utils import save_numpy_array_data
+
+SEARCH_CONFIG = {"eta": 2, "n_candidates": 2, "min_rows": 200, "min_trees": 4, "max_validation_rows": 150,
+                 "n_workers": 1, "random_state": 0}
+
+
+def test_candidates_are_scored_on_the_held_out_validation_file(tmp_path):
+    rng = np.random.default_rng(0)
+    x_train, x_validation = rng.normal(size=(400, 3)), rng.normal(size=(200, 3))
+    train_file_path, validation_file_path = str(tmp_path / "train.npy"), str(tmp_path / "validation.npy")
+    save_numpy_array_data(train_file_path, np.c_[x_train, x_train[:, 0] > 0].astype(np.float32))
+    # Labels inverted on the validation rows: a score taken on train rows would be close to 1
+    save_numpy_array_data(validation_file_path, np.c_[x_validation, x_validation[:, 0] <= 0].astype(np.float32))
+
+    leaderboard = successive_halving_search(train_file_path, validation_file_path, backend="random_forest",
+                                            param_space={"max_depth": [2, 3]}, search_config=SEARCH_CONFIG,
+                                            max_trees=8)
+    assert len(leaderboard) == 2
+    assert all(rung["roc_auc"] < 0.1 for entry in leaderboard for rung in entry["rungs"])
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from src.cloud_storage.aws_storage import CHECKSUM_METADATA_KEY, PART_FILE_SUFFIX, PART_STATE_FILE_SUFFIX
+from src.exception import MyException
+from src.utils.stage_cache import get_file_hash
+
+BUCKET_NAME = "bucket"
+PART_SIZE = 64 * 1024
+
+
+@pytest.fixture
+def uploaded(tmp_path, local_storage):
+    file_path = tmp_path / "model.pkl"
+    file_path.write_bytes(os.urandom(5 * PART_SIZE + 123))
+    local_storage.upload_file(str(file_path), to_filename="registry/model.pkl", bucket_name=BUCKET_NAME)
+    return str(file_path)
+
+
+def test_upload_and_download_round_trip(tmp_path, local_storage, uploaded):
+    metadata = local_storage.get_object_metadata(BUCKET_NAME, "registry/model.pkl")
+    assert metadata["size"] == os.path.getsize(uploaded)
+    assert metadata[CHECKSUM_METADATA_KEY] == get_file_hash(uploaded)
+    assert local_storage.list_objects(BUCKET_NAME, prefix="registry/") == ["registry/model.pkl"]
+
+    downloaded = str(tmp_path / "download" / "model.pkl")
+    local_storage.download_file(BUCKET_NAME, "registry/model.pkl", downloaded)
+    assert get_file_hash(downloaded) == get_file_hash(uploaded)
+    assert os.listdir(tmp_path / "download") == ["model.pkl"]
+
+
+def test_download_resumes_after_a_truncated_part(tmp_path, local_storage, uploaded, monkeypatch):
+    iter_range = local_storage._iter_range
+    fetched_starts = []
+
+    def truncated_iter_range(bucket_name, s3_key, start, end):
+        # The fourth part stops half way, as an interrupted connection would
+        for block in iter_range(bucket_name, s3_key, start, end if start != 3 * PART_SIZE else start + 100):
+            yield block
+
+    def counting_iter_range(bucket_name, s3_key, start, end):
+        fetched_starts.append(start)
+        yield from iter_range(bucket_name, s3_key, start, end)
+
+    downloaded = str(tmp_path / "download" / "model.pkl")
+    monkeypatch.setattr(local_storage, "_iter_range", truncated_iter_range)
+    with pytest.raises(MyException, match="Part 3"):
+        local_storage.download_file(BUCKET_NAME, "registry/model.pkl", downloaded)
+    assert not os.path.exists(downloaded)
+    assert os.path.exists(downloaded + PART_FILE_SUFFIX)
+    done = local_storage._read_download_state(downloaded + PART_STATE_FILE_SUFFIX)["done"]
+    assert 3 not in done
+
+    monkeypatch.setattr(local_storage, "_iter_range", counting_iter_range)
+    local_storage.download_file(BUCKET_NAME, "registry/model.pkl", downloaded)
+    assert sorted(fetched_starts) == [part * PART_SIZE for part in range(6) if part not in done]
+    assert get_file_hash(downloaded) == get_file_hash(uploaded)
+    assert not os.path.exists(downloaded + PART_FILE_SUFFIX)
+    assert not os.path.exists(downloaded + PART_STATE_FILE_SUFFIX)
+
+
+def test_download_rejects_a_checksum_mismatch(tmp_path, local_storage, uploaded):
+    # Same size and modification time, so the recorded sha256 still applies to the altered object
+    object_path = local_storage._object_path(BUCKET_NAME, "registry/model.pkl")
+    stat = os.stat(object_path)
+    with open(object_path, "r+b") as file:
+        file.write(b"corrupted")
+    os.utime(object_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    downloaded = str(tmp_path / "download" / "model.pkl")
+    with pytest.raises(MyException, match="Checksum mismatch"):
+        local_storage.download_file(BUCKET_NAME, "registry/model.pkl", downloaded)
+    assert os.listdir(tmp_path / "download") == []
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from conftest import make_records
+from src.constants import SCHEMA_FILE_PATH
+from src.utils.main_utils import apply_dtype_plan, get_dtype_plan, read_dataframe, read_yaml_file, write_dataframe
+
+
+def test_dtype_plan_survives_a_parquet_round_trip(tmp_path):
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    dtype_plan = get_dtype_plan(schema_config)
+    records = make_records(500)
+    # A null integer and a category outside the declared domain
+    records["Vintage"] = records["Vintage"].astype(object)
+    records.loc[3, "Vintage"] = None
+    records.loc[5, "Vehicle_Age"] = "New"
+    compact = apply_dtype_plan(records, dtype_plan)
+    assert compact["Age"].dtype == np.int8
+    assert compact["Vintage"].dtype == "Int16"
+    assert compact["Annual_Premium"].dtype == np.float32
+    assert list(compact["Vehicle_Age"].cat.categories) == ["1-2 Year", "< 1 Year", "> 2 Years", "New"]
+
+    file_path = str(tmp_path / "data.parquet")
+    write_dataframe(file_path, compact, schema_config=schema_config)
+    pd.testing.assert_frame_equal(read_dataframe(file_path, dtype_plan=dtype_plan), compact)
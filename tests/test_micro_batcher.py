@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import numpy as np
+
+from src.exception import MyException
+from src.utils.micro_batcher import MicroBatcher
+
+
+def run_batches(records, max_batch_size, max_delay_ms, fail_first=False):
+    """
+    Submits all records at once and returns (predictions, sizes of the scored batches, stats, seconds).
+    """
+    batch_sizes = []
+
+    def predict_batch(batch):
+        batch_sizes.append(len(batch))
+        if fail_first and len(batch_sizes) == 1:
+            raise ValueError("model failed")
+        return np.array([record["value"] * 2 for record in batch])
+
+    async def main():
+        micro_batcher = MicroBatcher(predict_batch, max_batch_size=max_batch_size, max_delay_ms=max_delay_ms,
+                                     metrics_window=100)
+        await micro_batcher.start()
+        try:
+            started = time.perf_counter()
+            results = await asyncio.gather(*(micro_batcher.submit(record) for record in records),
+                                           return_exceptions=True)
+            return results, batch_sizes, micro_batcher.metrics.get_stats(), time.perf_counter() - started
+        finally:
+            await micro_batcher.stop()
+
+    return asyncio.run(main())
+
+
+def test_full_batches_are_flushed_without_waiting_for_the_delay():
+    predictions, batch_sizes, stats, seconds = run_batches([{"value": value} for value in range(8)],
+                                                           max_batch_size=4, max_delay_ms=60_000)
+    assert list(predictions) == [value * 2 for value in range(8)]
+    assert batch_sizes == [4, 4]
+    assert seconds < 5
+    assert stats["batches"] == 2 and stats["records"] == 8 and stats["errors"] == 0
+
+
+def test_partial_batches_are_flushed_after_the_delay():
+    predictions, batch_sizes, stats, seconds = run_batches([{"value": value} for value in range(3)],
+                                                           max_batch_size=100, max_delay_ms=50)
+    assert list(predictions) == [0, 2, 4]
+    assert batch_sizes == [3]
+    assert 0.05 <= seconds < 5
+    assert stats["batch_size"]["max"] == 3
+
+
+def test_failed_batches_fail_their_records_and_are_counted():
+    results, batch_sizes, stats, _ = run_batches([{"value": value} for value in range(6)],
+                                                 max_batch_size=3, max_delay_ms=50, fail_first=True)
+    assert batch_sizes == [3, 3]
+    assert all(isinstance(result, MyException) for result in results[:3])
+    assert list(results[3:]) == [6, 8, 10]
+    assert stats["errors"] == 1 and stats["batches"] == 1
+    assert "model failed" in str(results[0])
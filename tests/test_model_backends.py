@@ -0,0 +1,49 @@
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+
+from src.components.model_trainer import ModelTrainer
+from src.entity.config_entity import ModelTrainerConfig
+from src.entity.model_backends import (MODEL_BACKENDS, HistGradientBoostingBackend, ModelBackend,
+                                       RandomForestBackend, get_model_backend)
+
+
+@pytest.mark.parametrize("name, backend, estimator", [
+    ("random_forest", RandomForestBackend, RandomForestClassifier),
+    ("hist_gradient_boosting", HistGradientBoostingBackend, HistGradientBoostingClassifier),
+])
+def test_backends_are_looked_up_by_name(name, backend, estimator):
+    assert get_model_backend(name) is backend
+    assert issubclass(backend, ModelBackend) and backend.name == name
+    model = backend({}, random_state=0).build(n_estimators=5)
+    assert isinstance(model, estimator)
+    assert model.get_params()["n_estimators" if backend is RandomForestBackend else "max_iter"] == 5
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown model backend 'xgboost'") as error:
+        get_model_backend("xgboost")
+    assert str(list(MODEL_BACKENDS)) in str(error.value)
+    with pytest.raises(ValueError, match="Unknown model backend"):
+        ModelTrainer(data_transformation_artifact=None, model_trainer_config=ModelTrainerConfig(backend="xgboost"))
+
+
+def make_classification_split():
+    x, y = make_classification(n_samples=2000, random_state=0)
+    return x[:1500], y[:1500], x[1500:], y[1500:]
+
+
+def test_random_forest_is_truncated_to_the_best_batch():
+    model, history = RandomForestBackend({}, n_jobs=1, random_state=0).fit_with_early_stopping(
+        *make_classification_split(), max_estimators=200, batch_size=10, patience=2, tolerance=1e-4)
+    best = max(history, key=lambda entry: entry["validation_roc_auc"])
+    assert history[-1]["trees"] > best["trees"]
+    assert len(model.estimators_) == model.n_estimators == best["trees"]
+
+
+def test_boosting_history_starts_after_the_first_batch():
+    model, history = HistGradientBoostingBackend({}, random_state=0).fit_with_early_stopping(
+        *make_classification_split(), max_estimators=200, batch_size=10, patience=2, tolerance=1e-4)
+    trees = [entry["trees"] for entry in history]
+    assert trees[0] == 10 and trees[-1] == model.n_iter_
+    assert trees == sorted(set(trees))
@@ -0,0 +1,54 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.model_cache import ModelCache
+
+BUCKET_NAME = "models"
+
+
+def upload(local_storage, tmp_path, s3_key: str, content: bytes) -> None:
+    file_path = tmp_path / "upload"
+    file_path.write_bytes(content)
+    local_storage.upload_file(str(file_path), to_filename=s3_key, bucket_name=BUCKET_NAME)
+
+
+def read(model_cache: ModelCache, local_storage, s3_key: str) -> bytes:
+    with model_cache.open_file(local_storage, BUCKET_NAME, s3_key) as (file_path, _):
+        with open(file_path, "rb") as file:
+            return file.read()
+
+
+def test_concurrent_loaders_download_once(tmp_path, local_storage):
+    upload(local_storage, tmp_path, "model.pkl", b"a" * 1000)
+    model_cache = ModelCache(cache_dir=str(tmp_path / "model_cache"), max_bytes=10 ** 6)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        contents = list(executor.map(lambda _: read(model_cache, local_storage, "model.pkl"), range(32)))
+    assert contents == [b"a" * 1000] * 32
+    assert model_cache.stats == {"hits": 31, "misses": 1, "downloaded_bytes": 1000}
+
+
+def test_eviction_skips_entries_being_read(tmp_path, local_storage):
+    upload(local_storage, tmp_path, "old/model.pkl", b"a" * 1000)
+    upload(local_storage, tmp_path, "new/model.pkl", b"b" * 1000)
+    model_cache = ModelCache(cache_dir=str(tmp_path / "model_cache"), max_bytes=1500)
+
+    with model_cache.open_file(local_storage, BUCKET_NAME, "old/model.pkl") as (old_file_path, _):
+        # Caching the new version goes over max_bytes while the old one is being read
+        assert read(model_cache, local_storage, "new/model.pkl") == b"b" * 1000
+        with open(old_file_path, "rb") as file:
+            assert file.read() == b"a" * 1000
+
+    model_cache.evict()
+    assert not os.path.exists(old_file_path)
+
+
+def test_entry_evicted_before_the_read_is_downloaded_again(tmp_path, local_storage):
+    upload(local_storage, tmp_path, "model.pkl", b"a" * 1000)
+    model_cache = ModelCache(cache_dir=str(tmp_path / "model_cache"), max_bytes=10 ** 6)
+    with model_cache.open_file(local_storage, BUCKET_NAME, "model.pkl") as (file_path, _):
+        pass
+    shutil.rmtree(os.path.dirname(file_path))
+
+    assert read(model_cache, local_storage, "model.pkl") == b"a" * 1000
+    assert model_cache.stats["misses"] == 2
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import src.components.model_evaluation as model_evaluation_module
+from conftest import make_records
+from src.components.model_evaluation import ModelEvaluation, bootstrap_f1_difference
+from src.constants import SCHEMA_FILE_PATH, TARGET_COLUMN
+from src.entity.config_entity import ModelEvaluationConfig
+from src.entity.estimator import MyModel
+from src.entity.feature_encoder import FeatureEncoder
+from src.utils.main_utils import read_yaml_file
+
+
+def test_bootstrap_interval_of_known_differences():
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 2, 500)
+    kwargs = {"n_resamples": 1000, "confidence_level": 0.95, "random_state": 0}
+
+    same = bootstrap_f1_difference(y_true, y_true, y_true, **kwargs)
+    assert same["ci_lower"] == same["ci_upper"] == same["std"] == 0.0
+    # A perfect candidate against a model that is always wrong: F1 1 vs 0 in every resample
+    perfect = bootstrap_f1_difference(y_true, y_true, 1 - y_true, **kwargs)
+    assert perfect["ci_lower"] == perfect["ci_upper"] == 1.0
+
+
+def f1_of_rows(y_true: np.ndarray, y_pred: np.ndarray) -> np.ndarray:
+    tp = (y_true & y_pred).sum(axis=1)
+    return 2 * tp / (y_true.sum(axis=1) + y_pred.sum(axis=1))
+
+
+def test_bootstrap_interval_matches_the_row_bootstrap():
+    rng = np.random.default_rng(1)
+    y_true = rng.integers(0, 2, 2000)
+    candidate_pred = np.where(rng.random(2000) < 0.85, y_true, 1 - y_true)
+    production_pred = np.where(rng.random(2000) < 0.80, y_true, 1 - y_true)
+    result = bootstrap_f1_difference(y_true, candidate_pred, production_pred, n_resamples=4000,
+                                     confidence_level=0.9, random_state=0)
+    assert result["resamples"] == 4000
+
+    rows = rng.integers(0, 2000, size=(4000, 2000))
+    differences = f1_of_rows(y_true[rows], candidate_pred[rows]) - f1_of_rows(y_true[rows], production_pred[rows])
+    lower, upper = np.quantile(differences, [0.05, 0.95])
+    assert result["ci_lower"] == pytest.approx(lower, abs=0.005)
+    assert result["ci_upper"] == pytest.approx(upper, abs=0.005)
+    assert result["ci_lower"] > 0
+
+
+@pytest.mark.parametrize("n_jobs, uses_threads", [(1, True), (-1, False)])
+def test_parallel_estimators_score_the_batches_sequentially(monkeypatch, n_jobs, uses_threads):
+    records = make_records(500)
+    encoder = FeatureEncoder.from_schema(read_yaml_file(SCHEMA_FILE_PATH), TARGET_COLUMN)
+    features = encoder.fit_transform(records)
+    forest = RandomForestClassifier(n_estimators=5, n_jobs=n_jobs, random_state=0).fit(features, records[TARGET_COLUMN])
+    model = MyModel(preprocessing_object=encoder, trained_model_object=forest)
+
+    executors = []
+    thread_pool_executor = model_evaluation_module.ThreadPoolExecutor
+    monkeypatch.setattr(model_evaluation_module, "ThreadPoolExecutor",
+                        lambda **kwargs: executors.append(kwargs) or thread_pool_executor(**kwargs))
+    model_evaluation = ModelEvaluation(ModelEvaluationConfig(batch_size=64, n_workers=4), None, None)
+    predictions = model_evaluation.predict_in_batches(model, records)
+
+    assert np.array_equal(predictions, forest.predict(features))
+    assert executors == ([{"max_workers": 4}] if uses_threads else [])
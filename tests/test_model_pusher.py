@@ -0,0 +1,48 @@
+import os
+
+from src.components.data_validation import DataValidation
+from src.components.model_pusher import ModelPusher
+from src.entity.artifact_entity import DataIngestionArtifact, ModelEvaluationArtifact
+from src.entity.config_entity import DataValidationConfig, ModelPusherConfig
+from src.utils.main_utils import read_yaml_file, save_object, write_dataframe
+
+from conftest import make_records
+
+
+def run_data_validation(run_dir, records, local_storage, reference_profile_file_path):
+    train_file_path, test_file_path = os.path.join(run_dir, "train.parquet"), os.path.join(run_dir, "test.parquet")
+    write_dataframe(train_file_path, records.iloc[:800])
+    write_dataframe(test_file_path, records.iloc[800:])
+    validation_dir = os.path.join(run_dir, "data_validation")
+    config = DataValidationConfig(data_validation_dir=validation_dir,
+                                  validation_report_file_path=os.path.join(validation_dir, "report.yaml"),
+                                  drift_profile_file_path=os.path.join(validation_dir, "drift_profile.json"),
+                                  reference_profile_file_path=reference_profile_file_path, use_cache=False)
+    artifact = DataValidation(DataIngestionArtifact(train_file_path, test_file_path), config,
+                              storage_service=local_storage).initiate_data_validation()
+    return artifact, read_yaml_file(artifact.validation_report_file_path)
+
+
+def test_pushed_drift_profile_is_the_reference_of_the_next_run(tmp_path, local_storage):
+    reference_profile_file_path = str(tmp_path / "production_model" / "drift_profile.json")
+    first_artifact, first_report = run_data_validation(str(tmp_path / "run1"), make_records(1000, seed=1),
+                                                       local_storage, reference_profile_file_path)
+    assert first_report["drift"] is None
+
+    model_file_path = str(tmp_path / "model.pkl")
+    save_object(model_file_path, {"model": "candidate"})
+    evaluation_artifact = ModelEvaluationArtifact(is_model_accepted=True, changed_accuracy=0.05,
+                                                  production_model_path=None, trained_model_path=model_file_path)
+    # Pushed from another machine: only the registry copy reaches the next run's reference profile path
+    pusher_config = ModelPusherConfig(reference_profile_file_path=str(tmp_path / "pusher" / "drift_profile.json"))
+    pusher_artifact = ModelPusher(evaluation_artifact, pusher_config, data_validation_artifact=first_artifact,
+                                  storage_service=local_storage).initiate_model_pusher()
+    assert pusher_artifact.s3_drift_profile_path == pusher_config.s3_drift_profile_key_path
+    assert local_storage.get_object_metadata(pusher_config.bucket_name, pusher_config.s3_model_key_path) is not None
+    assert os.path.exists(pusher_config.reference_profile_file_path)
+
+    _, second_report = run_data_validation(str(tmp_path / "run2"), make_records(1000, seed=2, age_shift=30),
+                                           local_storage, reference_profile_file_path)
+    assert os.path.exists(reference_profile_file_path)
+    assert second_report["drift"] is not None
+    assert "Age" in second_report["drift"]["drifted_columns"]
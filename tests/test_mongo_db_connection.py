@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from src.configuration.mongo_db_connection import MongoDBClient, MongoDBTelemetry
+
+mongomock = pytest.importorskip("mongomock")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+def test_existing_instances_use_a_new_client_after_fork(monkeypatch):
+    parent_client = mongomock.MongoClient()
+    MongoDBClient.set_client(parent_client)
+    mongo_client = MongoDBClient()
+    monkeypatch.setattr(MongoDBClient, "_create_client", classmethod(lambda cls: mongomock.MongoClient()))
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        uses_new_client = mongo_client.client is not parent_client and \
+            mongo_client.get_collection("data").database.client is mongo_client.client
+        os.write(write_end, b"1" if uses_new_client else b"0")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read_end, 1) == b"1"
+    assert mongo_client.client is parent_client
+
+
+def test_byte_tracking_is_off_by_default():
+    assert MongoDBTelemetry().track_bytes is False
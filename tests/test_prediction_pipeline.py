@@ -0,0 +1,153 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from sklearn.dummy import DummyClassifier
+from sklearn.ensemble import RandomForestClassifier
+
+from conftest import make_records
+from src.constants import SCHEMA_FILE_PATH, STORAGE_BACKEND_ENV_KEY, TARGET_COLUMN
+from src.entity.config_entity import VehiclePredictorConfig
+from src.entity.estimator import MyModel
+from src.entity.feature_encoder import FeatureEncoder
+from src.pipline.prediction_pipeline import VehicleDataClassifier
+from src.utils.main_utils import read_yaml_file
+
+RECORDS = make_records(400)
+
+
+class FakeRegistry:
+    """
+    Stands in for Proj1Estimator: serves `version` and counts the loads.
+    """
+
+    def __init__(self, models: dict, version: str):
+        self.models = models
+        self.version = version
+        self.loaded_model_version = None
+        self.loads = 0
+        self.bucket_name, self.model_path = "models", "model.pkl"
+
+    def get_model_version(self) -> str:
+        return self.version
+
+    def load_model(self, version=None) -> MyModel:
+        self.loads += 1
+        self.loaded_model_version = version or self.version
+        return self.models[self.loaded_model_version]
+
+
+class FailingModel:
+    def predict(self, features):
+        raise ValueError("shadow model failed")
+
+
+@pytest.fixture(scope="module")
+def models() -> dict:
+    encoder = FeatureEncoder.from_schema(read_yaml_file(SCHEMA_FILE_PATH), TARGET_COLUMN)
+    features, target = encoder.fit_transform(RECORDS), RECORDS[TARGET_COLUMN]
+    forest = RandomForestClassifier(n_estimators=10, max_depth=4, random_state=0).fit(features, target)
+    return {"forest": MyModel(encoder, forest), "retrained": MyModel(encoder, forest),
+            "zeros": MyModel(encoder, DummyClassifier(strategy="constant", constant=0).fit(features, target)),
+            "ones": MyModel(encoder, DummyClassifier(strategy="constant", constant=1).fit(features, target))}
+
+
+@pytest.fixture(autouse=True)
+def local_registry(monkeypatch):
+    monkeypatch.setenv(STORAGE_BACKEND_ENV_KEY, "local")
+
+
+def make_classifier(models, version, **config_values) -> VehicleDataClassifier:
+    config = VehiclePredictorConfig(max_batch_size=8, watch_interval_seconds=0, **config_values)
+    classifier = VehicleDataClassifier(config)
+    classifier.estimator = FakeRegistry(models, version)
+    return classifier.load()
+
+
+def score_with_shadow(classifier, batches: int) -> None:
+    records = RECORDS.to_dict("records")
+    for start in range(0, 50 * batches, 50):
+        classifier.predict_records(records[start % 400:start % 400 + 50])
+        classifier._shadow_executor.submit(lambda: None).result()  # wait for the shadow comparison
+
+
+def test_swap_is_atomic_for_concurrent_batches(models):
+    classifier = make_classifier(models, "zeros")
+    records = RECORDS.to_dict("records")[:64]
+    stop = threading.Event()
+
+    def score() -> list:
+        results = []
+        while not stop.is_set():
+            results.append(classifier.predict_records(records))
+        return results
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        scorers = [executor.submit(score) for _ in range(4)]
+        for version in ["ones", "zeros", "ones"]:
+            classifier.estimator.version = version
+            assert classifier.reload_if_changed()
+        stop.set()
+        batches = [predictions for scorer in scorers for predictions in scorer.result()]
+
+    # Every batch was scored end to end by one version
+    assert all(len(set(predictions.tolist())) == 1 for predictions in batches)
+    assert classifier.serving.version == "ones" and classifier.reloads == 3
+    assert not classifier.reload_if_changed()
+
+
+def test_shadow_version_is_promoted_after_passing_the_gates(models):
+    classifier = make_classifier(models, "forest", shadow_sample_rate=1.0, shadow_min_records=200)
+    classifier.estimator.version = "retrained"
+    assert not classifier.reload_if_changed()
+    assert classifier.shadow.version == "retrained"
+
+    score_with_shadow(classifier, batches=2)
+    assert not classifier.reload_if_changed()  # 100 of 200 records compared
+    score_with_shadow(classifier, batches=2)
+    assert classifier.shadow_stats.get_stats()["agreement_rate"] == 1.0
+    assert classifier.reload_if_changed()
+    assert classifier.serving.version == "retrained" and classifier.shadow is None
+
+
+@pytest.mark.parametrize("shadow_version, failure", [("ones", "agreement"), ("retrained", "failed batches")])
+def test_shadow_version_failing_a_gate_is_rejected(models, shadow_version, failure):
+    classifier = make_classifier(models, "forest", shadow_sample_rate=1.0, shadow_min_records=100)
+    classifier.estimator.version = shadow_version
+    classifier.reload_if_changed()
+    if shadow_version == "retrained":
+        classifier.shadow.compact_model = FailingModel()
+
+    score_with_shadow(classifier, batches=3)
+    assert any(failure in message for message in classifier.get_promotion_failures(classifier.shadow_stats))
+    assert not classifier.reload_if_changed()
+    assert classifier.serving.version == "forest" and classifier.reloads == 0
+    assert classifier.get_reload_stats()["rejected_version"] == shadow_version
+
+    # The rejected version is not loaded again, a newer one is shadowed
+    loads = classifier.estimator.loads
+    assert not classifier.reload_if_changed()
+    assert classifier.estimator.loads == loads and classifier.shadow is None
+    classifier.estimator.version = "zeros"
+    classifier.reload_if_changed()
+    assert classifier.shadow.version == "zeros"
+
+
+def test_batches_sampled_while_the_shadow_is_busy_are_skipped(models):
+    classifier = make_classifier(models, "forest", shadow_sample_rate=1.0)
+    classifier.estimator.version = "retrained"
+    classifier.reload_if_changed()
+    release = threading.Event()
+    predict_features = classifier.shadow.predict_features
+    classifier.shadow.predict_features = lambda features: release.wait() and predict_features(features)
+
+    records = RECORDS.to_dict("records")[:10]
+    for _ in range(5):
+        classifier.predict_records(records)
+    release.set()
+    classifier._shadow_executor.submit(lambda: None).result()
+    assert classifier.shadow_stats.get_stats()["batches"] == 1
+    classifier.predict_records(records)
+    classifier._shadow_executor.submit(lambda: None).result()
+    assert classifier.shadow_stats.get_stats()["batches"] == 2
@@ -0,0 +1,96 @@
+import pandas as pd
+import pytest
+
+from conftest import make_records
+from src.configuration.mongo_db_connection import MongoDBClient
+from src.constants import DATABASE_NAME
+from src.data_access.proj1_data import Proj1Data
+
+mongomock = pytest.importorskip("mongomock")
+
+COLLECTION_NAME = "records"
+
+
+@pytest.fixture
+def proj1_data() -> Proj1Data:
+    client = mongomock.MongoClient()
+    MongoDBClient.set_client(client)
+    documents = make_records(1000).to_dict("records")
+    # Partition field left null or missing on some documents
+    for index, document in enumerate(documents):
+        if index % 50 == 0:
+            document["Vintage"] = None
+        elif index % 50 == 1:
+            del document["Vintage"]
+    client[DATABASE_NAME][COLLECTION_NAME].insert_many(documents)
+    return Proj1Data()
+
+
+def test_partitions_are_streamed_as_chunks(proj1_data):
+    chunks = list(proj1_data.export_collection_as_partitions(COLLECTION_NAME, n_partitions=4, max_workers=2,
+                                                             batch_size=64, max_pending_chunks=1))
+    assert all(len(chunk) <= 64 for chunk in chunks)
+    assert sum(len(chunk) for chunk in chunks) == 1000
+
+
+@pytest.mark.parametrize("partition_field", ["_id", "Vintage"])
+def test_partitioned_export_matches_sorted_sequential_export(proj1_data, partition_field):
+    sort = Proj1Data._partition_sort(partition_field)
+    sequential_df = proj1_data.export_collection_as_dataframe(COLLECTION_NAME, sort=sort)
+    parallel_df = proj1_data.export_collection_parallel(COLLECTION_NAME, n_partitions=4,
+                                                       partition_field=partition_field, batch_size=64)
+    assert len(parallel_df) == 1000
+    # A chunk of null partition values has no numeric dtype, the feature store applies the schema dtypes
+    pd.testing.assert_frame_equal(parallel_df.infer_objects(), sequential_df)
+
+
+def test_null_and_missing_partition_values_are_exported(proj1_data):
+    df = proj1_data.export_collection_parallel(COLLECTION_NAME, n_partitions=1, partition_field="Vintage")
+    assert len(df) == 1000
+    assert df["Vintage"].isna().sum() == 40
+
+
+def test_closing_the_stream_early_stops_the_readers(proj1_data):
+    chunks = proj1_data.export_collection_as_partitions(COLLECTION_NAME, n_partitions=4, batch_size=16,
+                                                        max_pending_chunks=1)
+    assert len(next(chunks)) == 16
+    chunks.close()
+
+
+def test_row_limit_applies_to_the_whole_stratified_sample(proj1_data):
+    df = pd.concat(proj1_data.export_collection_as_chunks(COLLECTION_NAME, sample_size=500,
+                                                          stratify_column="Vehicle_Age", limit=90))
+    assert len(df) == 90
+    assert df["Vehicle_Age"].nunique() == 3
+
+
+def test_chunked_export_matches_the_whole_collection_export(proj1_data):
+    chunks = list(proj1_data.export_collection_as_chunks(COLLECTION_NAME, batch_size=64))
+    assert [len(chunk) for chunk in chunks] == [64] * 15 + [40]
+    assert all("_id" not in chunk.columns and "id" not in chunk.columns for chunk in chunks)
+
+    df = proj1_data.export_collection_as_dataframe(COLLECTION_NAME)
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), df)
+    expected = make_records(1000).drop(columns=["id"])
+    pd.testing.assert_frame_equal(df.drop(columns=["Vintage"]), expected.drop(columns=["Vintage"]),
+                                  check_dtype=False)
+
+
+@pytest.mark.parametrize("stratify_column", [None, "Vehicle_Age"])
+def test_sample_pushdown_returns_the_requested_row_count(proj1_data, stratify_column):
+    query = {"Gender": "Male"}
+    df = pd.concat(proj1_data.export_collection_as_chunks(COLLECTION_NAME, batch_size=64, query=query,
+                                                          projection=["id", "Gender", "Age"], sample_size=200,
+                                                          stratify_column=stratify_column, drop_columns=()))
+    matching = proj1_data._get_collection(COLLECTION_NAME).count_documents(query)
+    assert matching > 200
+    assert len(df) == 200
+    assert df["id"].is_unique
+    assert set(df["Gender"]) == {"Male"}
+    assert list(df.columns) == ["id", "Gender", "Age"]
+
+    # A sample larger than the matching documents returns each of them once
+    df = pd.concat(proj1_data.export_collection_as_chunks(COLLECTION_NAME, query=query, sample_size=10 * matching,
+                                                          stratify_column=stratify_column, drop_columns=()))
+    assert len(df) == matching
+    assert df["id"].is_unique
@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+
+from src.utils.main_utils import load_numpy_array_data, open_numpy_memmap, save_numpy_array_data
+from src.utils.stage_cache import StageCache
+
+
+def test_rewriting_stored_or_restored_outputs_leaves_the_cache_intact(tmp_path):
+    stage_cache = StageCache(stage_name="data_transformation", cache_dir=str(tmp_path / "stage_cache"))
+    fingerprint = "f" * 64
+    produced_file_path = str(tmp_path / "run1" / "train.npy")
+    save_numpy_array_data(produced_file_path, np.arange(5.0))
+    stage_cache.store(fingerprint, {"train.npy": produced_file_path})
+
+    # Rewriting the produced file after it was stored
+    save_numpy_array_data(produced_file_path, np.zeros(5))
+
+    restored_file_path = str(tmp_path / "run2" / "train.npy")
+    assert stage_cache.restore(fingerprint, {"train.npy": restored_file_path})
+    np.testing.assert_array_equal(load_numpy_array_data(restored_file_path), np.arange(5.0))
+
+    # Rewriting the restored file, whole or through a memory map
+    save_numpy_array_data(restored_file_path, np.ones(5))
+    memmap = open_numpy_memmap(restored_file_path, shape=(5,))
+    memmap[:] = 9
+    memmap.flush()
+    del memmap
+
+    other_file_path = str(tmp_path / "run3" / "train.npy")
+    assert stage_cache.restore(fingerprint, {"train.npy": other_file_path})
+    np.testing.assert_array_equal(load_numpy_array_data(other_file_path), np.arange(5.0))
+    assert load_numpy_array_data(restored_file_path)[0] == 9
+
+
+def test_restore_misses_unknown_fingerprints(tmp_path):
+    stage_cache = StageCache(stage_name="data_validation", cache_dir=str(tmp_path / "stage_cache"))
+    assert not stage_cache.restore("0" * 64, {"report.yaml": str(tmp_path / "report.yaml")})
+    assert not os.path.exists(tmp_path / "report.yaml")